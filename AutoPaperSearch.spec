@@ -21,8 +21,6 @@ a = Analysis(
         'json',
         'threading',
         'concurrent.futures',
-        'requests',
-        'bibtexparser',
         'language',
         'language.language',
         'lib.config.config_loader',
@@ -31,13 +29,32 @@ a = Analysis(
         'lib.process.paper_processor',
         'lib.ui.ui',
         'lib.log.utils',
+        'lib.log.verdict_log',
+        'lib.log.metrics',
+        'lib.log.tracing',
+        'lib.process.accounting',
+        'lib.process.cassette',
+        'lib.process.job',
+        'lib.process.scheduler',
+        'lib.process.cascade',
+        'lib.process.prompt_budget',
+        'lib.process.planner',
+        'lib.process.offpeak',
+        'lib.process.compact',
+        'lib.process.streaming',
+        'lib.process.governor',
+        'lib.process.local_classifier',
+        'lib.process.near_duplicates',
+        'lib.process.keyword_filter',
+        'lib.process.quality_gate',
+        'lib.process.sampling',
         'lib.price.price',
         'lib.tools.txt_to_bib_converter'
     ],  # 根据项目依赖添加隐藏导入
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['PIL'],  # 未使用的大型库，减小体积并加快单文件程序的解压启动
     win_no_prefer_redirects=False,
     win_private_assemblies=False,
     cipher=block_cipher,
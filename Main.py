@@ -2,8 +2,8 @@ from lib.config import config_loader as config
 from lib.ui.ui import App
 
 if __name__ == "__main__":
-    # 确保配置已加载
-    config.load_config()
+    # 加载配置（只加载一次）
+    config.ensure_loaded()
     
     app = App()
     app.mainloop()
@@ -0,0 +1 @@
+"""AutoPaperSearch 命令行入口包，用法: python -m autopapersearch run ..."""
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# 保证从任意工作目录运行时都能导入 lib 和 language
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+冷启动（导入耗时）基准测试
+
+在全新的解释器进程中分别执行图形界面和命令行入口的导入路径，重复多次取中位数，
+减去空解释器的启动时间，并用 -X importtime 找出耗时最多的模块。
+结果以 JSON 保存，便于在不同版本之间对比。
+
+用法:
+    python benchmark/import_time.py --repeat 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+
+# 各入口的启动代码（不进入主循环、不发起网络请求）
+TARGETS = {
+    'baseline': "pass",
+    'gui': (
+        "from lib.config import config_loader as config\n"
+        "config.ensure_loaded()\n"
+        "from lib.ui.ui import App\n"
+    ),
+    'headless': (
+        "from lib.cli import build_parser\n"
+        "build_parser().parse_args(['run'])\n"
+        "from lib.config import config_loader as config\n"
+        "config.ensure_loaded()\n"
+        "from lib.load_data import load_paper\n"
+        "from lib.process.paper_processor import process_papers\n"
+    ),
+    # 第一次请求时才会付出的代价，单独列出以便观察
+    'openai': "import openai\n",
+}
+
+
+def _run(code, importtime=False):
+    """在新进程中执行代码，返回 (耗时秒, 是否成功, 标准错误输出)"""
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', code]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=ROOT_DIR, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True, encoding='utf-8', errors='replace')
+    return time.perf_counter() - start, completed.returncode == 0, completed.stderr
+
+
+def _top_imports(stderr, limit):
+    """解析 -X importtime 输出，按累计耗时返回最慢的顶层导入"""
+    # 每行格式: "import time:  self [us] | cumulative [us] | 缩进+模块名"
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(fields[0]), int(fields[1])
+        except ValueError:
+            continue
+        module = fields[2].rstrip()
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        rows.append({'module': module.strip(), 'depth': depth,
+                     'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000})
+    rows.sort(key=lambda r: r['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def measure(name, code, repeat, top):
+    timings = []
+    ok = True
+    error = ''
+    for _ in range(repeat):
+        elapsed, success, stderr = _run(code)
+        if not success:
+            ok = False
+            error = stderr.strip().splitlines()[-1] if stderr.strip() else 'failed'
+            break
+        timings.append(elapsed)
+    result = {'target': name, 'ok': ok}
+    if not ok:
+        result['error'] = error
+        return result
+
+    _, _, importtime_stderr = _run(code, importtime=True)
+    result.update({
+        'runs': len(timings),
+        'median_ms': statistics.median(timings) * 1000,
+        'min_ms': min(timings) * 1000,
+        'max_ms': max(timings) * 1000,
+        'top_imports': _top_imports(importtime_stderr, top),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AutoPaperSearch 冷启动导入耗时基准测试')
+    parser.add_argument('--repeat', type=int, default=7, help='每个入口的重复次数')
+    parser.add_argument('--top', type=int, default=15, help='记录耗时最多的模块数')
+    parser.add_argument('--targets', default='baseline,gui,headless,openai', help='测试的入口，逗号分隔')
+    parser.add_argument('--output', default='', help='结果 JSON 路径，默认 benchmark/results/import_<时间戳>.json')
+    args = parser.parse_args()
+
+    results = []
+    baseline_ms = None
+    for name in [t.strip() for t in args.targets.split(',') if t.strip()]:
+        if name not in TARGETS:
+            parser.error(f"未知的入口: {name}")
+        result = measure(name, TARGETS[name], args.repeat, args.top)
+        if name == 'baseline' and result['ok']:
+            baseline_ms = result['median_ms']
+        if result['ok'] and baseline_ms is not None and name != 'baseline':
+            result['over_baseline_ms'] = result['median_ms'] - baseline_ms
+        results.append(result)
+        if result['ok']:
+            extra = f"  (+{result['over_baseline_ms']:.1f} ms)" if 'over_baseline_ms' in result else ''
+            print(f"{name:<10} median {result['median_ms']:8.1f} ms{extra}", file=sys.stderr)
+        else:
+            print(f"{name:<10} failed: {result['error']}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results',
+                                         f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+近似重复索引基准测试
+
+按词频近似 Zipf 分布生成合成摘要，其中 --duplicate-rate 比例的摘要是之前某篇摘要的改写版本
+（按 --edit-rate 替换单词并追加几个单词，相似度约 0.85~0.9），用 lib.process.near_duplicates.build_index 建立索引，
+输出建立耗时、峰值内存（RSS 增量）、索引常驻内存和近似重复对的召回率。
+摘要以生成器逐篇传入，不在内存中保留，测得的内存只包含索引本身。
+
+用法:
+    python benchmark/near_duplicates.py --papers 1000000 --duplicate-rate 0.02
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from run_benchmark import _current_rss_bytes, _peak_rss_bytes, _git_revision  # noqa: E402
+
+# 每次生成的摘要数
+GENERATE_CHUNK = 1000
+# 改写时从最近的多少篇原始摘要中选取，以及追加的单词数
+RECENT_ORIGINALS = 1000
+APPENDED_WORDS = 10
+
+
+def generate_abstracts(args, pairs=None):
+    """
+    逐篇生成 (paper_index, 摘要)
+
+    参数:
+        pairs: 传入列表时追加 (改写版本, 原始摘要) 的 paper_index 对
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed)
+    vocab = [f"w{i}" for i in range(args.vocab)]
+    weights = 1.0 / (np.arange(args.vocab) + 10.0)
+    weights /= weights.sum()
+    recent = []  # [(paper_index, 单词序号)]
+    paper_index = 1
+    while paper_index <= args.papers:
+        count = min(GENERATE_CHUNK, args.papers - paper_index + 1)
+        lengths = np.maximum(20, rng.normal(args.abstract_words, args.abstract_words * 0.25, count).astype(int))
+        words = rng.choice(args.vocab, size=int(lengths.sum()), p=weights)
+        duplicate = rng.random(count) < args.duplicate_rate
+        start = 0
+        for i in range(count):
+            ids = words[start:start + lengths[i]]
+            start += lengths[i]
+            if duplicate[i] and recent:
+                original_index, original = recent[int(rng.integers(len(recent)))]
+                ids = original.copy()
+                edits = rng.random(len(ids)) < args.edit_rate
+                ids[edits] = rng.choice(args.vocab, size=int(edits.sum()), p=weights)
+                ids = np.concatenate([ids, words[start - lengths[i]:start - lengths[i] + APPENDED_WORDS]])
+                if pairs is not None:
+                    pairs.append((paper_index, original_index))
+            else:
+                recent.append((paper_index, ids))
+                if len(recent) > RECENT_ORIGINALS:
+                    recent.pop(0)
+            yield paper_index, ' '.join(map(vocab.__getitem__, ids.tolist()))
+            paper_index += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AutoPaperSearch 近似重复索引基准测试')
+    parser.add_argument('--papers', type=int, default=100000, help='合成摘要数')
+    parser.add_argument('--abstract-words', type=int, default=150, help='摘要平均词数')
+    parser.add_argument('--vocab', type=int, default=30000, help='词表大小')
+    parser.add_argument('--duplicate-rate', type=float, default=0.02, help='改写版本（近似重复）的比例')
+    parser.add_argument('--edit-rate', type=float, default=0.01, help='改写时替换单词的比例')
+    parser.add_argument('--threshold', type=float, default=None, help='合并为同一簇的最低相似度，默认读取配置')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--output', default='', help='结果 JSON 路径，默认 benchmark/results/near_duplicates_<时间戳>.json')
+    args = parser.parse_args()
+
+    from lib.config import config_loader as config
+    from lib.process import accounting
+    from lib.process import near_duplicates
+
+    config.ensure_loaded()
+    if not accounting.numpy_available():
+        print("需要安装 numpy", file=sys.stderr)
+        sys.exit(1)
+
+    # 单独生成一遍摘要，从建立索引的耗时中扣除生成耗时
+    generate_start = time.perf_counter()
+    for _ in generate_abstracts(args):
+        pass
+    generate_seconds = time.perf_counter() - generate_start
+
+    pairs = []
+    rss_before = _current_rss_bytes()
+    peak_before = _peak_rss_bytes()
+    build_start = time.perf_counter()
+    index = near_duplicates.build_index(generate_abstracts(args, pairs), args.threshold)
+    build_seconds = time.perf_counter() - build_start
+    rss_after = _current_rss_bytes()
+    peak_after = _peak_rss_bytes()
+
+    found = sum(1 for duplicate, original in pairs
+                if index.clusters.get(duplicate) is not None and index.clusters.get(duplicate) == index.clusters.get(original))
+    result = {
+        'papers': args.papers,
+        'indexed': index.papers,
+        'build_seconds': build_seconds,
+        'index_seconds': max(0.0, build_seconds - generate_seconds),
+        'generate_seconds': generate_seconds,
+        'papers_per_second': args.papers / max(1e-9, build_seconds - generate_seconds),
+        'peak_rss_increase_bytes': peak_after - peak_before if peak_before is not None else None,
+        'retained_rss_bytes': rss_after - rss_before if rss_before is not None else None,
+        'index_bytes': index.nbytes(),
+        'clusters': index.cluster_count,
+        'clustered_papers': len(index.clusters),
+        'duplicate_pairs': len(pairs),
+        'duplicate_recall': found / len(pairs) if pairs else None,
+    }
+    mib = 1024 * 1024
+    print(f"papers={args.papers}  index={result['index_seconds']:.1f}s (+{generate_seconds:.1f}s generating)  "
+          f"peak +{(result['peak_rss_increase_bytes'] or 0) / mib:.0f} MiB  index {result['index_bytes'] / mib:.1f} MiB  "
+          f"clusters={result['clusters']}  recall={result['duplicate_recall'] or 0:.3f}", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'abstract_words': args.abstract_words,
+            'vocab': args.vocab,
+            'duplicate_rate': args.duplicate_rate,
+            'edit_rate': args.edit_rate,
+            'threshold': args.threshold if args.threshold is not None else config.near_duplicate_threshold,
+            'num_perm': near_duplicates.NUM_PERM,
+            'bands': near_duplicates.BANDS,
+        },
+        'result': result,
+    }
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results',
+                                         f"near_duplicates_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端吞吐量基准测试
+
+启动本地 OpenAI 兼容桩服务器（benchmark/stub_server.py，独立进程，避免占用被测进程的 CPU），
+把 config.api_base_url 指向它，然后在合成语料上按不同的 API Key 数量和每个 Key 的线程数
+运行 process_papers，输出每个场景的处理速度、请求耗时分位数、CPU 占用和内存（RSS），
+结果以 JSON 保存，便于在不同版本之间对比。
+
+用法:
+    python benchmark/run_benchmark.py --papers 500 --keys 1,4,8 --threads-per-key 1,2 \\
+        --latency-dist lognormal --latency-mean 0.5 --rate-limit-rate 0.02
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from stub_server import add_stub_arguments  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_WORDS = (
+    "virtual reality augmented mixed text entry correction user study headset keyboard gaze gesture "
+    "typing error rate latency interaction technique evaluation participants controller speech "
+    "display immersive environment performance accuracy model learning neural network dataset "
+    "benchmark framework system design method results analysis approach novel proposed"
+).split()
+
+
+def generate_corpus(count, abstract_words=180, seed=0):
+    """
+    生成合成语料，结构与 load_paper 读取的 data.paper_data 一致
+
+    返回:
+        {paper_index: {'title', 'abstract', 'entry', 'source_folder', 'source_file'}}
+    """
+    rng = random.Random(seed)
+    corpus = {}
+    for index in range(1, count + 1):
+        title = ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(6, 14))).capitalize()
+        words = max(20, int(rng.gauss(abstract_words, abstract_words * 0.25)))
+        abstract = ' '.join(rng.choice(_WORDS) for _ in range(words)) + '.'
+        entry = (
+            f"@inproceedings{{bench{index},\n"
+            f"  title = {{{title}}},\n"
+            f"  abstract = {{{abstract}}},\n"
+            f"  year = {{{rng.randint(2015, 2025)}}},\n"
+            f"  url = {{https://example.org/paper/{index}}}\n"
+            f"}}"
+        )
+        corpus[index] = {
+            'title': title,
+            'abstract': abstract,
+            'entry': entry,
+            'source_folder': 'benchmark',
+            'source_file': f"synthetic_{count}.bib",
+        }
+    return corpus
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _current_rss_bytes():
+    """当前常驻内存（仅 Linux 可读取，其他平台返回 None）"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_bytes():
+    """进程启动以来的峰值常驻内存（Linux 上 ru_maxrss 单位为 KB，macOS 为字节）"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_int_list(text):
+    return [int(v) for v in text.split(',') if v.strip()]
+
+
+class StubProcess:
+    """在独立进程中运行桩服务器"""
+
+    def __init__(self, args):
+        command = [sys.executable, os.path.join(BENCHMARK_DIR, 'stub_server.py'), '--port', '0']
+        for name in ('latency_dist', 'latency_mean', 'latency_spread', 'error_rate',
+                     'rate_limit_rate', 'retry_after', 'y_rate', 'think_tokens', 'reasoner_latency_scale',
+                     'title_maybe_rate', 'seed', 'relevant_pattern'):
+            value = getattr(args, name)
+            if value is not None:
+                command += [f"--{name.replace('_', '-')}", str(value)]
+        if args.think:
+            command.append('--think')
+        if args.reasoning_content:
+            command.append('--reasoning-content')
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+        first_line = self.process.stdout.readline()
+        if 'http://' not in first_line:
+            self.process.kill()
+            raise RuntimeError(f"桩服务器启动失败: {first_line!r}")
+        self.base_url = first_line[first_line.index('http://'):].strip()
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.base_url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def run_scenario(corpus, key_count, threads_per_key, base_url, stub, args):
+    """运行一个场景，返回结果字典"""
+    from lib.config import config_loader as config
+    from lib.process import data
+    from lib.process import paper_processor
+    from lib.log import verdict_log
+    from lib.log import tracing
+
+    work_dir = tempfile.mkdtemp(prefix='aps_bench_')
+    try:
+        config.RESULT_FOLDER = os.path.join(work_dir, 'Result')
+        config.LOG_FOLDER = os.path.join(work_dir, 'Log')
+        config.api_base_url = base_url
+        config.API_KEYS = [f"sk-bench-{i:04d}" for i in range(key_count)]
+        config.threads_per_key = threads_per_key
+        data.paper_data = corpus
+
+        stats_before = stub.stats() if stub else None
+        cpu_before = time.process_time()
+        wall_start = time.perf_counter()
+
+        paper_processor.process_papers(
+            config.ResearchQuestion, config.Keywords, config.Requirements, -1,
+            ['benchmark'], 'All years')
+
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_before
+        stats_after = stub.stats() if stub else None
+
+        yon_logs = [os.path.join(config.LOG_FOLDER, name) for name in os.listdir(config.LOG_FOLDER)
+                    if name.startswith('Log_YoN_') and name.endswith('.jsonl')]
+        latencies = []
+        for path in yon_logs:
+            latencies.extend(record.get('latency', 0.0) for record in verdict_log.iter_verdicts(path))
+        latencies.sort()
+        judged = len(latencies)
+
+        phases = {phase: {'count': s['count'], 'mean': s['mean'], 'p95': s['p95']}
+                  for phase, s in tracing.summarize().items() if phase != 'parse'}
+
+        result = {
+            'keys': key_count,
+            'threads_per_key': threads_per_key,
+            'threads': min(key_count * threads_per_key, len(corpus)),
+            'papers': len(corpus),
+            'judged': judged,
+            'failed': len(corpus) - judged,
+            'wall_seconds': wall,
+            'papers_per_second': judged / wall if wall > 0 else 0.0,
+            'latency_seconds': {
+                'mean': sum(latencies) / judged if judged else 0.0,
+                'p50': _percentile(latencies, 0.50),
+                'p95': _percentile(latencies, 0.95),
+                'p99': _percentile(latencies, 0.99),
+                'max': latencies[-1] if latencies else 0.0,
+            },
+            'cpu_seconds': cpu,
+            'cpu_percent': cpu / wall * 100 if wall > 0 else 0.0,
+            'rss_bytes': _current_rss_bytes(),
+            'peak_rss_bytes': _peak_rss_bytes(),
+            'tokens': {
+                'prompt': data.prompt_tokens_used,
+                'completion': data.completion_tokens_used,
+                'cache_hit': data.prompt_cache_hit_tokens_used,
+                'cache_miss': data.prompt_cache_miss_tokens_used,
+            },
+            'phases': phases,
+        }
+        if stats_before is not None and stats_after is not None:
+            result['stub'] = {k: stats_after[k] - stats_before.get(k, 0) for k in stats_after}
+        return result
+    finally:
+        if not args.keep_output:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AutoPaperSearch 端到端吞吐量基准测试')
+    parser.add_argument('--papers', type=int, default=200, help='合成语料的论文数')
+    parser.add_argument('--abstract-words', type=int, default=180, help='摘要平均词数')
+    parser.add_argument('--keys', default='1,4', help='API Key 数量列表，逗号分隔')
+    parser.add_argument('--threads-per-key', default='1', help='每个 Key 的线程数列表，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=1, help='每个场景重复次数')
+    parser.add_argument('--stub-url', default='', help='使用已启动的桩服务器（不再自动启动）')
+    parser.add_argument('--output', default='', help='结果 JSON 路径，默认 benchmark/results/bench_<时间戳>.json')
+    parser.add_argument('--keep-output', action='store_true', help='保留每个场景的 Result/Log 临时文件夹')
+    parser.add_argument('--verbose', action='store_true', help='显示处理过程中的进度输出')
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    from lib.config import config_loader as config
+    from lib.log import utils
+
+    config.ensure_loaded()
+    # 基准测试只关心处理流程本身，关闭完整日志、指标导出和性能分析
+    config.save_full_log = False
+    config.metrics_enabled = False
+    config.profile_cpu = False
+    config.profile_memory = False
+    if not args.verbose:
+        utils.set_output_handler(lambda message: None)
+
+    stub = None
+    base_url = args.stub_url
+    if not base_url:
+        stub = StubProcess(args)
+        base_url = stub.base_url
+
+    corpus = generate_corpus(args.papers, args.abstract_words, args.seed or 0)
+    results = []
+    try:
+        for key_count in _parse_int_list(args.keys):
+            for threads_per_key in _parse_int_list(args.threads_per_key):
+                for run in range(args.repeat):
+                    result = run_scenario(corpus, key_count, threads_per_key, base_url, stub, args)
+                    result['run'] = run + 1
+                    results.append(result)
+                    print(f"keys={key_count:<3} threads/key={threads_per_key:<3} run={run + 1}  "
+                          f"{result['papers_per_second']:8.2f} papers/s  "
+                          f"p95={result['latency_seconds']['p95'] * 1000:8.1f} ms  "
+                          f"cpu={result['cpu_percent']:5.1f}%  "
+                          f"failed={result['failed']}", file=sys.stderr)
+    finally:
+        if stub:
+            stub.stop()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'papers': args.papers,
+            'abstract_words': args.abstract_words,
+            'model_name': config.model_name,
+        },
+        'stub': {
+            'url': args.stub_url or 'local',
+            'latency_dist': args.latency_dist,
+            'latency_mean': args.latency_mean,
+            'latency_spread': args.latency_spread,
+            'error_rate': args.error_rate,
+            'rate_limit_rate': args.rate_limit_rate,
+            'y_rate': args.y_rate,
+            'think': args.think,
+        },
+        'results': results,
+    }
+
+    output = args.output or os.path.join(BENCHMARK_DIR, 'results',
+                                         f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
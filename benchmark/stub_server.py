@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 OpenAI 兼容 /chat/completions 桩服务器
+
+用于在不消耗真实 API 费用的情况下测量处理流程的性能。
+支持可配置的延迟分布、错误和 429 注入、带 prompt_cache_hit_tokens 的 usage 字段、
+</think> 推理前缀，以及 stream=True 的 SSE 流式响应。
+
+用法:
+    python benchmark/stub_server.py --port 8999 --latency-dist lognormal --latency-mean 1.0
+
+GET /stats 返回累计的请求统计。
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# DeepSeek 的前缀缓存以 64 token 为单位
+CACHE_BLOCK_TOKENS = 64
+
+# 多问题模式下用户消息中的问题编号
+MULTI_QUESTION_PATTERN = re.compile(r'#研究主题 (Q\d+)#')
+# 标题初筛请求中的标题编号（每行 "T1: 标题"）
+TITLE_PATTERN = re.compile(r'^(T\d+): ', re.MULTILINE)
+# 精简响应模式：系统提示词带有精简说明时不相关的结果省略理由，要求只输出 relevant 字段时全部省略；
+# 补充理由请求的最后一条用户消息以该标记开头
+COMPACT_MARKER = '精简输出'
+COMPACT_LAZY_MARKER = '只输出 relevant 字段'
+REASON_REQUEST_MARKER = '#补充理由#'
+
+_CJK_RE = re.compile(r'[　-鿿＀-￯]')
+
+
+def estimate_tokens(text):
+    """粗略估算 token 数：中文字符约 0.6 个 token，其他字符约 0.3 个 token"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return int(math.ceil(cjk * 0.6 + (len(text) - cjk) * 0.3))
+
+
+class StubConfig:
+    """
+    桩服务器行为配置
+
+    参数:
+        latency_dist: 延迟分布（constant / uniform / exponential / lognormal）
+        latency_mean: 平均延迟（秒）
+        latency_spread: 分布宽度（uniform 为半宽，lognormal 为 sigma）
+        error_rate: 返回 500 错误的概率
+        rate_limit_rate: 返回 429 的概率
+        retry_after: 429 响应中的 Retry-After（秒）
+        y_rate: 判定为相关（Y）的概率
+        think: 是否在回复前加上 <think>...</think> 推理内容
+        think_tokens: 推理内容的大致 token 数
+        reasoning_content: 推理内容放在 reasoning_content 字段（DeepSeek 推理模型的格式）而不是 <think> 标签中
+        reasoner_latency_scale: 模型名含 reasoner 时延迟乘以该倍数（用于模拟级联判断中的慢模型）
+        title_maybe_rate: 标题初筛中标记为可能相关（M）的概率
+        seed: 随机种子
+        relevant_pattern: 单问题判断时，用户消息匹配该正则（忽略大小写）的论文判定为相关，不再按 y_rate 随机（用于评估本地分类器）
+    """
+
+    def __init__(self, latency_dist='constant', latency_mean=0.2, latency_spread=0.5,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1, y_rate=0.2,
+                 think=False, think_tokens=200, reasoner_latency_scale=1.0, title_maybe_rate=0.3, seed=None,
+                 reasoning_content=False, relevant_pattern=''):
+        self.latency_dist = latency_dist
+        self.latency_mean = latency_mean
+        self.latency_spread = latency_spread
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.y_rate = y_rate
+        self.think = think
+        self.think_tokens = think_tokens
+        self.reasoning_content = reasoning_content
+        self.reasoner_latency_scale = reasoner_latency_scale
+        self.title_maybe_rate = title_maybe_rate
+        self.seed = seed
+        self.relevant_pattern = relevant_pattern
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class StubStats:
+    """桩服务器的请求统计（线程安全）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.ok = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0
+
+    def add(self, field, value=1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + value)
+
+    def as_dict(self):
+        with self._lock:
+            return {k: v for k, v in self.__dict__.items() if not k.startswith('_')}
+
+
+class StubServer:
+    """
+    可在进程内启动的桩服务器
+
+    用法:
+        server = StubServer(StubConfig(latency_mean=0.5)).start()
+        config.api_base_url = server.base_url
+        ...
+        server.stop()
+    """
+
+    def __init__(self, stub_config=None, host='127.0.0.1', port=0):
+        self.config = stub_config or StubConfig()
+        self.stats = StubStats()
+        self._rng = random.Random(self.config.seed)
+        self._rng_lock = threading.Lock()
+        self._seen_prefixes = set()
+        self._prefix_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def sample_latency(self):
+        cfg = self.config
+        with self._rng_lock:
+            if cfg.latency_dist == 'uniform':
+                return max(0.0, self._rng.uniform(cfg.latency_mean - cfg.latency_spread,
+                                                  cfg.latency_mean + cfg.latency_spread))
+            if cfg.latency_dist == 'exponential':
+                return self._rng.expovariate(1.0 / cfg.latency_mean) if cfg.latency_mean > 0 else 0.0
+            if cfg.latency_dist == 'lognormal':
+                sigma = cfg.latency_spread
+                mu = math.log(cfg.latency_mean) - sigma * sigma / 2 if cfg.latency_mean > 0 else 0.0
+                return self._rng.lognormvariate(mu, sigma)
+        return cfg.latency_mean
+
+    def cache_hit_tokens(self, messages):
+        """
+        模拟前缀缓存：system 消息第一次出现时全部未命中，
+        之后同样的前缀按 64 token 的整数倍命中
+        """
+        if not messages:
+            return 0
+        prefix = messages[0].get('content', '')
+        prefix_tokens = estimate_tokens(prefix)
+        with self._prefix_lock:
+            if prefix in self._seen_prefixes:
+                return (prefix_tokens // CACHE_BLOCK_TOKENS) * CACHE_BLOCK_TOKENS
+            self._seen_prefixes.add(prefix)
+        return 0
+
+    def build_completion(self, body):
+        cfg = self.config
+        messages = body.get('messages', [])
+        # 多问题请求（用户消息中带 #研究主题 Q1# 等编号）按编号分别返回判断
+        user_content = messages[-1].get('content', '') if messages else ''
+        system_content = messages[0].get('content', '') if messages else ''
+        question_ids = MULTI_QUESTION_PATTERN.findall(user_content)
+        title_ids = TITLE_PATTERN.findall(user_content)
+        compact = COMPACT_MARKER in system_content
+        lazy = COMPACT_LAZY_MARKER in system_content
+
+        def verdict_for(relevant):
+            if lazy or (compact and relevant == 'N'):
+                return {'relevant': relevant}
+            return {'relevant': relevant, 'reason': f"stub verdict {relevant}"}
+
+        if user_content.startswith(REASON_REQUEST_MARKER):
+            content = json.dumps({'reason': 'stub verdict Y'}, ensure_ascii=False)
+        elif title_ids:
+            labels = {title_id: 'M' if self.random() < cfg.title_maybe_rate else 'N' for title_id in title_ids}
+            content = json.dumps(labels, ensure_ascii=False)
+        elif question_ids:
+            verdicts = {}
+            for question_id in question_ids:
+                relevant = 'Y' if self.random() < cfg.y_rate else 'N'
+                verdicts[question_id] = verdict_for(relevant)
+            content = json.dumps(verdicts, ensure_ascii=False)
+        else:
+            if cfg.relevant_pattern:
+                relevant = 'Y' if re.search(cfg.relevant_pattern, user_content, re.IGNORECASE) else 'N'
+            else:
+                relevant = 'Y' if self.random() < cfg.y_rate else 'N'
+            verdict = verdict_for(relevant)
+            # 系统提示词要求给出置信度时（级联判断的初筛）返回随机置信度
+            if 'confidence' in system_content:
+                verdict['confidence'] = round(self.random(), 2)
+            content = json.dumps(verdict, ensure_ascii=False)
+        reasoning = ''
+        if cfg.think:
+            reasoning = ' '.join(['thinking'] * max(1, cfg.think_tokens))
+            if not cfg.reasoning_content:
+                content = f"<think>{reasoning}</think>{content}"
+                reasoning = ''
+
+        prompt_tokens = sum(estimate_tokens(m.get('content', '')) for m in messages)
+        cache_hit = min(prompt_tokens, self.cache_hit_tokens(messages))
+        completion_tokens = estimate_tokens(content) + estimate_tokens(reasoning)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_cache_hit_tokens': cache_hit,
+            'prompt_cache_miss_tokens': prompt_tokens - cache_hit,
+        }
+        self.stats.add('prompt_tokens', prompt_tokens)
+        self.stats.add('completion_tokens', completion_tokens)
+        self.stats.add('cache_hit_tokens', cache_hit)
+        return content, usage, reasoning
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload, headers=None):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                # 统计信息，供基准测试脚本在每个场景前后读取
+                if self.path.rstrip('/') == '/stats':
+                    self._send_json(200, server.stats.as_dict())
+                else:
+                    self._send_json(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length) if length else b'{}'
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'not found'}})
+                    return
+
+                server.stats.add('requests')
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    self._send_json(400, {'error': {'message': 'invalid json'}})
+                    return
+
+                latency = server.sample_latency()
+                if 'reasoner' in str(body.get('model', '')):
+                    latency *= server.config.reasoner_latency_scale
+                time.sleep(latency)
+
+                roll = server.random()
+                if roll < server.config.rate_limit_rate:
+                    server.stats.add('rate_limited')
+                    self._send_json(429, {'error': {'message': 'rate limited', 'type': 'rate_limit_error'}},
+                                    {'Retry-After': str(server.config.retry_after)})
+                    return
+                if roll < server.config.rate_limit_rate + server.config.error_rate:
+                    server.stats.add('errors')
+                    self._send_json(500, {'error': {'message': 'injected error', 'type': 'server_error'}})
+                    return
+
+                content, usage, reasoning = server.build_completion(body)
+                server.stats.add('ok')
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                created = int(time.time())
+                model = body.get('model', 'deepseek-chat')
+
+                if body.get('stream'):
+                    self._send_stream(completion_id, created, model, content, usage, body, reasoning)
+                    return
+
+                message = {'role': 'assistant', 'content': content}
+                if reasoning:
+                    message['reasoning_content'] = reasoning
+
+                self._send_json(200, {
+                    'id': completion_id,
+                    'object': 'chat.completion',
+                    'created': created,
+                    'model': model,
+                    'choices': [{
+                        'index': 0,
+                        'message': message,
+                        'finish_reason': 'stop',
+                    }],
+                    'usage': usage,
+                })
+
+            def _send_stream(self, completion_id, created, model, content, usage, body, reasoning=''):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+
+                def chunk(delta, finish_reason=None, chunk_usage=None):
+                    payload = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': created,
+                        'model': model,
+                        'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}],
+                    }
+                    if chunk_usage is not None:
+                        payload['usage'] = chunk_usage
+                    self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+                chunk({'role': 'assistant', 'content': ''})
+                step = 16
+                for i in range(0, len(reasoning), step):
+                    chunk({'reasoning_content': reasoning[i:i + step]})
+                for i in range(0, len(content), step):
+                    chunk({'content': content[i:i + step]})
+                include_usage = (body.get('stream_options') or {}).get('include_usage', False)
+                chunk({}, 'stop', usage if include_usage else None)
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def add_stub_arguments(parser):
+    """向 argparse 解析器添加桩服务器行为参数（基准测试脚本复用）"""
+    parser.add_argument('--latency-dist', default='constant',
+                        choices=['constant', 'uniform', 'exponential', 'lognormal'], help='延迟分布')
+    parser.add_argument('--latency-mean', type=float, default=0.2, help='平均延迟（秒）')
+    parser.add_argument('--latency-spread', type=float, default=0.5, help='uniform 半宽 / lognormal sigma')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500 错误概率')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='429 概率')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 的 Retry-After（秒）')
+    parser.add_argument('--y-rate', type=float, default=0.2, help='判定为相关的概率')
+    parser.add_argument('--think', action='store_true', help='在回复前加入 <think> 推理内容')
+    parser.add_argument('--think-tokens', type=int, default=200, help='推理内容的大致 token 数')
+    parser.add_argument('--reasoning-content', action='store_true',
+                        help='推理内容放在 reasoning_content 字段（DeepSeek 格式），而不是 <think> 标签中')
+    parser.add_argument('--reasoner-latency-scale', type=float, default=1.0, help='reasoner 模型的延迟倍数')
+    parser.add_argument('--title-maybe-rate', type=float, default=0.3, help='标题初筛中判为可能相关的概率')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--relevant-pattern', default='',
+                        help='单问题判断时用户消息匹配该正则的论文判定为相关（不再按 --y-rate 随机）')
+
+
+def stub_config_from_args(args):
+    return StubConfig(
+        latency_dist=args.latency_dist,
+        latency_mean=args.latency_mean,
+        latency_spread=args.latency_spread,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        y_rate=args.y_rate,
+        think=args.think,
+        think_tokens=args.think_tokens,
+        reasoner_latency_scale=args.reasoner_latency_scale,
+        title_maybe_rate=args.title_maybe_rate,
+        seed=args.seed,
+        reasoning_content=args.reasoning_content,
+        relevant_pattern=args.relevant_pattern,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 OpenAI 兼容 /chat/completions 桩服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8999)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = StubServer(stub_config_from_args(args), args.host, args.port)
+    # 基准测试脚本从第一行输出中读取地址（端口为 0 时由系统分配）
+    print(f"桩服务器已启动: {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats.as_dict(), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -36,6 +36,8 @@ def get_text(language_code):
     else:  # 默认使用中文
         return _load_language_data('zh_CN')
 
-# 为了保持向后兼容性，提供直接访问的变量
-zh_CN = _load_language_data('zh_CN')
-en_US = _load_language_data('en_US')
\ No newline at end of file
+def __getattr__(name):
+    """为了保持向后兼容性，language.zh_CN / language.en_US 在首次访问时才加载"""
+    if name in ('zh_CN', 'en_US'):
+        return _load_language_data(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
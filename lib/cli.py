@@ -0,0 +1,548 @@
+"""
+命令行入口（无界面），用于在服务器上批量运行
+
+用法:
+    python -m autopapersearch run --config config.json --folders CHI,UIST --years 2018-2024 \\
+        --question "..." --threads-per-key 2
+    python -m autopapersearch jobs jobs.json --policy fair
+    python -m autopapersearch jobs jobs.json --multi-question
+    python -m autopapersearch plan --folders CHI --question "..."
+
+进度以单行形式输出到标准错误；完整输出仍按 save_full_log 写入 Log_ALL 文件。
+启动过程不导入 tkinter。
+
+退出码:
+    0  全部论文处理完成
+    1  运行失败（配置错误、没有 API 密钥或论文、处理过程异常）
+    2  命令行参数错误
+    3  运行完成，但部分论文判断失败或因达到预算上限未判断
+    130 被用户中断
+"""
+
+import argparse
+import os
+import sys
+import threading
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_PARTIAL = 3
+EXIT_INTERRUPTED = 130
+
+
+def _stderr(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def _parse_year_range(text):
+    """解析 '2018-2024' 或 '2020' 形式的年份范围"""
+    parts = [p.strip() for p in text.split('-')]
+    try:
+        if len(parts) == 1:
+            start = end = int(parts[0])
+        elif len(parts) == 2:
+            start, end = int(parts[0]), int(parts[1])
+        else:
+            raise ValueError
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的年份范围: {text!r}（例如 2018-2024）")
+    return min(start, end), max(start, end)
+
+
+def _format_eta(seconds):
+    if seconds is None:
+        return '--:--:--'
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+class CompactProgress:
+    """
+    在标准错误输出单行进度（终端中原地刷新，重定向到文件时逐行追加）
+
+    参数:
+        interval: 刷新间隔（秒）
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.is_tty = sys.stderr.isatty()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _line(self):
+        from .log import utils
+        from .process import data
+        from .process import accounting
+        from .price import price
+
+        total = data.total_papers_to_process
+        processed, busy_time = utils.get_progress_snapshot()
+        percent = processed / total * 100 if total else 0.0
+        remaining = utils.estimate_remaining_seconds(total - processed, processed, busy_time)
+        tokens = accounting.snapshot()
+        cost = price.calculate_token_price(tokens['prompt'], tokens['completion'],
+                                           tokens['cache_hit'], tokens['cache_miss'])
+        cached = tokens['cache_hit'] + tokens['cache_miss']
+        return (f"[{percent:5.1f}%] {processed}/{total}  "
+                f"{data.throughput_ewma or 0.0:.2f} papers/s  "
+                f"ETA {_format_eta(remaining)}  "
+                f"{price.format_price(cost)}  "
+                f"cache {tokens['cache_hit'] / cached * 100 if cached else 0.0:.0f}%")
+
+    def _emit(self, final=False):
+        line = self._line()
+        if self.is_tty:
+            sys.stderr.write('\r' + line.ljust(79) + ('\n' if final else ''))
+            sys.stderr.flush()
+        else:
+            _stderr(line)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self._emit()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._emit(final=True)
+
+
+def _apply_overrides(args, config):
+    """把命令行参数写入 config（只影响本次运行，不保存到 config.json）"""
+    for attr, value in (
+        ('DATA_FOLDER', args.data_folder),
+        ('APIKEY_FOLDER', args.apikey_folder),
+        ('RESULT_FOLDER', args.result_folder),
+        ('LOG_FOLDER', args.log_folder),
+        ('ResearchQuestion', args.question),
+        ('Keywords', args.keywords),
+        ('Requirements', args.requirements),
+        ('model_name', args.model),
+        ('api_base_url', args.base_url),
+        ('threads_per_key', args.threads_per_key),
+        ('cassette_mode', args.cassette_mode),
+        ('cassette_path', args.cassette_path),
+        ('cascade_model', args.cascade_model),
+        ('cascade_confidence_threshold', args.cascade_threshold),
+        ('title_prescreen_batch_size', args.title_batch_size),
+        ('max_input_tokens', args.max_input_tokens),
+        ('offpeak_threads_per_key', args.offpeak_threads),
+        ('offpeak_outside_threads_per_key', args.offpeak_outside_threads),
+        ('reason_max_tokens', args.reason_max_tokens),
+        ('reasoning_token_cap', args.reasoning_cap),
+        ('budget_limit_cny', args.budget),
+        ('budget_limit_tokens', args.budget_tokens),
+        ('local_classifier_threshold', args.classifier_threshold),
+        ('local_classifier_seed_size', args.classifier_seed),
+        ('local_classifier_audit_rate', args.classifier_audit),
+        ('near_duplicate_threshold', args.duplicate_threshold),
+        ('near_duplicate_audit_rate', args.duplicate_audit),
+        ('keyword_prefilter_mode', args.keyword_mode),
+        ('quality_gate_missing_abstract', args.gate_missing_abstract),
+        ('quality_gate_non_paper', args.gate_non_paper),
+        ('quality_gate_short_text', args.gate_short_text),
+        ('quality_gate_min_abstract_words', args.gate_min_words),
+        ('LANGUAGE', args.language),
+    ):
+        if value is not None:
+            setattr(config, attr, value)
+
+    if args.years is not None:
+        config.INCLUDE_ALL_YEARS = False
+        config.YEAR_RANGE_START, config.YEAR_RANGE_END = args.years
+    if args.all_years:
+        config.INCLUDE_ALL_YEARS = True
+    if args.no_full_log:
+        config.save_full_log = False
+    if args.cascade:
+        config.cascade_enabled = True
+    if args.title_prescreen:
+        config.title_prescreen_enabled = True
+    if args.no_normalize:
+        config.normalize_abstracts = False
+    if args.offpeak:
+        config.offpeak_enabled = True
+    if args.no_stream:
+        config.stream_reasoner = False
+    if args.compact:
+        config.compact_response = True
+    if args.lazy_reasons:
+        config.compact_response = True
+        config.compact_lazy_reasons = True
+    if args.local_classifier:
+        config.local_classifier_enabled = True
+    if args.near_duplicates:
+        config.near_duplicate_enabled = True
+    if args.quality_gate:
+        config.quality_gate_enabled = True
+    if args.no_sample_reuse:
+        config.sample_reuse = False
+    if args.trace:
+        config.tracing_enabled = True
+    if args.profile_cpu:
+        config.profile_cpu = True
+    if args.profile_memory:
+        config.profile_memory = True
+
+
+def _year_range_info(config, lang):
+    if config.INCLUDE_ALL_YEARS:
+        return lang['year_range_all']
+    return lang['year_range_specific'].format(start=config.YEAR_RANGE_START, end=config.YEAR_RANGE_END)
+
+
+def _prepare(args, require_keys=True):
+    """
+    加载配置、API 密钥和语料（各子命令共用）
+
+    参数:
+        require_keys: 为 False 时没有 API 密钥也继续（离线估算不发送请求）
+
+    返回:
+        (退出码, 语言文本, 选择的文件夹)；退出码不为 None 时表示准备失败
+    """
+    from .config import config_loader as config
+    from .log import utils
+    from .process import data
+    from .load_data import load_paper
+    from .load_data.load_api_keys import load_api_keys_from_files
+    from language import language
+
+    if args.config:
+        config.CONFIG_FILE = os.path.abspath(args.config)
+    config.ensure_loaded()
+    _apply_overrides(args, config)
+    lang = language.get_text(config.LANGUAGE)
+
+    # 详细模式下输出全部信息，否则只保留单行进度
+    if args.verbose:
+        utils.set_output_handler(_stderr)
+    else:
+        utils.set_output_handler(lambda message: None)
+
+    for attr in ('DATA_FOLDER', 'APIKEY_FOLDER', 'RESULT_FOLDER', 'LOG_FOLDER'):
+        if getattr(config, attr) == 'default':
+            _stderr(lang['cli_folder_not_set'].format(name=attr))
+            return EXIT_FAILURE, lang, None
+
+    load_api_keys_from_files()
+    if args.max_keys:
+        del config.API_KEYS[args.max_keys:]
+    if require_keys and not config.API_KEYS:
+        _stderr(lang['no_api_keys'])
+        _stderr(lang['add_api_keys'])
+        return EXIT_FAILURE, lang, None
+
+    available = load_paper.get_subfolders()
+    if args.folders:
+        selected_folders = [f.strip() for f in args.folders.split(',') if f.strip()]
+        unknown = [f for f in selected_folders if f not in available]
+        if unknown:
+            _stderr(lang['cli_unknown_folders'].format(folders=', '.join(unknown), available=', '.join(sorted(available))))
+            return EXIT_FAILURE, lang, None
+    else:
+        selected_folders = available
+
+    # 语料只读取一次，所有任务共享
+    data.paper_data.clear()
+    load_paper.read_bib_files(selected_folders)
+    if not data.paper_data:
+        _stderr(lang['no_papers'])
+        _stderr(lang['check_data_folder'])
+        return EXIT_FAILURE, lang, None
+
+    return None, lang, selected_folders
+
+
+def _execute(args, lang, run):
+    """带单行进度执行一次运行，返回退出码"""
+    from .process import data
+    from .process import accounting
+
+    progress = None if args.verbose else CompactProgress(args.progress_interval or (1.0 if sys.stderr.isatty() else 10.0)).start()
+    try:
+        jobs = run()
+    except KeyboardInterrupt:
+        _stderr(lang['cli_interrupted'])
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        _stderr(f"{lang['error_occurred']} {e}")
+        return EXIT_FAILURE
+    finally:
+        if progress:
+            progress.stop()
+
+    judged = accounting.merge_accounts()['totals']['papers']
+    total = data.total_papers_to_process
+    unjudged = sum(job.unjudged for job in jobs)
+    for job in jobs:
+        _stderr(lang['cli_run_done'].format(judged=accounting.merge_accounts(job.accounts)['totals']['papers'],
+                                            total=job.total, result=job.result_file_path))
+    if unjudged:
+        _stderr(lang['cli_budget_stopped'].format(count=unjudged))
+    if judged + unjudged < total:
+        _stderr(lang['cli_papers_failed'].format(count=total - judged - unjudged))
+    if judged < total:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def cmd_run(args):
+    """run 子命令：读取 .bib 文件并处理论文"""
+    from .config import config_loader as config
+    from .process import data
+    from .process.paper_processor import process_papers
+
+    code, lang, selected_folders = _prepare(args)
+    if code is not None:
+        return code
+
+    limit = args.limit if args.limit else -1
+    _stderr(lang['cli_run_start'].format(papers=min(len(data.paper_data), limit) if limit > 0 else len(data.paper_data),
+                                         keys=len(config.API_KEYS), threads_per_key=config.threads_per_key))
+
+    return _execute(args, lang, lambda: [process_papers(
+        config.ResearchQuestion, config.Keywords, config.Requirements, limit,
+        selected_folders, _year_range_info(config, lang))])
+
+
+def cmd_sample(args):
+    """sample 子命令：分层抽样判断一部分论文，推算全部论文的相关比例、token、费用和耗时"""
+    from .config import config_loader as config
+    from .process import data
+    from .process import sampling
+
+    code, lang, selected_folders = _prepare(args)
+    if code is not None:
+        return code
+
+    size = min(args.size if args.size is not None else config.sample_size, len(data.paper_data))
+    _stderr(lang['cli_run_start'].format(papers=size, keys=len(config.API_KEYS), threads_per_key=config.threads_per_key))
+
+    estimates = []
+
+    def run():
+        job, estimate = sampling.run_sample(config.ResearchQuestion, config.Keywords, config.Requirements, size,
+                                            selected_folders, _year_range_info(config, lang), args.seed)
+        estimates.append(estimate)
+        return [job]
+
+    code = _execute(args, lang, run)
+    for estimate in estimates:
+        for line in estimate.format_lines(lang):
+            print(line, flush=True)
+    return code
+
+
+def _load_job_file(path):
+    """读取任务文件，返回 {"jobs": [...], ...}；读取失败时输出错误并返回 None"""
+    import json
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            job_file = json.load(f)
+    except (OSError, ValueError) as e:
+        _stderr(f"{path}: {e}")
+        return None
+    # 任务文件可以是任务列表，也可以是 {"policy": ..., "jobs": [...]}
+    if isinstance(job_file, list):
+        job_file = {'jobs': job_file}
+    return job_file
+
+
+def _build_file_jobs(path, job_file, lang):
+    """按任务文件创建 Job 列表；出错时输出错误并返回 None"""
+    from .process import data
+    from .process.job import build_jobs
+
+    try:
+        jobs = build_jobs(job_file.get('jobs', []), data.paper_data)
+    except ValueError as e:
+        _stderr(f"{path}: {e}")
+        return None
+    if not jobs:
+        _stderr(lang['cli_no_jobs'].format(path=path))
+        return None
+    return jobs
+
+
+def cmd_jobs(args):
+    """jobs 子命令：在同一个 API 密钥池上同时运行任务文件中的多个查询"""
+    from .config import config_loader as config
+    from .process.paper_processor import run_jobs
+
+    job_file = _load_job_file(args.job_file)
+    if job_file is None:
+        return EXIT_FAILURE
+    policy = args.policy or job_file.get('policy', 'fair')
+    multi_question = args.multi_question or bool(job_file.get('multi_question', False))
+
+    code, lang, selected_folders = _prepare(args)
+    if code is not None:
+        return code
+
+    jobs = _build_file_jobs(args.job_file, job_file, lang)
+    if jobs is None:
+        return EXIT_FAILURE
+
+    _stderr(lang['cli_jobs_start'].format(jobs=len(jobs), papers=sum(job.total for job in jobs),
+                                          keys=len(config.API_KEYS), threads_per_key=config.threads_per_key,
+                                          policy='multi-question' if multi_question else policy))
+
+    def run():
+        run_jobs(jobs, selected_folders, _year_range_info(config, lang), policy, multi_question)
+        return jobs
+
+    return _execute(args, lang, run)
+
+
+def cmd_plan(args):
+    """plan 子命令：不发送请求，离线估算运行所需的token、耗时和费用"""
+    from .config import config_loader as config
+    from .process import data
+    from .process import planner
+    from .process.job import Job
+
+    job_file = None
+    if args.job_file:
+        job_file = _load_job_file(args.job_file)
+        if job_file is None:
+            return EXIT_FAILURE
+
+    code, lang, _ = _prepare(args, require_keys=False)
+    if code is not None:
+        return code
+
+    if job_file is not None:
+        jobs = _build_file_jobs(args.job_file, job_file, lang)
+        if jobs is None:
+            return EXIT_FAILURE
+    else:
+        paper_count = len(data.paper_data)
+        limit = min(args.limit, paper_count) if args.limit else paper_count
+        jobs = [Job(config.ResearchQuestion, config.Keywords, config.Requirements, range(1, limit + 1))]
+
+    for line in planner.format_plan(planner.estimate(jobs), lang):
+        print(line, flush=True)
+    return EXIT_OK
+
+
+def _add_common_arguments(parser):
+    """各子命令共用的参数"""
+    parser.add_argument('--config', help='config.json 路径（默认使用程序目录下的 config.json）')
+    parser.add_argument('--data-folder', help='覆盖 DATA_FOLDER')
+    parser.add_argument('--apikey-folder', help='覆盖 APIKEY_FOLDER')
+    parser.add_argument('--result-folder', help='覆盖 RESULT_FOLDER')
+    parser.add_argument('--log-folder', help='覆盖 LOG_FOLDER')
+    parser.add_argument('--folders', help='DATA_FOLDER 下的子文件夹，逗号分隔（默认全部）')
+    years = parser.add_mutually_exclusive_group()
+    years.add_argument('--years', type=_parse_year_range, help='年份范围，例如 2018-2024')
+    years.add_argument('--all-years', action='store_true', help='包含所有年份的文件')
+    parser.add_argument('--model', help='模型名称（覆盖 model_name）')
+    parser.add_argument('--base-url', help='API 服务地址（覆盖 api_base_url）')
+    parser.add_argument('--threads-per-key', type=int, help='每个 API 密钥同时使用的线程数')
+    parser.add_argument('--max-keys', type=int, help='最多使用的 API 密钥数')
+    parser.add_argument('--cassette-mode', choices=['off', 'record', 'replay'], help='API 响应磁带模式')
+    parser.add_argument('--cassette-path', help='磁带文件路径')
+    parser.add_argument('--cascade', action='store_true', help='启用级联判断（先用 model_name 初筛，置信度低的论文交给 cascade_model）')
+    parser.add_argument('--cascade-model', help='级联判断的第二级模型（覆盖 cascade_model）')
+    parser.add_argument('--cascade-threshold', type=float, help='初筛置信度阈值（覆盖 cascade_confidence_threshold）')
+    parser.add_argument('--title-prescreen', action='store_true', help='启用标题初筛（先按标题批量排除明显无关的论文）')
+    parser.add_argument('--title-batch-size', type=int, help='标题初筛每次请求的标题数（覆盖 title_prescreen_batch_size）')
+    parser.add_argument('--max-input-tokens', type=int, help='单次请求的输入token上限，超出时截断摘要，0 表示不限制（覆盖 max_input_tokens）')
+    parser.add_argument('--no-normalize', action='store_true', help='不清理标题和摘要中的 LaTeX / HTML 标记')
+    parser.add_argument('--offpeak', action='store_true', help='错峰运行：优惠时段内提高并发，时段外降低并发或暂停')
+    parser.add_argument('--offpeak-threads', type=int, help='优惠时段内每个密钥的线程数（覆盖 offpeak_threads_per_key）')
+    parser.add_argument('--offpeak-outside-threads', type=int,
+                        help='优惠时段外每个密钥的线程数，0 表示暂停（覆盖 offpeak_outside_threads_per_key）')
+    parser.add_argument('--compact', action='store_true', help='精简响应：不相关的论文不输出理由')
+    parser.add_argument('--lazy-reasons', action='store_true',
+                        help='精简响应，且相关论文的理由在判断后单独请求（隐含 --compact）')
+    parser.add_argument('--reason-max-tokens', type=int, help='精简响应模式下包含理由的响应的 max_tokens（覆盖 reason_max_tokens）')
+    parser.add_argument('--no-stream', action='store_true', help='推理模型不使用流式响应')
+    parser.add_argument('--reasoning-cap', type=int, help='单次请求的推理token上限，0 表示不限制（覆盖 reasoning_token_cap）')
+    parser.add_argument('--budget', type=float, help='本次运行的花费上限（元），0 表示不限制（覆盖 budget_limit_cny）')
+    parser.add_argument('--budget-tokens', type=int, help='本次运行的token用量上限，0 表示不限制（覆盖 budget_limit_tokens）')
+    parser.add_argument('--local-classifier', action='store_true',
+                        help='启用本地相关性分类器：相关概率极低的论文不发送请求（需安装 numpy）')
+    parser.add_argument('--classifier-threshold', type=float, help='相关概率低于该值的论文跳过（覆盖 local_classifier_threshold）')
+    parser.add_argument('--classifier-seed', type=int, help='历史判断结果不足时先抽样判断的论文数（覆盖 local_classifier_seed_size）')
+    parser.add_argument('--classifier-audit', type=float, help='低于阈值的论文中仍抽查的比例（覆盖 local_classifier_audit_rate）')
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help='摘要近似重复的论文沿用簇中第一篇的判断结果（需安装 numpy）')
+    parser.add_argument('--duplicate-threshold', type=float, help='合并为同一簇的最低相似度（覆盖 near_duplicate_threshold）')
+    parser.add_argument('--duplicate-audit', type=float, help='沿用判断的论文中仍抽查的比例（覆盖 near_duplicate_audit_rate）')
+    parser.add_argument('--keyword-mode', choices=['off', 'tag', 'filter', 'prioritize'],
+                        help='关键词预筛：只记录命中的关键词 / 未命中的论文记为 N / 命中多的先判断（覆盖 keyword_prefilter_mode）')
+    parser.add_argument('--quality-gate', action='store_true',
+                        help='启用条目质量检查：缺少摘要、不是论文或摘要过短的条目按类别只根据标题判断、跳过或照常判断')
+    gate_actions = ['title', 'skip', 'include']
+    parser.add_argument('--gate-missing-abstract', choices=gate_actions, help='缺少摘要的条目（覆盖 quality_gate_missing_abstract）')
+    parser.add_argument('--gate-non-paper', choices=gate_actions, help='不是论文的条目（覆盖 quality_gate_non_paper）')
+    parser.add_argument('--gate-short-text', choices=gate_actions, help='摘要过短的条目（覆盖 quality_gate_short_text）')
+    parser.add_argument('--gate-min-words', type=int, help='摘要少于该单词数时视为过短（覆盖 quality_gate_min_abstract_words）')
+    parser.add_argument('--no-sample-reuse', action='store_true', help='不复用抽样运行中已判断的论文（覆盖 sample_reuse）')
+    parser.add_argument('--language', choices=['zh_CN', 'en_US'], help='输出语言')
+    parser.add_argument('--no-full-log', action='store_true', help='不写入 Log_ALL_*.txt')
+    parser.add_argument('--trace', action='store_true', help='统计各阶段耗时，运行结束时输出 p50/p95/p99（覆盖 tracing_enabled）')
+    parser.add_argument('--profile-cpu', action='store_true', help='用 cProfile 分析整个运行，结果保存到 LOG_FOLDER（覆盖 profile_cpu）')
+    parser.add_argument('--profile-memory', action='store_true', help='用 tracemalloc 统计内存分配，结果保存到 LOG_FOLDER（覆盖 profile_memory）')
+    parser.add_argument('--progress-interval', type=float, help='进度输出间隔（秒）')
+    parser.add_argument('-v', '--verbose', action='store_true', help='在标准错误输出完整日志，而不是单行进度')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='autopapersearch', description='AutoPaperSearch 命令行（无界面）')
+    subparsers = parser.add_subparsers(dest='command', metavar='命令')
+    subparsers.required = True
+
+    run = subparsers.add_parser('run', help='不启动界面，直接读取 .bib 文件并判断论文相关性')
+    _add_common_arguments(run)
+    run.add_argument('--question', help='研究问题（覆盖 ResearchQuestion）')
+    run.add_argument('--keywords', help='关键词（覆盖 Keywords）')
+    run.add_argument('--requirements', help='筛选要求（覆盖 Requirements）')
+    run.add_argument('--limit', type=int, help='只处理前 N 篇论文')
+    run.set_defaults(func=cmd_run)
+
+    jobs = subparsers.add_parser('jobs', help='在同一个 API 密钥池上同时运行多个查询任务（语料只读取一次）')
+    jobs.add_argument('job_file', help='任务文件（JSON），格式见 README')
+    jobs.add_argument('--policy', choices=['fair', 'priority'], help='调度策略（默认使用任务文件中的 policy，否则为 fair）')
+    jobs.add_argument('--multi-question', action='store_true',
+                      help='每篇论文只发送一次请求，同时判断所有任务的问题（忽略调度策略）')
+    _add_common_arguments(jobs)
+    jobs.set_defaults(func=cmd_jobs, question=None, keywords=None, requirements=None, limit=None)
+
+    sample = subparsers.add_parser('sample', help='按文件夹和年份分层抽样判断一部分论文，推算全部论文的相关比例、token、费用和耗时')
+    _add_common_arguments(sample)
+    sample.add_argument('--question', help='研究问题（覆盖 ResearchQuestion）')
+    sample.add_argument('--keywords', help='关键词（覆盖 Keywords）')
+    sample.add_argument('--requirements', help='筛选要求（覆盖 Requirements）')
+    sample.add_argument('--size', type=int, help='抽样的论文数（覆盖 sample_size）')
+    sample.add_argument('--seed', type=int, help='抽样的随机种子（覆盖 sample_seed）')
+    sample.set_defaults(func=cmd_sample)
+
+    plan = subparsers.add_parser('plan', help='不发送请求，离线估算所选语料的token用量、耗时和费用')
+    _add_common_arguments(plan)
+    plan.add_argument('--question', help='研究问题（覆盖 ResearchQuestion）')
+    plan.add_argument('--keywords', help='关键词（覆盖 Keywords）')
+    plan.add_argument('--requirements', help='筛选要求（覆盖 Requirements）')
+    plan.add_argument('--limit', type=int, help='只估算前 N 篇论文')
+    plan.add_argument('--job-file', help='按任务文件估算多个查询（忽略 --question 等参数）')
+    plan.set_defaults(func=cmd_plan)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return EXIT_INTERRUPTED
@@ -7,6 +7,68 @@ CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__fil
 
 # 全局变量，用于存储配置
 save_full_log = True
+progress_interval = 1.0  # 进度信息输出间隔（秒）
+threads_per_key = 1  # 每个API密钥同时使用的线程数
+# 指标导出设置
+metrics_enabled = False  # 是否导出Prometheus格式的运行指标
+metrics_file = ''  # 指标文件路径，为空时写入LOG_FOLDER/metrics.prom
+metrics_interval = 15.0  # 指标文件重写间隔（秒）
+metrics_http_port = 0  # 本地HTTP端点端口（/metrics），0表示不开启
+# 性能分析设置
+tracing_enabled = False  # 是否统计各阶段耗时（解析、构建提示词、网络、JSON解析、写文件）
+profile_cpu = False  # 是否用cProfile分析整个运行
+profile_memory = False  # 是否用tracemalloc统计内存分配
+# API响应磁带（录制/回放）设置
+cassette_mode = 'off'  # 'off'、'record'（录制真实响应）或 'replay'（从磁带回放，不访问网络）
+cassette_path = ''  # 磁带文件路径，为空时使用LOG_FOLDER/Cassette.jsonl.gz
+cassette_latency_scale = 0.0  # 回放时按录制耗时的倍数等待，0表示不等待
+# 级联判断设置：先用 model_name 初筛，置信度低的论文再交给 cascade_model 判断
+cascade_enabled = False
+cascade_model = 'deepseek-reasoner'
+cascade_confidence_threshold = 0.8  # 初筛置信度低于该值时升级
+# 标题初筛设置：先按标题批量排除明显无关的论文，其余论文再结合摘要判断
+title_prescreen_enabled = False
+title_prescreen_batch_size = 40  # 每次请求包含的标题数
+# 提示词预处理：清理摘要中的 LaTeX / HTML 标记，并限制单篇论文的输入token数
+normalize_abstracts = True
+max_input_tokens = 2000  # 单次请求的输入token上限，超出时截断摘要；0 表示不限制
+tokenizer_path = ''  # 与模型配套的 tokenizer.json（需安装 tokenizers），为空时按字符估算
+# 错峰运行：优惠时段（北京时间 00:30-08:30）内提高并发，时段外降低并发或暂停
+offpeak_enabled = False
+offpeak_threads_per_key = 4  # 优惠时段内每个密钥的线程数
+offpeak_outside_threads_per_key = 0  # 优惠时段外每个密钥的线程数，0 表示暂停到下一个优惠时段
+# 精简响应：不相关的论文不输出理由（相关论文的理由可改为判断后单独请求）
+compact_response = False
+compact_lazy_reasons = False  # 判断时相关论文也不输出理由，之后单独请求补充
+reason_max_tokens = 200  # 精简响应模式下包含理由的响应的 max_tokens
+# 推理模型（模型名含 reasoner）使用流式响应：推理内容只计数不保存，判断结果完整后即解析
+stream_reasoner = True
+reasoning_token_cap = 0  # 单次请求的推理token上限，超出时中止请求；0 表示不限制
+# 预算上限：接近上限时停止派发新的论文，0 表示不限制
+budget_limit_cny = 0  # 一次运行的花费上限（元）
+budget_limit_tokens = 0  # 一次运行的token用量上限
+# 本地相关性分类器：用已有的判断结果训练，相关概率极低的论文不再发送请求（需安装 numpy）
+local_classifier_enabled = False
+local_classifier_threshold = 0.02  # 相关概率低于该值的论文跳过
+local_classifier_seed_size = 300  # 历史判断结果不足时，先随机抽取判断的论文数
+local_classifier_audit_rate = 0.05  # 低于阈值的论文中仍发送请求抽查的比例
+# 近似重复：摘要几乎相同的论文（同一工作的不同版本）沿用簇中第一篇的判断结果（需安装 numpy）
+near_duplicate_enabled = False
+near_duplicate_threshold = 0.7  # 合并为同一簇的最低估计相似度（摘要单词 3-gram 的 Jaccard 相似度）
+near_duplicate_audit_rate = 0.0  # 沿用判断的论文中仍发送请求抽查的比例
+# 关键词预筛：发送请求前在本地扫描标题和摘要中的关键词，off / tag（只记录）/ filter（未命中记为 N）/ prioritize（命中多的先判断）
+keyword_prefilter_mode = 'off'
+keyword_synonyms = {}  # {关键词: [同义词, ...]}，同义词命中时计入该关键词
+# 条目质量检查：缺少摘要、不是论文或摘要过短的条目按类别 title（只根据标题按批判断）/ skip（跳过）/ include（照常判断）
+quality_gate_enabled = False
+quality_gate_missing_abstract = 'title'
+quality_gate_non_paper = 'skip'  # 会议前言、Session details、Keynote 等
+quality_gate_short_text = 'title'
+quality_gate_min_abstract_words = 30  # 摘要少于该单词数（中文按字）时视为过短
+# 抽样估算：按文件夹和年份分层随机抽取论文判断，推算全部论文的相关比例、token、费用和耗时
+sample_size = 500
+sample_seed = 0  # 抽样的随机种子
+sample_reuse = True  # 完整运行复用抽样运行中已判断的论文（研究问题、关键词、要求和模型都相同时）
 include_requirements_in_prompt = True
 include_keywords_in_prompt = False
 DATA_FOLDER = ''
@@ -31,15 +93,43 @@ model_name = ''
 api_base_url = ''
 API_KEYS = []
 
+# 配置文件是否已加载（入口程序通过 ensure_loaded 只加载一次）
+_loaded = False
+
+def ensure_loaded():
+    """首次调用时加载配置文件，之后直接返回"""
+    if not _loaded:
+        load_config()
+
 def load_config():
     """加载配置文件"""
-    global save_full_log, include_requirements_in_prompt, include_keywords_in_prompt
+    global save_full_log, progress_interval, threads_per_key, include_requirements_in_prompt, include_keywords_in_prompt
+    global metrics_enabled, metrics_file, metrics_interval, metrics_http_port
+    global tracing_enabled, profile_cpu, profile_memory
+    global cassette_mode, cassette_path, cassette_latency_scale
+    global cascade_enabled, cascade_model, cascade_confidence_threshold
+    global title_prescreen_enabled, title_prescreen_batch_size
+    global normalize_abstracts, max_input_tokens, tokenizer_path
+    global offpeak_enabled, offpeak_threads_per_key, offpeak_outside_threads_per_key
+    global compact_response, compact_lazy_reasons, reason_max_tokens
+    global stream_reasoner, reasoning_token_cap
+    global budget_limit_cny, budget_limit_tokens
+    global local_classifier_enabled, local_classifier_threshold, local_classifier_seed_size, local_classifier_audit_rate
+    global near_duplicate_enabled, near_duplicate_threshold, near_duplicate_audit_rate
+    global keyword_prefilter_mode, keyword_synonyms
+    global quality_gate_enabled, quality_gate_missing_abstract, quality_gate_non_paper, quality_gate_short_text
+    global quality_gate_min_abstract_words
+    global sample_size, sample_seed, sample_reuse
     global DATA_FOLDER, APIKEY_FOLDER, RESULT_FOLDER, LOG_FOLDER, LANGUAGE, DARK_MODE
     global YEAR_RANGE_START, YEAR_RANGE_END, INCLUDE_ALL_YEARS
     global ResearchQuestion, Requirements, Keywords, system_prompt
     global deepseek_chat_standard_prices, deepseek_chat_discount_prices
     global deepseek_reasoner_standard_prices, deepseek_reasoner_discount_prices
     global model_name, api_base_url, API_KEYS
+    global _loaded
+    
+    # 无论成功与否都视为已加载（失败时使用默认值），避免重复读取
+    _loaded = True
     
     try:
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
@@ -47,6 +137,63 @@ def load_config():
         
         # 加载基本配置
         save_full_log = config.get('save_full_log', True)
+        progress_interval = config.get('progress_interval', 1.0)
+        threads_per_key = config.get('threads_per_key', 1)
+        
+        # 加载指标导出设置
+        metrics_enabled = config.get('metrics_enabled', False)
+        metrics_file = config.get('metrics_file', '')
+        metrics_interval = config.get('metrics_interval', 15.0)
+        metrics_http_port = config.get('metrics_http_port', 0)
+        
+        # 加载性能分析设置
+        tracing_enabled = config.get('tracing_enabled', False)
+        profile_cpu = config.get('profile_cpu', False)
+        profile_memory = config.get('profile_memory', False)
+        
+        # 加载API响应磁带设置
+        cassette_mode = config.get('cassette_mode', 'off')
+        cassette_path = config.get('cassette_path', '')
+        cassette_latency_scale = config.get('cassette_latency_scale', 0.0)
+        
+        # 加载级联判断设置
+        cascade_enabled = config.get('cascade_enabled', False)
+        cascade_model = config.get('cascade_model', 'deepseek-reasoner')
+        cascade_confidence_threshold = config.get('cascade_confidence_threshold', 0.8)
+        
+        # 加载标题初筛设置
+        title_prescreen_enabled = config.get('title_prescreen_enabled', False)
+        title_prescreen_batch_size = config.get('title_prescreen_batch_size', 40)
+        normalize_abstracts = config.get('normalize_abstracts', True)
+        max_input_tokens = config.get('max_input_tokens', 2000)
+        tokenizer_path = config.get('tokenizer_path', '')
+        offpeak_enabled = config.get('offpeak_enabled', False)
+        offpeak_threads_per_key = config.get('offpeak_threads_per_key', 4)
+        offpeak_outside_threads_per_key = config.get('offpeak_outside_threads_per_key', 0)
+        compact_response = config.get('compact_response', False)
+        compact_lazy_reasons = config.get('compact_lazy_reasons', False)
+        reason_max_tokens = config.get('reason_max_tokens', 200)
+        stream_reasoner = config.get('stream_reasoner', True)
+        reasoning_token_cap = config.get('reasoning_token_cap', 0)
+        budget_limit_cny = config.get('budget_limit_cny', 0)
+        budget_limit_tokens = config.get('budget_limit_tokens', 0)
+        local_classifier_enabled = config.get('local_classifier_enabled', False)
+        local_classifier_threshold = config.get('local_classifier_threshold', 0.02)
+        local_classifier_seed_size = config.get('local_classifier_seed_size', 300)
+        local_classifier_audit_rate = config.get('local_classifier_audit_rate', 0.05)
+        near_duplicate_enabled = config.get('near_duplicate_enabled', False)
+        near_duplicate_threshold = config.get('near_duplicate_threshold', 0.7)
+        near_duplicate_audit_rate = config.get('near_duplicate_audit_rate', 0.0)
+        keyword_prefilter_mode = config.get('keyword_prefilter_mode', 'off')
+        keyword_synonyms = config.get('keyword_synonyms', {})
+        quality_gate_enabled = config.get('quality_gate_enabled', False)
+        quality_gate_missing_abstract = config.get('quality_gate_missing_abstract', 'title')
+        quality_gate_non_paper = config.get('quality_gate_non_paper', 'skip')
+        quality_gate_short_text = config.get('quality_gate_short_text', 'title')
+        quality_gate_min_abstract_words = config.get('quality_gate_min_abstract_words', 30)
+        sample_size = config.get('sample_size', 500)
+        sample_seed = config.get('sample_seed', 0)
+        sample_reuse = config.get('sample_reuse', True)
         include_requirements_in_prompt = config.get('include_requirements_in_prompt', True)
         include_keywords_in_prompt = config.get('include_keywords_in_prompt', False)
         
@@ -116,6 +263,53 @@ def save_config():
     """保存配置到文件"""
     config = {
         'save_full_log': save_full_log,
+        'progress_interval': progress_interval,
+        'threads_per_key': threads_per_key,
+        'metrics_enabled': metrics_enabled,
+        'metrics_file': metrics_file,
+        'metrics_interval': metrics_interval,
+        'metrics_http_port': metrics_http_port,
+        'tracing_enabled': tracing_enabled,
+        'profile_cpu': profile_cpu,
+        'profile_memory': profile_memory,
+        'cassette_mode': cassette_mode,
+        'cassette_path': cassette_path,
+        'cassette_latency_scale': cassette_latency_scale,
+        'cascade_enabled': cascade_enabled,
+        'cascade_model': cascade_model,
+        'cascade_confidence_threshold': cascade_confidence_threshold,
+        'title_prescreen_enabled': title_prescreen_enabled,
+        'title_prescreen_batch_size': title_prescreen_batch_size,
+        'normalize_abstracts': normalize_abstracts,
+        'max_input_tokens': max_input_tokens,
+        'tokenizer_path': tokenizer_path,
+        'offpeak_enabled': offpeak_enabled,
+        'offpeak_threads_per_key': offpeak_threads_per_key,
+        'offpeak_outside_threads_per_key': offpeak_outside_threads_per_key,
+        'compact_response': compact_response,
+        'compact_lazy_reasons': compact_lazy_reasons,
+        'reason_max_tokens': reason_max_tokens,
+        'stream_reasoner': stream_reasoner,
+        'reasoning_token_cap': reasoning_token_cap,
+        'budget_limit_cny': budget_limit_cny,
+        'budget_limit_tokens': budget_limit_tokens,
+        'local_classifier_enabled': local_classifier_enabled,
+        'local_classifier_threshold': local_classifier_threshold,
+        'local_classifier_seed_size': local_classifier_seed_size,
+        'local_classifier_audit_rate': local_classifier_audit_rate,
+        'near_duplicate_enabled': near_duplicate_enabled,
+        'near_duplicate_threshold': near_duplicate_threshold,
+        'near_duplicate_audit_rate': near_duplicate_audit_rate,
+        'keyword_prefilter_mode': keyword_prefilter_mode,
+        'keyword_synonyms': keyword_synonyms,
+        'quality_gate_enabled': quality_gate_enabled,
+        'quality_gate_missing_abstract': quality_gate_missing_abstract,
+        'quality_gate_non_paper': quality_gate_non_paper,
+        'quality_gate_short_text': quality_gate_short_text,
+        'quality_gate_min_abstract_words': quality_gate_min_abstract_words,
+        'sample_size': sample_size,
+        'sample_seed': sample_seed,
+        'sample_reuse': sample_reuse,
         'include_requirements_in_prompt': include_requirements_in_prompt,
         'include_keywords_in_prompt': include_keywords_in_prompt,
         'DATA_FOLDER': DATA_FOLDER,
@@ -147,6 +341,3 @@ def save_config():
     except Exception as e:
         lang = language.get_text(LANGUAGE)
         print(lang['config_save_failed'].format(error=e))
-
-# 初始加载配置
-load_config()
\ No newline at end of file
@@ -1,7 +1,11 @@
 import os
 import re
+import time
 from ..process import data
+from ..process import near_duplicates
+from ..process import quality_gate
 from ..log import utils
+from ..log import tracing
 from ..config import config_loader as config
 
 def extract_year_from_filename(filename):
@@ -70,6 +74,9 @@ def read_bib_files(selected_folders=None):
         os.makedirs(data_folder)
         return
     
+    # 重新计时解析阶段
+    tracing.clear_phase('parse')
+    
     # 初始化论文计数器，用作字典索引
     paper_index = 1
     
@@ -116,6 +123,7 @@ def read_bib_files(selected_folders=None):
                 utils.print_and_log(f"  {lang['processing_file'].format(filename=filename, year_info=year_info)}")
                 
                 # 读取bib文件内容
+                parse_start = time.perf_counter()
                 try:
                     with open(file_path, 'r', encoding='utf-8') as file:
                         content = file.read()
@@ -153,6 +161,7 @@ def read_bib_files(selected_folders=None):
                     }
                     
                     paper_index += 1
+                tracing.record('parse', time.perf_counter() - parse_start)
         
         if folder_file_count > 0:
             utils.print_and_log(f"  {lang['read_files_from_folder'].format(folder=folder_name, count=folder_file_count)}")
@@ -163,4 +172,14 @@ def read_bib_files(selected_folders=None):
     utils.print_and_log(f"\n{lang['read_complete']}")
     utils.print_and_log(f"{lang['total_folders_processed'].format(count=total_folders)}")
     utils.print_and_log(f"{lang['total_files_read'].format(count=total_files)}")
-    utils.print_and_log(f"{lang['total_papers_extracted'].format(count=len(data.paper_data))}")
\ No newline at end of file
+    utils.print_and_log(f"{lang['total_papers_extracted'].format(count=len(data.paper_data))}")
+    
+    # 启用条目质量检查时，读取语料后找出缺少摘要、不是论文或过短的条目
+    data.entry_categories = None
+    if quality_gate.enabled():
+        quality_gate.classify_corpus()
+    
+    # 启用近似重复判断沿用时，读取语料后建立索引
+    data.near_duplicate_index = None
+    if near_duplicates.enabled():
+        near_duplicates.index_corpus()
\ No newline at end of file
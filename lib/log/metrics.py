@@ -0,0 +1,295 @@
+import os
+import threading
+from ..process import data
+from ..process import accounting
+from ..config import config_loader as config
+
+# 指标名前缀
+PREFIX = 'autopapersearch'
+
+# 单篇请求耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0, 180.0, 300.0)
+
+# 输出的分位数
+QUANTILES = (0.5, 0.95, 0.99)
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+_generation = 0
+
+
+class WorkerMetrics:
+    """
+    单个工作线程的指标分片
+
+    只由所属线程写入；导出时逐个读取分片合并，热路径上不需要任何锁。
+    """
+    __slots__ = ('in_flight', 'bucket_counts', 'latency_sum', 'latency_count', 'errors')
+
+    def __init__(self):
+        self.in_flight = 0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个桶为 +Inf
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.errors = {}
+
+
+def _get_shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None or getattr(_local, 'generation', None) != _generation:
+        shard = WorkerMetrics()
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+        _local.generation = _generation
+    return shard
+
+
+def reset_metrics():
+    """清空所有指标分片，在每次运行开始前调用"""
+    global _shards, _generation
+    with _shards_lock:
+        _generation += 1
+        _shards = []
+
+
+def request_started():
+    """一次 API 请求开始"""
+    _get_shard().in_flight += 1
+
+
+def request_finished(latency):
+    """
+    一次 API 请求成功结束
+
+    参数:
+        latency: 请求耗时（秒）
+    """
+    shard = _get_shard()
+    shard.in_flight -= 1
+    shard.latency_sum += latency
+    shard.latency_count += 1
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if latency <= bound:
+            shard.bucket_counts[i] += 1
+            break
+    else:
+        shard.bucket_counts[-1] += 1
+
+
+def request_failed(error):
+    """一次 API 请求失败，按异常类名计数"""
+    shard = _get_shard()
+    shard.in_flight -= 1
+    name = type(error).__name__
+    shard.errors[name] = shard.errors.get(name, 0) + 1
+
+
+def _merge_shards():
+    in_flight = 0
+    bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+    latency_sum = 0.0
+    latency_count = 0
+    errors = {}
+    for shard in list(_shards):
+        in_flight += shard.in_flight
+        latency_sum += shard.latency_sum
+        latency_count += shard.latency_count
+        for i, count in enumerate(shard.bucket_counts):
+            bucket_counts[i] += count
+        for name, count in list(shard.errors.items()):
+            errors[name] = errors.get(name, 0) + count
+    return in_flight, bucket_counts, latency_sum, latency_count, errors
+
+
+def histogram_quantile(quantile, bucket_counts):
+    """按桶内线性插值估算分位数（与 Prometheus 的 histogram_quantile 一致）"""
+    total = sum(bucket_counts)
+    if total == 0:
+        return 0.0
+    rank = quantile * total
+    cumulative = 0
+    lower = 0.0
+    for i, count in enumerate(bucket_counts):
+        upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+        if cumulative + count >= rank and count > 0:
+            if i >= len(LATENCY_BUCKETS):
+                return upper
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = upper
+    return LATENCY_BUCKETS[-1]
+
+
+def collect():
+    """汇总当前所有指标，返回字典"""
+    from ..price import price
+
+    in_flight, bucket_counts, latency_sum, latency_count, errors = _merge_shards()
+    tokens = accounting.snapshot()
+    prompt_total = tokens['cache_hit'] + tokens['cache_miss']
+    return {
+        'papers_processed': tokens['papers'],
+        'papers_total': data.total_papers_to_process,
+        'papers_per_second': data.throughput_ewma or 0.0,
+        'in_flight': in_flight,
+        'bucket_counts': bucket_counts,
+        'latency_sum': latency_sum,
+        'latency_count': latency_count,
+        'quantiles': {q: histogram_quantile(q, bucket_counts) for q in QUANTILES},
+        'errors': errors,
+        'tokens': tokens,
+        'cache_hit_ratio': tokens['cache_hit'] / prompt_total if prompt_total else 0.0,
+        'cost': price.calculate_token_price(tokens['prompt'], tokens['completion'],
+                                            tokens['cache_hit'], tokens['cache_miss']),
+    }
+
+
+def render_prometheus(metrics=None):
+    """生成 Prometheus 文本格式（text/plain; version=0.0.4）"""
+    if metrics is None:
+        metrics = collect()
+
+    lines = []
+
+    def add(name, metric_type, help_text, samples):
+        full_name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        for suffix, labels, value in samples:
+            label_text = ''
+            if labels:
+                label_text = '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+            lines.append(f"{full_name}{suffix}{label_text} {value}")
+
+    add('papers_processed_total', 'counter', 'Papers judged so far.',
+        [('', None, metrics['papers_processed'])])
+    add('papers_to_process', 'gauge', 'Papers scheduled in this run.',
+        [('', None, metrics['papers_total'])])
+    add('papers_per_second', 'gauge', 'EWMA-smoothed throughput.',
+        [('', None, f"{metrics['papers_per_second']:.6f}")])
+    add('requests_in_flight', 'gauge', 'API requests currently waiting for a response.',
+        [('', None, metrics['in_flight'])])
+
+    samples = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, metrics['bucket_counts']):
+        cumulative += count
+        samples.append(('_bucket', {'le': bound}, cumulative))
+    cumulative += metrics['bucket_counts'][-1]
+    samples.append(('_bucket', {'le': '+Inf'}, cumulative))
+    samples.append(('_sum', None, f"{metrics['latency_sum']:.6f}"))
+    samples.append(('_count', None, metrics['latency_count']))
+    add('request_latency_seconds', 'histogram', 'Per-paper API request latency.', samples)
+
+    add('request_latency_quantile_seconds', 'gauge', 'Latency quantiles estimated from the histogram.',
+        [('', {'quantile': q}, f"{v:.6f}") for q, v in metrics['quantiles'].items()])
+    add('errors_total', 'counter', 'Failed API requests by exception class.',
+        [('', {'class': name}, count) for name, count in sorted(metrics['errors'].items())])
+
+    tokens = metrics['tokens']
+    add('tokens_total', 'counter', 'Tokens used by type.',
+        [('', {'type': 'input_cache_hit'}, tokens['cache_hit']),
+         ('', {'type': 'input_cache_miss'}, tokens['cache_miss']),
+         ('', {'type': 'output'}, tokens['completion'])])
+    add('cache_hit_ratio', 'gauge', 'Share of input tokens served from the provider prefix cache.',
+        [('', None, f"{metrics['cache_hit_ratio']:.6f}")])
+    add('cost_yuan', 'gauge', 'Running cost in CNY.',
+        [('', None, f"{metrics['cost']:.6f}")])
+
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics_file(path):
+    """原子地重写指标文件（先写临时文件再替换），供 node_exporter textfile collector 读取"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def _make_handler():
+    # http.server 只在开启 HTTP 端点时才导入，避免拖慢启动
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = render_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # 不向标准错误输出访问日志
+            pass
+
+    return _MetricsHandler
+
+
+class MetricsExporter:
+    """
+    指标导出器：定期重写 Prometheus 文本文件，并可选开启本地 HTTP 端点
+
+    参数:
+        file_path: 指标文件路径，为空则不写文件
+        interval: 文件重写间隔（秒）
+        http_port: HTTP 端口，0 表示不开启
+        http_host: HTTP 监听地址，默认只监听本机
+    """
+
+    def __init__(self, file_path='', interval=15.0, http_port=0, http_host='127.0.0.1'):
+        self.file_path = file_path
+        self.interval = max(1.0, float(interval))
+        self.http_port = http_port
+        self.http_host = http_host
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._server = None
+        self._server_thread = None
+
+    def start(self):
+        if self.http_port:
+            from http.server import ThreadingHTTPServer
+            self._server = ThreadingHTTPServer((self.http_host, self.http_port), _make_handler())
+            self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._server_thread.start()
+        if self.file_path:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                write_metrics_file(self.file_path)
+            except OSError:
+                pass
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            # 最后写一次，保留运行结束时的最终值
+            try:
+                write_metrics_file(self.file_path)
+            except OSError:
+                pass
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def start_exporter():
+    """根据配置启动指标导出器，未启用时返回 None"""
+    if not config.metrics_enabled:
+        return None
+    file_path = config.metrics_file or os.path.join(config.LOG_FOLDER, 'metrics.prom')
+    return MetricsExporter(file_path, config.metrics_interval, config.metrics_http_port).start()
@@ -0,0 +1,258 @@
+import os
+import sys
+import time
+import threading
+from array import array
+from ..config import config_loader as config
+
+# 阶段名称（按处理流程顺序输出）
+PHASES = ('parse', 'prompt_build', 'network', 'json_parse', 'file_write')
+
+# Python 3.12 起 cProfile 基于 sys.monitoring：一个分析器即可分析所有线程，
+# 但同一时间只能启用一个分析器，再启用第二个会抛出 ValueError
+CPROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+_local = threading.local()
+_shards = []
+_shards_lock = threading.Lock()
+
+
+class _Span:
+    """记录一个阶段耗时的上下文管理器"""
+    __slots__ = ('phase', 'start')
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.phase, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    """关闭追踪时使用的空上下文管理器，几乎没有开销"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _get_shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = {}
+        with _shards_lock:
+            _shards.append(shard)
+        _local.shard = shard
+    return shard
+
+
+def span(phase):
+    """
+    追踪一个阶段的耗时，用法：with tracing.span('network'): ...
+
+    耗时记录在当前线程自己的分片中，不需要加锁。
+    """
+    if not config.tracing_enabled:
+        return _NOOP_SPAN
+    return _Span(phase)
+
+
+def record(phase, seconds):
+    """直接记录一次阶段耗时（秒）"""
+    if not config.tracing_enabled:
+        return
+    shard = _get_shard()
+    durations = shard.get(phase)
+    if durations is None:
+        durations = shard[phase] = array('d')
+    durations.append(seconds)
+
+
+def reset_tracing(keep=('parse',)):
+    """
+    清空阶段耗时记录，应在没有工作线程运行时调用
+
+    参数:
+        keep: 保留的阶段（默认保留运行开始前读取 .bib 文件的 parse 阶段）
+    """
+    global _shards
+    with _shards_lock:
+        for shard in _shards:
+            for phase in list(shard):
+                if phase not in keep:
+                    del shard[phase]
+        _shards = [shard for shard in _shards if shard]
+        # 已结束线程的分片被移出列表后，当前线程需要重新登记
+        if getattr(_local, 'shard', None) is not None and _local.shard not in _shards:
+            _local.shard = None
+
+
+def clear_phase(phase):
+    """清空某一个阶段的记录"""
+    with _shards_lock:
+        for shard in _shards:
+            shard.pop(phase, None)
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize():
+    """
+    合并所有线程的阶段耗时
+
+    返回:
+        {phase: {'count', 'total', 'mean', 'p50', 'p95', 'p99'}}
+    """
+    merged = {}
+    with _shards_lock:
+        for shard in _shards:
+            for phase, durations in shard.items():
+                merged.setdefault(phase, array('d')).extend(durations)
+
+    summary = {}
+    ordered = [p for p in PHASES if p in merged] + sorted(p for p in merged if p not in PHASES)
+    for phase in ordered:
+        values = sorted(merged[phase])
+        total = sum(values)
+        summary[phase] = {
+            'count': len(values),
+            'total': total,
+            'mean': total / len(values) if values else 0.0,
+            'p50': _percentile(values, 0.50),
+            'p95': _percentile(values, 0.95),
+            'p99': _percentile(values, 0.99),
+        }
+    return summary
+
+
+def format_summary(lang):
+    """生成阶段耗时统计的文本行列表"""
+    lines = []
+    for phase, stats in summarize().items():
+        lines.append(lang['phase_timing'].format(
+            phase=phase,
+            count=stats['count'],
+            total=stats['total'],
+            mean=stats['mean'] * 1000,
+            p50=stats['p50'] * 1000,
+            p95=stats['p95'] * 1000,
+            p99=stats['p99'] * 1000
+        ))
+    return lines
+
+
+class ProfileSession:
+    """
+    可选的 cProfile / tracemalloc 分析会话
+
+    Python 3.12 起只使用主线程启用的一个 Profile（已包含所有线程），wrap() 不做包装；
+    更早的版本中 cProfile 只能分析启用它的线程，工作线程通过 wrap() 各自创建 Profile，
+    结束时与主线程的结果合并。结果写入 Log 文件夹。
+
+    参数:
+        output_dir: 输出文件夹
+        tag: 输出文件名后缀（一般为运行时间戳）
+        cpu: 是否启用 cProfile
+        memory: 是否启用 tracemalloc
+    """
+
+    def __init__(self, output_dir, tag, cpu=False, memory=False):
+        self.output_dir = output_dir
+        self.tag = tag
+        self.cpu = cpu
+        self.memory = memory
+        self._main_profile = None
+        self._worker_profiles = []
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def start(self):
+        if self.memory:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(25)
+                self._started_tracemalloc = True
+        if self.cpu:
+            import cProfile
+            self._main_profile = cProfile.Profile()
+            self._main_profile.enable()
+        return self
+
+    def wrap(self, fn):
+        """包装在工作线程中执行的函数，使其也被 cProfile 分析"""
+        if not self.cpu or CPROFILE_ALL_THREADS:
+            return fn
+
+        def profiled(*args, **kwargs):
+            import cProfile
+            profile = cProfile.Profile()
+            with self._lock:
+                self._worker_profiles.append(profile)
+            return profile.runcall(fn, *args, **kwargs)
+
+        return profiled
+
+    def stop(self):
+        """
+        停止分析并写出结果
+
+        返回:
+            写出的文件路径列表
+        """
+        written = []
+        if self.cpu and self._main_profile is not None:
+            import pstats
+            self._main_profile.disable()
+            stats = pstats.Stats(self._main_profile)
+            for profile in self._worker_profiles:
+                stats.add(profile)
+
+            prof_path = os.path.join(self.output_dir, f"Profile_{self.tag}.prof")
+            stats.dump_stats(prof_path)
+            written.append(prof_path)
+
+            txt_path = os.path.join(self.output_dir, f"Profile_{self.tag}.txt")
+            with open(txt_path, 'w', encoding='utf-8') as f:
+                stats.stream = f
+                stats.sort_stats('cumulative').print_stats(50)
+                stats.sort_stats('tottime').print_stats(30)
+            written.append(txt_path)
+
+        if self.memory:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                current, peak = tracemalloc.get_traced_memory()
+                mem_path = os.path.join(self.output_dir, f"Memory_{self.tag}.txt")
+                with open(mem_path, 'w', encoding='utf-8') as f:
+                    f.write(f"current: {current / 1024 / 1024:.2f} MiB\n")
+                    f.write(f"peak: {peak / 1024 / 1024:.2f} MiB\n\n")
+                    f.write("Top allocators (by line):\n")
+                    for stat in snapshot.statistics('lineno')[:30]:
+                        f.write(f"{stat}\n")
+                    f.write("\nTop allocators (by traceback):\n")
+                    for stat in snapshot.statistics('traceback')[:10]:
+                        f.write(f"{stat}\n")
+                        for line in stat.traceback.format():
+                            f.write(f"    {line}\n")
+                written.append(mem_path)
+                if self._started_tracemalloc:
+                    tracemalloc.stop()
+
+        return written
@@ -0,0 +1,229 @@
+import math
+import time
+from datetime import datetime, timedelta
+from ..process import data
+from ..process import accounting
+from ..config import config_loader as config
+from language import language
+
+# EWMA 平滑的时间常数（秒）：越大越平稳，越小对速度变化越敏感
+THROUGHPUT_TIME_CONSTANT = 30.0
+
+# 当前的输出函数，界面启动后会替换为写入日志窗口的函数
+_output_handler = None
+
+
+def set_output_handler(handler):
+    """设置进度和日志的输出函数（默认为 print）"""
+    global _output_handler
+    _output_handler = handler
+
+
+def print_and_log(message="", thread_id=None):
+    """输出信息，并在启用完整日志时同步写入 Log_ALL 文件"""
+    if thread_id is not None:
+        message = f"[Thread-{thread_id}] {message}"
+
+    if _output_handler is not None:
+        _output_handler(message)
+    else:
+        print(message)
+
+    if config.save_full_log and data.full_log_file:
+        with data.file_write_lock:
+            if not data.full_log_file.closed:
+                data.full_log_file.write(message + "\n")
+                data.full_log_file.flush()
+
+
+def reset_progress_tracking():
+    """重置进度跟踪变量，在每次运行开始前调用"""
+    with data.progress_lock:
+        data.progress_generation += 1
+        data.progress_events.clear()
+        data.processed_papers = 0
+        data.busy_time = 0.0
+        data.start_time = time.time()
+        data.throughput_ewma = None
+        data.latency_ewma = None
+
+
+def update_progress(single_elapsed_time, count=1):
+    """
+    记录当前线程完成了一篇论文
+
+    参数:
+        single_elapsed_time: 这篇论文的处理耗时（秒）
+        count: 完成的判断数（多问题模式下一次请求完成多个问题）
+    """
+    # deque.append 是原子操作，工作线程不需要获取任何锁
+    data.progress_events.append((count, single_elapsed_time))
+
+
+def get_progress_snapshot():
+    """
+    把上次读取以来完成的论文累加到累计值
+
+    每次读取的开销只与上次读取以来完成的论文数有关，与工作线程数无关。
+
+    返回:
+        (已处理论文数, 累计处理耗时)
+    """
+    events = data.progress_events
+    with data.progress_lock:
+        # 只有读取进度的线程会取出，持有锁时队列不会被其他线程取空
+        while events:
+            count, elapsed = events.popleft()
+            data.processed_papers += count
+            data.busy_time += elapsed
+        return data.processed_papers, data.busy_time
+
+
+def _format_duration(seconds):
+    seconds = max(0, int(seconds))
+    return seconds // 3600, (seconds % 3600) // 60, seconds % 60
+
+
+def estimate_remaining_seconds(remaining_papers, processed, busy_time):
+    """
+    估算剩余时间（秒），无法估算时返回 None
+
+    优先使用 EWMA 平滑后的整体吞吐量（已包含并发效果）；
+    尚未观测到吞吐量时，用单篇平均耗时除以活跃线程数估算。
+    """
+    if remaining_papers <= 0:
+        return 0.0
+    if data.throughput_ewma:
+        return remaining_papers / data.throughput_ewma
+    if processed > 0 and busy_time > 0:
+        concurrency = max(1, data.active_threads)
+        return remaining_papers * (busy_time / processed) / concurrency
+    return None
+
+
+def _update_throughput(processed, busy_time, elapsed_since_last, processed_since_last):
+    """根据上一次采样以来的完成数更新 EWMA 吞吐量和单篇耗时"""
+    if elapsed_since_last <= 0:
+        return
+    alpha = 1 - math.exp(-elapsed_since_last / THROUGHPUT_TIME_CONSTANT)
+    rate = processed_since_last / elapsed_since_last
+    if data.throughput_ewma is None:
+        # 第一次有论文完成之前不建立基线，避免被启动阶段的 0 拉低
+        if processed_since_last > 0:
+            data.throughput_ewma = rate
+    else:
+        data.throughput_ewma = alpha * rate + (1 - alpha) * data.throughput_ewma
+    if processed > 0:
+        latency = busy_time / processed
+        if data.latency_ewma is None:
+            data.latency_ewma = latency
+        else:
+            data.latency_ewma = alpha * latency + (1 - alpha) * data.latency_ewma
+
+
+def format_progress(processed, busy_time, lang):
+    """生成一次进度报告的文本"""
+    from ..price import price
+
+    total = data.total_papers_to_process
+    now = time.time()
+    elapsed = now - data.start_time if data.start_time else 0
+    progress = processed / total * 100 if total else 0
+
+    lines = [
+        lang['current_progress'].format(progress=progress, processed=processed, total=total),
+        lang['threads_used'].format(count=data.active_threads),
+        lang['time_estimation'],
+    ]
+
+    hours, minutes, seconds = _format_duration(elapsed)
+    lines.append(lang['elapsed_time'].format(hours=hours, minutes=minutes, seconds=seconds))
+    if data.throughput_ewma:
+        lines.append(lang['current_speed'].format(speed=data.throughput_ewma))
+
+    remaining_papers = total - processed
+    remaining_seconds = estimate_remaining_seconds(remaining_papers, processed, busy_time)
+    if remaining_seconds is not None:
+        hours, minutes, seconds = _format_duration(remaining_seconds)
+        lines.append(lang['remaining_time'].format(hours=hours, minutes=minutes, seconds=seconds))
+        completion = datetime.now() + timedelta(seconds=remaining_seconds)
+        lines.append(lang['completion_time'].format(time=completion.strftime("%Y-%m-%d %H:%M:%S")))
+
+    # token 统计（累加上次读取以来的记账增量，同时更新各任务的已完成论文数）
+    tokens = accounting.snapshot()
+
+    # 多任务运行时显示各任务的进度
+    if len(data.jobs) > 1:
+        for job in data.jobs:
+            job_processed = job.processed()
+            lines.append(lang['job_progress'].format(
+                name=job.name, processed=job_processed, total=job.total,
+                progress=job_processed / job.total * 100 if job.total else 0))
+
+    prompt_tokens = tokens['prompt']
+    completion_tokens = tokens['completion']
+    cache_hit = tokens['cache_hit']
+    cache_miss = tokens['cache_miss']
+    token_total = prompt_tokens + completion_tokens
+
+    lines.append(lang['token_usage'])
+    if processed > 0:
+        lines.append(lang['avg_tokens'].format(input=prompt_tokens // processed, output=completion_tokens // processed))
+    lines.append(lang['total_tokens'].format(total=token_total, input=prompt_tokens, output=completion_tokens))
+    if cache_hit + cache_miss:
+        # 前缀缓存命中率（prompt_cache_hit_tokens），用于确认提示词模板的共享前缀被缓存
+        lines.append(lang['cache_hit_ratio'].format(ratio=cache_hit / (cache_hit + cache_miss) * 100,
+                                                    hit=cache_hit, total=cache_hit + cache_miss))
+    if processed > 0:
+        lines.append(lang['estimated_total_tokens'].format(count=int(token_total / processed * total)))
+
+    # 价格估算：已消耗部分按实际时段计价，剩余部分按预计运行区间跨越的优惠/标准时段加权
+    if processed > 0:
+        consumed_cost = price.calculate_token_price(prompt_tokens, completion_tokens, cache_hit, cache_miss)
+        estimated_cost = consumed_cost
+        if remaining_seconds:
+            tokens_per_paper = token_total / processed
+            papers_per_second = remaining_papers / remaining_seconds
+            prompt_ratio = prompt_tokens / token_total if token_total else 0.8
+            cache_miss_ratio = cache_miss / (cache_hit + cache_miss) if (cache_hit + cache_miss) else 1.0
+            estimated_cost += price.calculate_weighted_price(
+                remaining_seconds,
+                tokens_per_paper * papers_per_second,
+                prompt_ratio=prompt_ratio,
+                cache_miss_ratio=cache_miss_ratio
+            )
+        lines.append(lang['price_estimation'])
+        lines.append(lang['cost_per_paper'].format(cost=price.format_price(consumed_cost / processed)))
+        lines.append(lang['consumed_cost'].format(cost=price.format_price(consumed_cost)))
+        lines.append(lang['estimated_total_cost'].format(cost=price.format_price(estimated_cost)))
+
+    return "\n".join(lines)
+
+
+def progress_monitor():
+    """
+    进度监控线程：按 config.progress_interval 间隔读取累计进度并输出
+
+    每次采样的开销不随工作线程数和任务数增长（只累加新完成的论文和新的记账增量），
+    工作线程本身在每篇论文完成时不需要获取任何全局锁。
+    """
+    lang = language.get_text(config.LANGUAGE)
+    interval = max(0.1, float(config.progress_interval))
+    last_time = data.start_time or time.time()
+    last_processed = 0
+    last_reported = -1
+
+    while not data.progress_stop_event.wait(interval):
+        now = time.time()
+        processed, busy_time = get_progress_snapshot()
+        _update_throughput(processed, busy_time, now - last_time, processed - last_processed)
+        last_time = now
+        last_processed = processed
+
+        # 没有新进展时不重复输出
+        if processed == last_reported:
+            continue
+        last_reported = processed
+
+        separator = '=' * 50
+        print_and_log(f"\n{separator}\n{format_progress(processed, busy_time, lang)}\n{separator}")
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import threading
+
+# orjson 为可选依赖：安装后使用其更快的编码/解码，否则回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 每条记录的类型标记：首行为运行信息（header），其余每行一篇论文的判断结果（verdict）
+KIND_HEADER = 'header'
+KIND_VERDICT = 'verdict'
+
+
+def _dumps(record):
+    """将记录编码为一行 UTF-8 字节（不含换行符）"""
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(line):
+    """解码一行 JSON（bytes）"""
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class VerdictLogWriter:
+    """
+    JSON Lines 格式的判断结果日志写入器
+
+    每行一个 JSON 对象，所有字段均经过编码器转义，标题或理由中的引号、反斜杠不会破坏文件格式。
+    文件在整个运行期间保持打开，每写一行立即 flush，便于外部工具实时 tail。
+    """
+
+    def __init__(self, path, header=None, append=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab' if append else 'wb')
+        if header is not None:
+            record = {'kind': KIND_HEADER}
+            record.update(header)
+            self._write(record)
+
+    def _write(self, record):
+        line = _dumps(record) + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def write_verdict(self, paper_id, title, source, result, reason, tokens=None, latency=0.0,
+                      key_index=None, started_at=None, finished_at=None, **extra):
+        """
+        写入一篇论文的判断结果
+
+        参数:
+            paper_id: 论文在 paper_data 中的索引
+            title: 论文标题
+            source: 来源（"文件夹/文件名"）
+            result: 判断结果（'Y' 或 'N'）
+            reason: 判断理由
+            tokens: token 使用量字典（prompt/completion/cache_hit/cache_miss/total）
+            latency: 单篇处理耗时（秒）
+            key_index: 使用的 API 密钥序号（从0开始）
+            started_at: 开始处理的时间戳（秒）
+            finished_at: 完成处理的时间戳（秒），默认取当前时间
+            extra: 其他需要一并记录的字段
+        """
+        if finished_at is None:
+            finished_at = time.time()
+        record = {
+            'kind': KIND_VERDICT,
+            'id': paper_id,
+            'title': title,
+            'source': source,
+            'result': result,
+            'reason': reason,
+            'tokens': tokens or {},
+            'latency': round(latency, 3),
+            'key_index': key_index,
+            'started_at': round(started_at, 3) if started_at is not None else None,
+            'finished_at': round(finished_at, 3),
+        }
+        if extra:
+            record.update(extra)
+        self._write(record)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def tail_records(path, offset=0):
+    """
+    从指定字节偏移处增量读取记录
+
+    只返回以换行符结尾的完整行，写入到一半的末行留给下一次调用，
+    因此可以对正在写入的日志反复调用以实现 tail -f 的效果。
+
+    参数:
+        path: JSONL 日志文件路径
+        offset: 上次读取结束时的字节偏移
+
+    返回:
+        (records, new_offset)：新读到的记录列表和新的字节偏移
+    """
+    records = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            offset += len(line)
+            line = line.strip()
+            if line:
+                records.append(_loads(line))
+    return records, offset
+
+
+def iter_records(path):
+    """逐行迭代日志中的所有记录（包括 header），不会一次性读入整个文件"""
+    with open(path, 'rb') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield _loads(line)
+
+
+def read_header(path):
+    """读取日志的运行信息记录，不存在时返回 None"""
+    for record in iter_records(path):
+        if record.get('kind') == KIND_HEADER:
+            return record
+        break
+    return None
+
+
+def iter_verdicts(path, result=None):
+    """
+    迭代日志中的判断结果
+
+    参数:
+        path: JSONL 日志文件路径
+        result: 只返回指定结果（'Y' 或 'N'）的记录，None 表示全部
+    """
+    for record in iter_records(path):
+        if record.get('kind') != KIND_VERDICT:
+            continue
+        if result is not None and record.get('result') != result:
+            continue
+        yield record
+
+
+def aggregate(paths):
+    """
+    汇总一个或多个日志文件中的判断结果
+
+    参数:
+        paths: 日志文件路径或路径列表
+
+    返回:
+        包含论文数、Y/N 数量、token 合计和平均耗时的字典
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+
+    summary = {
+        'papers': 0,
+        'Y': 0,
+        'N': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'cache_hit_tokens': 0,
+        'cache_miss_tokens': 0,
+        'total_tokens': 0,
+        'latency_total': 0.0,
+    }
+    for path in paths:
+        for record in iter_verdicts(path):
+            summary['papers'] += 1
+            result = record.get('result')
+            if result in ('Y', 'N'):
+                summary[result] += 1
+            tokens = record.get('tokens') or {}
+            summary['prompt_tokens'] += tokens.get('prompt', 0)
+            summary['completion_tokens'] += tokens.get('completion', 0)
+            summary['cache_hit_tokens'] += tokens.get('cache_hit', 0)
+            summary['cache_miss_tokens'] += tokens.get('cache_miss', 0)
+            summary['total_tokens'] += tokens.get('total', 0)
+            summary['latency_total'] += record.get('latency') or 0.0
+
+    summary['latency_avg'] = summary['latency_total'] / summary['papers'] if summary['papers'] else 0.0
+    return summary
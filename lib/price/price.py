@@ -1,20 +1,40 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from ..config import config_loader as config
 
+# DeepSeek 的优惠时段按北京时间计算，与运行所在机器的本地时区无关
+try:
+    from zoneinfo import ZoneInfo
+    PRICING_TIMEZONE = ZoneInfo('Asia/Shanghai')
+except Exception:
+    # Python 3.8 或缺少时区数据（如未安装 tzdata 的 Windows）时使用固定的 UTC+8，中国不实行夏令时
+    PRICING_TIMEZONE = timezone(timedelta(hours=8), 'Asia/Shanghai')
+
+# 优惠时段：北京时间 00:30-08:30（含开始时刻，不含结束时刻）
+DISCOUNT_START = (0, 30)
+DISCOUNT_END = (8, 30)
+
+def pricing_time(check_time=None):
+    """把时间转换为北京时间；不带时区的时间按本机本地时间处理，None 表示当前时间"""
+    if check_time is None:
+        return datetime.now(PRICING_TIMEZONE)
+    return check_time.astimezone(PRICING_TIMEZONE)
+
 def is_discount_period(check_time=None):
     """判断给定时间是否在优惠时段（北京时间 00:30-08:30）"""
-    if check_time is None:
-        check_time = datetime.now()
-    current_time = check_time.time()
-    
-    # 优惠时段：00:30-08:30
-    start_time = datetime.strptime("00:30", "%H:%M").time()
-    end_time = datetime.strptime("08:30", "%H:%M").time()
-    
-    return start_time <= current_time <= end_time
+    current_time = pricing_time(check_time)
+    return DISCOUNT_START <= (current_time.hour, current_time.minute) < DISCOUNT_END
+
+def next_period_change(check_time=None):
+    """返回给定时间之后下一次优惠/标准时段切换的时间（北京时间）"""
+    current_time = pricing_time(check_time)
+    today = current_time.replace(second=0, microsecond=0)
+    candidates = [today.replace(hour=DISCOUNT_START[0], minute=DISCOUNT_START[1]),
+                  today.replace(hour=DISCOUNT_END[0], minute=DISCOUNT_END[1]),
+                  today.replace(hour=DISCOUNT_START[0], minute=DISCOUNT_START[1]) + timedelta(days=1)]
+    return min(t for t in candidates if t > current_time)
 
 def calculate_weighted_price(remaining_seconds, tokens_per_second, prompt_ratio=0.8, 
-                           cache_miss_ratio=1.0, model_name=None):
+                           cache_miss_ratio=1.0, model_name=None, start_time=None):
     """
     计算考虑跨时段的加权平均价格
     
@@ -24,6 +44,7 @@ def calculate_weighted_price(remaining_seconds, tokens_per_second, prompt_ratio=
         prompt_ratio: 输入token占总token的比例（默认0.8）
         cache_miss_ratio: 缓存未命中的比例（默认1.0，即全部未命中）
         model_name: 模型名称
+        start_time: 开始时间，默认为当前时间
     
     返回:
         预估的总价格（元）
@@ -31,43 +52,19 @@ def calculate_weighted_price(remaining_seconds, tokens_per_second, prompt_ratio=
     if model_name is None:
         model_name = config.model_name
     
-    # 获取当前时间
-    now = datetime.now()
-    
     # 计算时段分布
     time_segments = []
-    current_time = now
+    current_time = pricing_time(start_time)
     remaining = remaining_seconds
     
     while remaining > 0:
-        # 判断当前时段
-        is_discount = is_discount_period(current_time)
-        
-        # 计算到下一个时段切换点的秒数
-        current_hour_min = current_time.time()
-        if is_discount:
-            # 在优惠时段，计算到08:30的秒数
-            end_time = current_time.replace(hour=8, minute=30, second=0, microsecond=0)
-            if current_time >= end_time:
-                # 如果已经过了08:30，则下一个切换点是明天的00:30
-                end_time = (current_time + timedelta(days=1)).replace(hour=0, minute=30, second=0, microsecond=0)
-        else:
-            # 在标准时段，计算到00:30的秒数
-            end_time = current_time.replace(hour=0, minute=30, second=0, microsecond=0)
-            if current_time >= end_time:
-                # 如果已经过了00:30，则下一个切换点是08:30
-                end_time = current_time.replace(hour=8, minute=30, second=0, microsecond=0)
-                if current_time >= end_time:
-                    # 如果也过了08:30，则是明天的00:30
-                    end_time = (current_time + timedelta(days=1)).replace(hour=0, minute=30, second=0, microsecond=0)
-        
-        # 计算在当前时段的秒数
-        seconds_to_switch = (end_time - current_time).total_seconds()
-        seconds_in_period = min(remaining, seconds_to_switch)
+        # 计算在当前时段的秒数（到下一个时段切换点为止）
+        end_time = next_period_change(current_time)
+        seconds_in_period = min(remaining, (end_time - current_time).total_seconds())
         
         time_segments.append({
             'seconds': seconds_in_period,
-            'is_discount': is_discount
+            'is_discount': is_discount_period(current_time)
         })
         
         # 更新剩余时间和当前时间
@@ -108,7 +105,7 @@ def calculate_weighted_price(remaining_seconds, tokens_per_second, prompt_ratio=
 
 def calculate_token_price(prompt_tokens, completion_tokens, 
                          prompt_cache_hit_tokens=0, prompt_cache_miss_tokens=0,
-                         model_name=None):
+                         model_name=None, discount=None):
     """
     计算token使用价格
     
@@ -118,6 +115,7 @@ def calculate_token_price(prompt_tokens, completion_tokens,
         prompt_cache_hit_tokens: 缓存命中的输入token数
         prompt_cache_miss_tokens: 缓存未命中的输入token数
         model_name: 模型名称，默认使用config中的配置
+        discount: True/False 按优惠/标准时段计价，None 表示按当前时段
     
     返回:
         总价格（元）
@@ -126,7 +124,7 @@ def calculate_token_price(prompt_tokens, completion_tokens,
         model_name = config.model_name
     
     # 获取当前时段的价格
-    is_discount = is_discount_period()
+    is_discount = is_discount_period() if discount is None else discount
     
     # 如果没有提供缓存信息，则假设所有输入都是缓存未命中
     if prompt_cache_hit_tokens == 0 and prompt_cache_miss_tokens == 0:
@@ -0,0 +1,212 @@
+import importlib.util
+import re
+from . import data
+
+# 每条统计记录中各字段的顺序
+# separate_prompt: 每个问题单独发送请求时输入token数（多问题模式下为估算值，否则等于 prompt）
+FIELDS = ('papers', 'prompt', 'completion', 'cache_hit', 'cache_miss', 'total', 'separate_prompt')
+
+# 中文字符（按 DeepSeek 的经验比例估算token时单独计数）
+_CJK_RE = re.compile('[\u4e00-\u9fff]')
+# 批量估算时每次拼接的文本数（控制 UTF-32 数组的内存占用）
+ESTIMATE_CHUNK = 10000
+
+
+class TokenAccount:
+    """
+    单个工作线程的 token 记账对象
+
+    每个工作线程持有一个，只由该线程写入，记账时不需要任何锁；
+    每次记账同时向 data.token_events 追加一条增量，进度读取时由 snapshot 累加，
+    运行结束、线程全部退出后再用 merge_accounts 精确合并。
+    """
+    __slots__ = ('key_index', 'job', 'papers', 'prompt', 'completion', 'cache_hit', 'cache_miss', 'total',
+                 'separate_prompt', 'by_model')
+
+    def __init__(self, key_index, job=None):
+        self.key_index = key_index
+        self.job = job
+        self.papers = 0
+        self.prompt = 0
+        self.completion = 0
+        self.cache_hit = 0
+        self.cache_miss = 0
+        self.total = 0
+        self.separate_prompt = 0
+        self.by_model = {}  # model -> [papers, prompt, completion, cache_hit, cache_miss, total, separate_prompt]
+
+    def add(self, model, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens, total_tokens,
+            separate_prompt_tokens=None, papers=1):
+        """
+        记录一篇论文（一个问题）的 token 使用量
+
+        多问题模式下传入按问题分摊后的用量，以及该问题单独请求时输入token数的估算值；
+        级联判断中被升级的论文，初筛请求以 papers=0 记录，只由给出最终判断的模型计数
+        """
+        if separate_prompt_tokens is None:
+            separate_prompt_tokens = prompt_tokens
+        self.papers += papers
+        self.prompt += prompt_tokens
+        self.completion += completion_tokens
+        self.cache_hit += cache_hit_tokens
+        self.cache_miss += cache_miss_tokens
+        self.total += total_tokens
+        self.separate_prompt += separate_prompt_tokens
+
+        counters = self.by_model.get(model)
+        if counters is None:
+            counters = self.by_model[model] = [0, 0, 0, 0, 0, 0, 0]
+        counters[0] += papers
+        counters[1] += prompt_tokens
+        counters[2] += completion_tokens
+        counters[3] += cache_hit_tokens
+        counters[4] += cache_miss_tokens
+        counters[5] += total_tokens
+        counters[6] += separate_prompt_tokens
+
+        # deque.append 是原子操作，不需要加锁
+        data.token_events.append((self.job, papers, prompt_tokens, completion_tokens, cache_hit_tokens,
+                                  cache_miss_tokens, total_tokens, separate_prompt_tokens))
+
+
+def estimate_tokens(text):
+    """粗略估算文本的token数：1 个中文字符 ≈ 0.6 个 token，其他字符 ≈ 0.3 个 token"""
+    cjk = 0 if text.isascii() else len(_CJK_RE.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+def numpy_available():
+    """是否安装了 numpy（本地分类器、近似重复索引需要 numpy，批量估算token时可选），只查找不导入"""
+    return importlib.util.find_spec('numpy') is not None
+
+
+def estimate_tokens_batch(texts):
+    """
+    批量估算多段文本的token数，结果与逐个调用 estimate_tokens 相同
+
+    纯 ASCII 文本直接按长度计算；其余文本在安装 numpy 时按块拼接为 UTF-32 码点数组，
+    一次性找出中文字符位置再按各段边界计数，否则逐个调用 estimate_tokens。
+    """
+    counts = [int(len(text) * 0.3) if text.isascii() else None for text in texts]
+    pending = [i for i, count in enumerate(counts) if count is None]
+    if not pending:
+        return counts
+    try:
+        import numpy as np
+    except ImportError:
+        for i in pending:
+            counts[i] = estimate_tokens(texts[i])
+        return counts
+
+    for start in range(0, len(pending), ESTIMATE_CHUNK):
+        indices = pending[start:start + ESTIMATE_CHUNK]
+        chunk = [texts[i] for i in indices]
+        codes = np.frombuffer(''.join(chunk).encode('utf-32-le'), dtype=np.uint32)
+        # 无符号减法让范围外的码点变成很大的数，一次比较即可判断是否为中文字符
+        positions = np.flatnonzero((codes - np.uint32(0x4e00)) <= np.uint32(0x9fff - 0x4e00))
+        lengths = np.fromiter(map(len, chunk), dtype=np.int64, count=len(chunk))
+        ends = np.cumsum(lengths)
+        cjk = np.searchsorted(positions, ends) - np.searchsorted(positions, ends - lengths)
+        for i, count in zip(indices, (cjk * 0.6 + (lengths - cjk) * 0.3).astype(np.int64).tolist()):
+            counts[i] = count
+    return counts
+
+
+def split_tokens(value, parts):
+    """把整数token数尽量平均地分成 parts 份（余数分给前面几份），各份之和等于原值"""
+    base, remainder = divmod(value, parts)
+    return [base + (1 if i < remainder else 0) for i in range(parts)]
+
+
+def _empty_totals():
+    return dict.fromkeys(FIELDS, 0)
+
+
+def reset_accounts():
+    """清空所有记账对象和实时合计，在每次运行开始前调用"""
+    with data.token_lock:
+        data.token_accounts = []
+    with data.progress_lock:
+        data.token_events.clear()
+        data.token_totals = _empty_totals()
+
+
+def new_account(key_index, job=None):
+    """
+    为一个工作线程创建并登记记账对象（每个线程每个任务只需调用一次）
+
+    参数:
+        key_index: 该线程使用的API密钥序号
+        job: 所属任务，记账对象同时登记到 job.accounts，用于按任务合并和显示各任务进度
+    """
+    account = TokenAccount(key_index, job)
+    with data.token_lock:
+        data.token_accounts.append(account)
+        if job is not None:
+            job.accounts.append(account)
+    return account
+
+
+def snapshot():
+    """
+    把上次读取以来的记账增量累加到实时合计（同时累加各任务的已完成论文数），返回合计的副本
+
+    每次读取的开销只与上次读取以来的记账次数有关，与工作线程数和任务数无关。
+    """
+    events = data.token_events
+    with data.progress_lock:
+        # 与 get_progress_snapshot 相同：持有锁时队列不会被其他线程取空
+        totals = data.token_totals
+        while events:
+            job, papers, prompt, completion, cache_hit, cache_miss, total, separate_prompt = events.popleft()
+            totals['papers'] += papers
+            totals['prompt'] += prompt
+            totals['completion'] += completion
+            totals['cache_hit'] += cache_hit
+            totals['cache_miss'] += cache_miss
+            totals['total'] += total
+            totals['separate_prompt'] += separate_prompt
+            if job is not None:
+                job.processed_papers += papers
+        return dict(totals)
+
+
+def merge_accounts(accounts=None):
+    """
+    精确合并记账对象（应在所有工作线程结束后调用）
+
+    返回:
+        {'totals': {...}, 'by_key': {key_index: {...}}, 'by_model': {model: {...}}}
+    """
+    if accounts is None:
+        accounts = data.token_accounts
+
+    totals = _empty_totals()
+    by_key = {}
+    by_model = {}
+    for account in accounts:
+        key_totals = by_key.setdefault(account.key_index, _empty_totals())
+        for model, counters in account.by_model.items():
+            model_totals = by_model.setdefault(model, _empty_totals())
+            for field, value in zip(FIELDS, counters):
+                totals[field] += value
+                key_totals[field] += value
+                model_totals[field] += value
+
+    return {'totals': totals, 'by_key': by_key, 'by_model': by_model}
+
+
+def calculate_price(merged):
+    """按模型分别计价后求和，返回总价格（元）"""
+    from ..price import price
+
+    total_price = 0
+    for model, totals in merged['by_model'].items():
+        total_price += price.calculate_token_price(
+            totals['prompt'],
+            totals['completion'],
+            totals['cache_hit'],
+            totals['cache_miss'],
+            model_name=model
+        )
+    return total_price
@@ -0,0 +1,169 @@
+"""
+级联判断：每篇论文先由 config.model_name 初筛并给出置信度，
+置信度低于 config.cascade_confidence_threshold 的论文再交给 config.cascade_model 做最终判断
+"""
+import threading
+import time
+from . import data
+from . import search_paper
+from . import streaming
+from ..config import config_loader as config
+
+# 每个工作线程自己的统计对象，通过 threading.local 找到
+_local = threading.local()
+
+
+class CascadeStats:
+    """
+    单个工作线程的级联判断统计
+
+    只由所属线程写入，运行结束后用 merge_stats 合并。
+    """
+    __slots__ = ('screened', 'escalated', 'screen_latency', 'escalate_latency')
+
+    def __init__(self):
+        self.screened = 0  # 完成初筛的论文数
+        self.escalated = 0  # 升级后完成最终判断的论文数
+        self.screen_latency = 0.0  # 初筛请求的累计耗时（秒）
+        self.escalate_latency = 0.0  # 升级请求的累计耗时（秒）
+
+
+def enabled():
+    """是否启用级联判断（两级模型相同时没有意义，按未启用处理）"""
+    return bool(config.cascade_enabled and config.cascade_model and config.cascade_model != config.model_name)
+
+
+def reset_stats():
+    """清空统计，在每次运行开始前调用"""
+    with data.token_lock:
+        data.cascade_stats = []
+
+
+def _get_stats():
+    # 每次运行开始后（progress_generation 变化）重新注册
+    stats = getattr(_local, 'stats', None)
+    if stats is None or getattr(_local, 'generation', None) != data.progress_generation:
+        stats = CascadeStats()
+        with data.token_lock:
+            data.cascade_stats.append(stats)
+        _local.stats = stats
+        _local.generation = data.progress_generation
+    return stats
+
+
+def merge_stats():
+    """合并各线程的统计（应在所有工作线程结束后调用）"""
+    merged = CascadeStats()
+    for stats in data.cascade_stats:
+        merged.screened += stats.screened
+        merged.escalated += stats.escalated
+        merged.screen_latency += stats.screen_latency
+        merged.escalate_latency += stats.escalate_latency
+    return merged
+
+
+def judge(job, title, abstract, api_key, account):
+    """
+    对一篇论文执行级联判断，并把两级请求的token分别按模型记入 account
+
+    返回:
+        (relevance, reason, token_info)，token_info 为两级请求的合计，
+        另含 confidence（初筛置信度）和 escalated（是否升级）
+    """
+    stats = _get_stats()
+
+    screen_start = time.time()
+    relevance, tokens, reason, prompt_tokens, completion_tokens, cache_hit, cache_miss, confidence = \
+        search_paper.check_paper_relevance_with_confidence(
+            job.rq, job.keywords, job.requirements, title, abstract, api_key, config.model_name)
+    stats.screened += 1
+    stats.screen_latency += time.time() - screen_start
+
+    escalate = confidence < float(config.cascade_confidence_threshold)
+    # 升级时初筛请求只记token，论文数由给出最终判断的模型计
+    account.add(config.model_name, prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens,
+                papers=0 if escalate else 1)
+    token_info = {
+        'prompt': prompt_tokens,
+        'completion': completion_tokens,
+        'cache_hit': cache_hit,
+        'cache_miss': cache_miss,
+        'total': tokens,
+        'confidence': confidence,
+        'escalated': escalate
+    }
+    if not escalate:
+        return relevance, reason, token_info
+
+    escalate_start = time.time()
+    screen_verdict = relevance, reason
+    try:
+        relevance, tokens, reason, prompt_tokens, completion_tokens, cache_hit, cache_miss = \
+            search_paper.check_paper_relevance(
+                job.rq, job.keywords, job.requirements, title, abstract, api_key, config.cascade_model)
+    except streaming.ReasoningLimitExceeded as e:
+        # 推理超出上限：保留初筛结果，中止的请求按已输出的推理token计费
+        account.add(config.model_name, 0, 0, 0, 0, 0)
+        account.add(config.cascade_model, e.prompt_tokens, e.reasoning_tokens, 0, e.prompt_tokens,
+                    e.prompt_tokens + e.reasoning_tokens, papers=0)
+        token_info['prompt'] += e.prompt_tokens
+        token_info['completion'] += e.reasoning_tokens
+        token_info['cache_miss'] += e.prompt_tokens
+        token_info['total'] += e.prompt_tokens + e.reasoning_tokens
+        token_info['escalated'] = False
+        token_info['reasoning_capped'] = True
+        return screen_verdict + (token_info,)
+    stats.escalated += 1
+    stats.escalate_latency += time.time() - escalate_start
+
+    account.add(config.cascade_model, prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens)
+    token_info['prompt'] += prompt_tokens
+    token_info['completion'] += completion_tokens
+    token_info['cache_hit'] += cache_hit
+    token_info['cache_miss'] += cache_miss
+    token_info['total'] += tokens
+    return relevance, reason, token_info
+
+
+def format_summary(lang, merged_tokens):
+    """
+    生成级联判断的统计文本：升级的论文数，以及与全部使用 cascade_model 相比估计节省的费用和请求耗时
+
+    全部使用 cascade_model 的费用和耗时按升级论文的平均值推算；
+    没有论文升级时，费用按初筛的token用量以 cascade_model 的价格估算，不估算耗时。
+    """
+    from ..price import price
+
+    stats = merge_stats()
+    if stats.screened == 0:
+        return []
+
+    lines = [lang['cascade_screened'].format(
+        model=config.model_name, screened=stats.screened, threshold=config.cascade_confidence_threshold,
+        cascade_model=config.cascade_model, escalated=stats.escalated,
+        ratio=stats.escalated / stats.screened * 100)]
+
+    def model_price(model, priced_as):
+        totals = merged_tokens['by_model'].get(model)
+        if not totals:
+            return 0.0
+        return price.calculate_token_price(totals['prompt'], totals['completion'], totals['cache_hit'],
+                                           totals['cache_miss'], model_name=priced_as)
+
+    actual_cost = model_price(config.model_name, config.model_name) + model_price(config.cascade_model, config.cascade_model)
+    if stats.escalated:
+        baseline_cost = model_price(config.cascade_model, config.cascade_model) / stats.escalated * stats.screened
+    else:
+        baseline_cost = model_price(config.model_name, config.cascade_model)
+    lines.append(lang['cascade_cost_saved'].format(
+        cascade_model=config.cascade_model, actual=price.format_price(actual_cost),
+        baseline=price.format_price(baseline_cost),
+        saved=(1 - actual_cost / baseline_cost) * 100 if baseline_cost else 0))
+
+    if stats.escalated:
+        actual_time = stats.screen_latency + stats.escalate_latency
+        baseline_time = stats.escalate_latency / stats.escalated * stats.screened
+        lines.append(lang['cascade_latency_saved'].format(
+            cascade_model=config.cascade_model, actual=actual_time, baseline=baseline_time,
+            saved=(1 - actual_time / baseline_time) * 100 if baseline_time else 0))
+    return lines
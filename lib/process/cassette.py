@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+from ..config import config_loader as config
+
+# orjson 为可选依赖：安装后使用其更快的编码/解码，否则回退到标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MODE_OFF = 'off'
+MODE_RECORD = 'record'
+MODE_REPLAY = 'replay'
+
+# 记录的 usage 字段
+USAGE_FIELDS = ('prompt_tokens', 'completion_tokens', 'total_tokens',
+                'prompt_cache_hit_tokens', 'prompt_cache_miss_tokens')
+
+_active = None
+_active_lock = threading.Lock()
+
+
+class CassetteMiss(KeyError):
+    """回放模式下磁带中没有对应请求的响应"""
+
+
+def _dumps(record):
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _open(path, mode):
+    # 以 .gz 结尾的磁带使用 gzip 压缩（追加写入会产生多个 gzip 成员，读取时自动连接）
+    if path.endswith('.gz'):
+        import gzip
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def fingerprint(request):
+    """
+    计算请求指纹：对模型、消息和生成参数做规范化 JSON 后取哈希
+
+    API 密钥不参与计算，因此密钥数量或分配方式变化后仍能命中。
+    流式与非流式请求记录的内容相同（推理内容都不保存），指纹中不区分。
+    """
+    if request.get('stream'):
+        request = dict(request, stream=False)
+        request.pop('stream_options', None)
+    canonical = json.dumps(request, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _usage_to_dict(response):
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return None
+    return {field: getattr(usage, field, 0) or 0 for field in USAGE_FIELDS}
+
+
+class Cassette:
+    """
+    API 响应磁带
+
+    记录模式：每次请求的指纹、模型返回内容、usage 和耗时追加写入一行 JSON；
+    回放模式：启动时一次性读入内存，按指纹返回与 openai 响应结构相同的对象，不访问网络。
+
+    参数:
+        path: 磁带文件路径（.jsonl 或 .jsonl.gz）
+        mode: 'record' 或 'replay'
+        latency_scale: 回放时按记录耗时的倍数等待，0 表示不等待
+    """
+
+    def __init__(self, path, mode, latency_scale=0.0):
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file = None
+        if mode == MODE_REPLAY:
+            self._load()
+        else:
+            folder = os.path.dirname(path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            self._file = _open(path, 'ab')
+
+    def _load(self):
+        try:
+            with _open(self.path, 'rb') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = _loads(line)
+                    except ValueError:
+                        continue
+                    # 同一指纹出现多次时以最后一次记录为准
+                    self._entries[entry['fp']] = entry
+        except (EOFError, OSError):
+            # 录制中断时 gzip 文件末尾可能不完整，已读到的记录仍然可用
+            pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, request, response, latency):
+        """记录一次真实请求的响应"""
+        entry = {
+            'fp': fingerprint(request),
+            'model': request.get('model'),
+            'content': response.choices[0].message.content,
+            'usage': _usage_to_dict(response),
+            'latency': round(latency, 4),
+        }
+        line = _dumps(entry) + b'\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+
+    def replay(self, request):
+        """
+        返回请求对应的响应对象
+
+        异常:
+            CassetteMiss: 磁带中没有该请求
+        """
+        fp = fingerprint(request)
+        entry = self._entries.get(fp)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            raise CassetteMiss(fp)
+
+        if self.latency_scale > 0 and entry.get('latency'):
+            time.sleep(entry['latency'] * self.latency_scale)
+
+        response = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=entry['content']))]
+        )
+        if entry.get('usage') is not None:
+            response.usage = SimpleNamespace(**entry['usage'])
+        return response
+
+    def close(self):
+        if self._file is not None:
+            with self._lock:
+                self._file.close()
+                self._file = None
+
+
+def default_path():
+    """未配置 cassette_path 时使用 Log 文件夹下的 Cassette.jsonl.gz"""
+    return config.cassette_path or os.path.join(config.LOG_FOLDER, 'Cassette.jsonl.gz')
+
+
+def _configured_mode():
+    mode = (config.cassette_mode or MODE_OFF).lower()
+    return mode if mode in (MODE_RECORD, MODE_REPLAY) else MODE_OFF
+
+
+def open_cassette():
+    """按配置打开磁带（模式为 off 时返回 None），在每次运行开始前调用"""
+    close_cassette()
+    return get_cassette()
+
+
+def get_cassette():
+    """获取当前磁带；未通过 open_cassette 打开但配置了模式时按需打开"""
+    global _active
+    if _active is None and _configured_mode() != MODE_OFF:
+        with _active_lock:
+            if _active is None:
+                _active = Cassette(default_path(), _configured_mode(),
+                                   float(config.cassette_latency_scale or 0.0))
+    return _active
+
+
+def close_cassette():
+    """关闭当前磁带，返回被关闭的磁带（没有时返回 None）"""
+    global _active
+    with _active_lock:
+        closed = _active
+        if closed is not None:
+            closed.close()
+        _active = None
+    return closed
@@ -0,0 +1,142 @@
+"""
+精简响应：判断请求中不相关的论文只输出 {"relevant": "N"}，不输出理由；
+开启 config.compact_lazy_reasons 时相关论文也先不输出理由，判断完成后再单独请求补充
+
+运行结束时按收到的理由的平均长度，估计与每篇论文都输出理由相比节省的输出token。
+"""
+import threading
+from . import data
+from . import cascade
+from . import prompt_budget
+from . import search_paper
+from ..config import config_loader as config
+
+# 没有收到任何理由时，每条理由按该token数估计（DeepSeek 一句简短理由约 20~40 token）
+DEFAULT_REASON_TOKENS = 30
+
+# 每个工作线程自己的统计对象，通过 threading.local 找到
+_local = threading.local()
+
+
+class CompactStats:
+    """
+    单个工作线程的精简响应统计
+
+    只由所属线程写入，运行结束后用 merge_stats 合并。
+    """
+    __slots__ = ('verdicts', 'completion', 'omitted', 'reasons', 'reason_tokens', 'reason_requests',
+                 'reason_completion')
+
+    def __init__(self):
+        self.verdicts = 0  # 判断结果数（多问题模式下每个主题计一次）
+        self.completion = 0  # 判断请求的输出token数
+        self.omitted = 0  # 判断请求中省略理由的结果数
+        self.reasons = 0  # 收到的理由数（判断请求中的理由和补充理由）
+        self.reason_tokens = 0  # 收到的理由按 JSON 字段估算的token数
+        self.reason_requests = 0  # 补充理由请求数
+        self.reason_completion = 0  # 补充理由请求的输出token数
+
+
+def enabled():
+    return bool(config.compact_response)
+
+
+def reset_stats():
+    """清空统计，在每次运行开始前调用"""
+    with data.token_lock:
+        data.compact_stats = []
+
+
+def _get_stats():
+    # 每次运行开始后（progress_generation 变化）重新注册
+    stats = getattr(_local, 'stats', None)
+    if stats is None or getattr(_local, 'generation', None) != data.progress_generation:
+        stats = CompactStats()
+        with data.token_lock:
+            data.compact_stats.append(stats)
+        _local.stats = stats
+        _local.generation = data.progress_generation
+    return stats
+
+
+def merge_stats():
+    """合并各线程的统计（应在所有工作线程结束后调用）"""
+    merged = CompactStats()
+    for stats in data.compact_stats:
+        for name in CompactStats.__slots__:
+            setattr(merged, name, getattr(merged, name) + getattr(stats, name))
+    return merged
+
+
+def _count_reason(stats, reason):
+    # 理由在响应中的形式为 , "reason": "..."（去掉 _parse_verdict 添加的前缀）
+    stats.reasons += 1
+    stats.reason_tokens += prompt_budget.count_tokens(', "reason": "%s"' % reason.split('：', 1)[-1])
+
+
+def record(reason, completion_tokens):
+    """记录一个判断结果：reason 为空表示响应中省略了理由"""
+    stats = _get_stats()
+    stats.verdicts += 1
+    stats.completion += completion_tokens
+    if reason:
+        _count_reason(stats, reason)
+    else:
+        stats.omitted += 1
+
+
+def complete(job, relevance, reason, title, abstract, api_key, account, token_info):
+    """
+    记录单个研究主题的判断结果；判断为相关但省略了理由时请求补充理由
+
+    补充请求的token按模型记入 account（不计论文数），并累加到 token_info。
+
+    返回:
+        理由（补充失败时为空字符串）
+    """
+    record(reason, token_info['completion'])
+    escalated = token_info.get('escalated', False)
+    if cascade.enabled() and not escalated:
+        # 级联初筛的判断请求带有置信度说明，补充请求沿用同一提示词
+        model, extra_instruction = config.model_name, search_paper.CONFIDENCE_INSTRUCTION
+    else:
+        model, extra_instruction = (config.cascade_model if escalated else config.model_name), ''
+    if not search_paper.needs_reason(relevance.strip().upper(), reason, model):
+        return reason
+
+    reason, tokens, prompt_tokens, completion_tokens, cache_hit, cache_miss = search_paper.fetch_reason(
+        job.rq, job.keywords, job.requirements, title, abstract, api_key, model, extra_instruction)
+    account.add(model, prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens, papers=0)
+    token_info['prompt'] += prompt_tokens
+    token_info['completion'] += completion_tokens
+    token_info['cache_hit'] += cache_hit
+    token_info['cache_miss'] += cache_miss
+    token_info['total'] += tokens
+    token_info['reason_request'] = True
+
+    stats = _get_stats()
+    stats.reason_requests += 1
+    stats.reason_completion += completion_tokens
+    if reason:
+        _count_reason(stats, reason)
+    return reason
+
+
+def format_summary(lang):
+    """
+    生成精简响应的统计文本，没有判断结果时返回空列表
+
+    与每篇论文都输出理由相比：基准输出 = 判断请求的输出 + 省略的理由数 × 平均理由token数，
+    实际输出 = 判断请求的输出 + 补充理由请求的输出。
+    """
+    stats = merge_stats()
+    if stats.verdicts == 0:
+        return []
+    per_reason = stats.reason_tokens / stats.reasons if stats.reasons else DEFAULT_REASON_TOKENS
+    actual = stats.completion + stats.reason_completion
+    baseline = stats.completion + stats.omitted * per_reason
+    return [lang['compact_summary'].format(
+        verdicts=stats.verdicts, omitted=stats.omitted, requests=stats.reason_requests,
+        reason_completion=stats.reason_completion, actual=actual, per_reason=per_reason,
+        baseline=int(baseline), saved=int(baseline - actual),
+        ratio=(1 - actual / baseline) * 100 if baseline else 0)]
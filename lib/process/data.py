@@ -1,5 +1,5 @@
+import collections
 import threading
-from collections import deque
 
 # 论文处理相关的全局变量
 result_file_name = ""
@@ -12,17 +12,49 @@ completion_tokens_used = 0
 prompt_cache_hit_tokens_used = 0
 prompt_cache_miss_tokens_used = 0
 
+# 各工作线程的token记账对象（lib.process.accounting.TokenAccount）
+# 运行结束后合并写回上面的合计变量；运行中的实时进度读取 token_events 的累加值
+token_accounts = []
+token_events = collections.deque()  # 每次记账追加 (任务, 论文数, 各项token增量)，读取实时合计时取出
+token_totals = dict.fromkeys(('papers', 'prompt', 'completion', 'cache_hit', 'cache_miss', 'total',
+                              'separate_prompt'), 0)  # 实时合计（lib.process.accounting.snapshot）
+
+# 各工作线程的级联判断统计（lib.process.cascade.CascadeStats）
+cascade_stats = []
+
+# 各工作线程的提示词预处理统计（lib.process.prompt_budget.BudgetStats）
+budget_stats = []
+
+# 各工作线程的精简响应统计（lib.process.compact.CompactStats）
+compact_stats = []
+
+# 各工作线程的流式请求统计（lib.process.streaming.StreamStats）
+stream_stats = []
+
+# 语料的近似重复索引（lib.process.near_duplicates.NearDuplicateIndex），未启用时为 None
+near_duplicate_index = None
+
+# 条目质量检查的结果 {paper_index: 类别}（lib.process.quality_gate），未启用时为 None
+entry_categories = None
+
+# 当前运行的查询任务（lib.process.job.Job），单查询运行时只有一个
+jobs = []
+
 # 日志文件相关的全局变量
 full_log_file = None
 
 # 线程锁
 file_write_lock = threading.Lock()
-token_lock = threading.Lock()
+token_lock = threading.Lock()  # 仅在登记/重置记账对象时使用
 progress_lock = threading.Lock()
 
 # 进度跟踪相关的全局变量
-processed_papers = 0
-processing_times = deque(maxlen=10)  # 存储最近10篇文章的处理时间
+processed_papers = 0  # 已处理论文数的累计值，读取进度时累加 progress_events
+busy_time = 0.0  # 单篇处理耗时的累计值
+progress_events = collections.deque()  # 工作线程每完成一篇论文追加 (论文数, 耗时)，读取进度时取出
+progress_generation = 0  # 每次运行递增，用于让线程重新注册各模块的统计对象
+throughput_ewma = None  # EWMA平滑后的整体处理速度（篇/秒）
+latency_ewma = None  # EWMA平滑后的单篇处理耗时（秒）
 start_time = None
 total_papers_to_process = 0
 progress_stop_event = threading.Event()
@@ -0,0 +1,143 @@
+"""
+预算上限：运行中按实时花费（元）和token用量判断是否接近上限，接近时停止派发新的论文
+
+进行中的请求会继续完成，未派发的论文在CSV中标记为未判断。
+"""
+import collections
+import threading
+from . import data
+from . import accounting
+from ..log import utils
+from ..config import config_loader as config
+from language import language
+
+# 未判断论文在CSV中的结果和原因
+UNJUDGED_RESULT = '-'
+UNJUDGED_REASON = '未判断：达到预算上限'
+# 预留按最近多少个已完成任务的最高花费计算
+RECENT_TASKS = 50
+
+
+def enabled():
+    return float(config.budget_limit_cny) > 0 or int(config.budget_limit_tokens) > 0
+
+
+class BudgetGovernor:
+    """
+    按 config.budget_limit_cny / budget_limit_tokens 限制一次运行的花费
+
+    花费按增量计价：每次检查时读取各模型自上次检查以来新增的token，按当前时段价格累加，
+    运行跨越优惠/标准时段时也能得到准确的实时花费。
+    每次派发任务前，为每个进行中的任务预留同类任务（完整判断、标题批次）最近的最高花费，
+    为即将派发的任务预留各类任务中的最高花费，使它们完成后的总花费不超过上限
+    （不按平均每篇花费预留：标题初筛等便宜的批次会拉低平均值）。
+    工作线程领取到任务后调用 begin()，任务完成后调用 finish()。
+
+    参数:
+        job_scheduler: JobScheduler 或 PaperQueue，达到上限时调用其 stop()
+    """
+
+    def __init__(self, job_scheduler):
+        self.job_scheduler = job_scheduler
+        self.limit_cny = float(config.budget_limit_cny)
+        self.limit_tokens = int(config.budget_limit_tokens)
+        self.spend = 0.0
+        self.tokens = 0
+        self.reached = False
+        self._busy = collections.Counter()  # 任务类型 -> 进行中的任务数
+        self._recent = {}  # 任务类型 -> 最近完成的任务的 (花费, token用量)
+        self._priced = {}  # model -> 已计价的 [prompt, completion, cache_hit, cache_miss]
+        self._lock = threading.Lock()
+
+    def _update_spend(self):
+        # 调用方持有 self._lock
+        from ..price import price
+
+        model_totals = {}
+        for account in list(data.token_accounts):
+            for model, counters in list(account.by_model.items()):
+                totals = model_totals.setdefault(model, [0, 0, 0, 0])
+                for i in range(4):
+                    totals[i] += counters[i + 1]
+        for model, totals in model_totals.items():
+            priced = self._priced.setdefault(model, [0, 0, 0, 0])
+            delta = [current - previous for current, previous in zip(totals, priced)]
+            if any(delta):
+                self.spend += price.calculate_token_price(*delta, model_name=model)
+                self._priced[model] = totals
+
+    def refresh(self):
+        """计入最后一次检查之后完成的请求（运行结束后调用），返回 (花费, token用量)"""
+        with self._lock:
+            self._update_spend()
+            self.tokens = accounting.snapshot()['total']
+            return self.spend, self.tokens
+
+    def begin(self, kind, accounts):
+        """
+        领取到任务后调用（在发送请求之前）
+
+        参数:
+            kind: 任务类型（scheduler 的 STAGE_*）
+            accounts: 本任务会记入的本线程记账对象
+
+        返回:
+            传给 finish() 的任务类型和各记账对象的当前用量
+        """
+        with self._lock:
+            self._busy[kind] += 1
+        return kind, [(account, {model: list(counters) for model, counters in account.by_model.items()})
+                      for account in accounts]
+
+    def finish(self, started):
+        """任务完成后调用（出错时也要调用）：按记账对象的增量记录本任务的花费和token用量"""
+        from ..price import price
+
+        kind, snapshots = started
+        cost = 0.0
+        tokens = 0
+        for account, before in snapshots:
+            for model, counters in list(account.by_model.items()):
+                delta = [current - previous for current, previous in zip(counters, before.get(model, [0] * len(counters)))]
+                tokens += delta[5]
+                if any(delta[1:5]):
+                    cost += price.calculate_token_price(*delta[1:5], model_name=model)
+        with self._lock:
+            self._busy[kind] -= 1
+            self._recent.setdefault(kind, collections.deque(maxlen=RECENT_TASKS)).append((cost, tokens))
+
+    def _reserve(self):
+        # 调用方持有 self._lock；返回 (预留花费, 预留token)
+        highest = {kind: (max(cost for cost, _ in recent), max(tokens for _, tokens in recent))
+                   for kind, recent in self._recent.items()}
+        reserve_cny = max((cost for cost, _ in highest.values()), default=0.0)
+        reserve_tokens = max((tokens for _, tokens in highest.values()), default=0)
+        for kind, busy in self._busy.items():
+            cost, tokens = highest.get(kind, (reserve_cny, reserve_tokens))
+            reserve_cny += cost * busy
+            reserve_tokens += tokens * busy
+        return reserve_cny, reserve_tokens
+
+    def check(self):
+        """
+        每次领取任务前调用：已花费加上进行中和即将派发的任务的预留接近上限时停止调度器
+
+        返回:
+            未达到上限时返回 True
+        """
+        with self._lock:
+            if self.reached:
+                return False
+            self._update_spend()
+            self.tokens = accounting.snapshot()['total']
+            reserve_cny, reserve_tokens = self._reserve()
+            over_cny = self.limit_cny > 0 and self.spend + reserve_cny >= self.limit_cny
+            over_tokens = self.limit_tokens > 0 and self.tokens + reserve_tokens >= self.limit_tokens
+            if not (over_cny or over_tokens):
+                return True
+            self.reached = True
+        self.job_scheduler.stop()
+        from ..price import price
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(lang['spend_limit_reached'].format(spend=price.format_price(self.spend), tokens=self.tokens))
+        return False
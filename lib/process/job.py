@@ -0,0 +1,166 @@
+import collections
+import os
+import re
+from ..log import verdict_log
+
+
+class Job:
+    """
+    一个查询任务的运行状态
+
+    每个任务有自己的研究问题、要处理的论文、输出文件和token记账对象，
+    多个任务可以在同一次运行中共享语料（data.paper_data）和API密钥池。
+
+    参数:
+        rq: 研究问题
+        keywords: 关键词
+        requirements: 筛选要求
+        paper_indices: 要处理的论文索引（data.paper_data 的键）
+        name: 任务名称，非空时作为输出文件名后缀
+        priority: 优先级（priority 调度策略下数值大的先处理）
+        weight: 权重（fair 调度策略下按权重分配请求）
+    """
+
+    def __init__(self, rq, keywords, requirements, paper_indices, name='', priority=0, weight=1.0):
+        self.rq = rq
+        self.keywords = keywords
+        self.requirements = requirements
+        self.paper_indices = list(paper_indices)
+        self.name = name or ''
+        self.priority = priority
+        self.weight = max(float(weight), 1e-6)
+
+        # 调度状态（只在调度器的锁内修改）
+        self.next_position = 0  # 下一篇领取的论文（启用标题初筛时为下一批初筛的起点）
+        self.order = 0
+        self.full_dispatched = 0  # 已分配的完整判断数
+        self.maybe_papers = collections.deque()  # 通过标题初筛、等待完整判断的论文
+        self.title_only_papers = []  # 条目质量检查后只根据标题判断的论文（不在 paper_indices 中）
+        self.title_only_position = 0  # 下一批只根据标题判断的起点
+
+        # 运行统计
+        self.accounts = []  # 处理过本任务论文的各线程记账对象
+        self.processed_papers = 0  # 已完成的论文数（accounting.snapshot 读取进度时累加）
+        self.relevant_count = 0
+        self.title_rejected = 0  # 标题初筛判断为明显无关的论文数
+        self.title_only_uncertain = 0  # 只根据标题判断为可能相关、待人工确认的论文数
+        self.unjudged = 0  # 因达到预算上限未判断的论文数
+        self.prompt_overhead = 0  # 提示词中除标题和摘要以外部分的token数（运行开始时计算）
+        self.classifier = None  # 启用本地分类器时的 local_classifier.JobClassifier
+        self.duplicates = None  # 启用近似重复判断沿用时的 near_duplicates.JobPropagator
+        self.keyword_scan = None  # 启用关键词预筛时的 keyword_filter.KeywordScan
+        self.sample_info = None  # 抽样运行的抽样参数（写入Y/N日志的运行信息，完整运行据此复用判断结果）
+
+        # 输出文件
+        self.result_file_name = ''
+        self.result_file_path = ''
+        self.log_file_path = ''
+        self.yon_log_file_path = ''
+        self.yon_csv_file_path = ''
+        self.result_log = None
+        self.yon_log = None
+
+    @property
+    def total(self):
+        return len(self.paper_indices) + len(self.title_only_papers)
+
+    @property
+    def remaining(self):
+        return len(self.paper_indices) - self.next_position
+
+    def processed(self):
+        """已完成的论文数（截至最近一次 accounting.snapshot）"""
+        return self.processed_papers
+
+    def file_suffix(self):
+        if not self.name:
+            return ''
+        return '_' + re.sub(r'[^\w.-]+', '_', self.name).strip('_')
+
+    def open_outputs(self, result_folder, log_folder, timestamp, query_time, folder_info, year_info):
+        """创建本任务的结果文件、Y/N 日志和 CSV"""
+        suffix = self.file_suffix()
+        self.result_file_name = f"Result_{timestamp}{suffix}"
+        self.result_file_path = os.path.join(result_folder, f"{self.result_file_name}.bib")
+        self.log_file_path = os.path.join(log_folder, f"Log_{self.result_file_name}.jsonl")
+        self.yon_log_file_path = os.path.join(log_folder, f"Log_YoN_{timestamp}{suffix}.jsonl")
+        # CSV 文件（无表头）
+        self.yon_csv_file_path = os.path.join(log_folder, f"Overall_{timestamp}{suffix}.csv")
+        with open(self.yon_csv_file_path, 'w', encoding='utf-8') as _f:
+            pass
+
+        # 在结果文件开头写入详细的查询信息
+        with open(self.result_file_path, 'w', encoding='utf-8') as result_file:
+            result_file.write(f"% Query Time: {query_time}\n")
+            if self.name:
+                result_file.write(f"% Job: {self.name}\n")
+            result_file.write(f"% Selected Folders: {folder_info}\n")
+            result_file.write(f"% Year Range: {year_info}\n")
+            result_file.write(f"% Research Question: {self.rq}\n")
+            result_file.write(f"% Keywords: {self.keywords}\n")
+            if self.requirements:
+                result_file.write(f"% Requirements: {self.requirements}\n")
+            result_file.write(f"\n% Search Topic {{{self.rq}}}\n\n")
+
+        # 相关论文日志和Y/N判断日志均为JSON Lines格式，首行记录查询信息
+        run_header = {
+            'query_time': query_time,
+            'selected_folders': folder_info,
+            'year_range': year_info,
+            'research_question': self.rq,
+            'keywords': self.keywords,
+            'requirements': self.requirements
+        }
+        if self.name:
+            run_header['job'] = self.name
+        if self.sample_info is not None:
+            run_header['sample'] = self.sample_info
+        self.result_log = verdict_log.VerdictLogWriter(self.log_file_path, run_header)
+        self.yon_log = verdict_log.VerdictLogWriter(self.yon_log_file_path, run_header)
+
+    def close_outputs(self):
+        for writer in (self.result_log, self.yon_log):
+            if writer is not None:
+                writer.close()
+
+
+def build_jobs(specs, paper_data):
+    """
+    根据任务描述创建 Job 列表（所有任务共享同一份已读取的语料）
+
+    参数:
+        specs: 任务描述列表，每项为字典：
+            name（必填，唯一）、question（必填）、keywords、requirements、
+            priority（默认 0）、weight（默认 1）、
+            folders（只处理这些文件夹中的论文，默认全部）、limit（最多处理的论文数）
+        paper_data: 已读取的语料（data.paper_data）
+
+    异常:
+        ValueError: 任务描述不完整或名称重复
+    """
+    jobs = []
+    names = set()
+    all_indices = sorted(paper_data)
+    for position, spec in enumerate(specs, 1):
+        name = str(spec.get('name', '')).strip()
+        question = str(spec.get('question', '')).strip()
+        if not name:
+            raise ValueError(f"job #{position}: 'name' is required")
+        if name in names:
+            raise ValueError(f"job #{position}: duplicate name {name!r}")
+        if not question:
+            raise ValueError(f"job {name!r}: 'question' is required")
+        names.add(name)
+
+        indices = all_indices
+        folders = spec.get('folders')
+        if folders:
+            folders = set(folders)
+            indices = [i for i in indices if paper_data[i].get('source_folder') in folders]
+        limit = spec.get('limit')
+        if limit:
+            indices = indices[:int(limit)]
+
+        jobs.append(Job(question, spec.get('keywords', ''), spec.get('requirements', ''), indices,
+                        name=name, priority=int(spec.get('priority', 0)), weight=float(spec.get('weight', 1.0))))
+    return jobs
@@ -0,0 +1,264 @@
+"""
+关键词预筛：在发送任何请求之前，用 Keywords 中的关键词在本地扫描所有论文的标题和摘要
+
+关键词按英文逗号（或中文逗号、分号）分隔，忽略大小写，并展开为单复数和常见词形变化
+（只变化词组的最后一个单词），config.keyword_synonyms 中的同义词计入对应的关键词。
+所有写法编译为一个按前缀合并的正则表达式，分块拼接论文文本后一次扫描。
+
+按 config.keyword_prefilter_mode 使用扫描结果：
+    tag: 只在Y/N日志中记录命中的关键词
+    filter: 没有命中任何关键词的论文直接记为 N（stage 为 keyword），不发送请求
+    prioritize: 命中关键词多的论文先判断
+"""
+import re
+import time
+from bisect import bisect_right
+from . import data
+from ..config import config_loader as config
+
+MODE_OFF = 'off'
+MODE_TAG = 'tag'
+MODE_FILTER = 'filter'
+MODE_PRIORITIZE = 'prioritize'
+MODES = (MODE_OFF, MODE_TAG, MODE_FILTER, MODE_PRIORITIZE)
+
+# 没有命中关键词而直接记为 N 的论文在Y/N日志中的 stage 和原因
+STAGE_KEYWORD = 'keyword'
+FILTERED_REASON = "不相关原因：标题和摘要中没有出现任何关键词"
+
+# 每次拼接扫描的论文数
+SCAN_CHUNK = 10000
+# 拼接论文文本的分隔符（不属于单词，也不属于词组中的分隔）
+_PAPER_SEPARATOR = '\x00'
+
+# 词组中单词之间的分隔：空白或连字符
+_SEPARATOR_PATTERN = r'[\s\-]+'
+_SEPARATOR_RE = re.compile(_SEPARATOR_PATTERN)
+_KEYWORD_SPLIT_RE = re.compile(r'[,，;；]')
+# 词形变化：去掉的后缀（按顺序尝试，剩余部分至少 3 个字母）和可以接上的后缀
+_STRIP_SUFFIXES = ('ations', 'ation', 'ings', 'ing', 'ers', 'er', 'ies', 'ied', 'ed', 'es', 's', 'e', 'y')
+_ADD_SUFFIXES = ('', 's', 'es', 'e', 'ed', 'ing', 'ings', 'er', 'ers', 'ation', 'ations', 'y', 'ies', 'ied', 'ying')
+_BOUND_SUFFIXES = ('e', 'y', 'ies', 'ied')
+_MIN_STEM = 3
+
+_matchers = {}
+
+
+def mode():
+    value = str(config.keyword_prefilter_mode or MODE_OFF).lower()
+    return value if value in MODES else MODE_OFF
+
+
+def enabled():
+    return mode() != MODE_OFF
+
+
+def split_keywords(keywords):
+    """把 Keywords 字符串拆分为关键词列表（去掉空项和忽略大小写后重复的项）"""
+    result = []
+    seen = set()
+    for keyword in _KEYWORD_SPLIT_RE.split(keywords or ''):
+        keyword = ' '.join(keyword.split())
+        if keyword and keyword.casefold() not in seen:
+            seen.add(keyword.casefold())
+            result.append(keyword)
+    return result
+
+
+def word_variants(word):
+    """单个英文单词的单复数和常见词形变化（已转为小写）；非英文单词只返回自身"""
+    if not word.isascii() or not word.isalpha() or len(word) <= _MIN_STEM:
+        return {word, word + 's'} if word.isascii() and word.isalpha() else {word}
+    stem = word
+    stripped = ''
+    for suffix in _STRIP_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM and not word.endswith('ss'):
+            stem, stripped = word[:-len(suffix)], suffix
+            break
+    variants = {stem + suffix for suffix in _ADD_SUFFIXES if len(stem + suffix) > _MIN_STEM}
+    if stripped in _BOUND_SUFFIXES:
+        # 去掉 e / y 后的词干本身不是单词（gaze -> gaz，entry -> entr）
+        variants.discard(stem)
+    variants.add(word)
+    return variants
+
+
+def phrase_variants(phrase):
+    """关键词（可以是词组）的所有写法，词组中单词之间用单个空格连接"""
+    words = phrase.casefold().split()
+    if not words:
+        return set()
+    prefix = ' '.join(words[:-1])
+    return {f"{prefix} {variant}" if prefix else variant for variant in word_variants(words[-1])}
+
+
+def _trie_pattern(node):
+    # node: {字符: 子节点}，'' 表示到此为一个完整的写法
+    branches = []
+    for char, child in sorted(node.items()):
+        if char:
+            branches.append((_SEPARATOR_PATTERN if char == ' ' else re.escape(char)) + _trie_pattern(child))
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        return ('(?:' + body + ')?') if len(branches) == 1 else body + '?'
+    return body
+
+
+class KeywordMatcher:
+    """
+    编译后的关键词匹配器
+
+    参数:
+        keywords: Keywords 字符串（逗号分隔）
+        synonyms: {关键词: [同义词, ...]}，同义词按同样的规则展开，命中时计入该关键词
+    """
+
+    def __init__(self, keywords, synonyms=None):
+        self.keywords = split_keywords(keywords)
+        synonyms = {str(key).casefold(): value for key, value in (synonyms or {}).items()}
+        self._lookup = {}  # 写法 -> 关键词序号集合
+        for keyword_id, keyword in enumerate(self.keywords):
+            extra = synonyms.get(keyword.casefold()) or []
+            if isinstance(extra, str):
+                extra = split_keywords(extra)
+            for phrase in [keyword] + list(extra):
+                for variant in phrase_variants(phrase):
+                    self._lookup.setdefault(variant, set()).add(keyword_id)
+        # 词组的写法同时计入其中包含的较短关键词（正则在同一位置只匹配最长的写法）
+        for variant, keyword_ids in self._lookup.items():
+            words = variant.split(' ')
+            for start in range(len(words)):
+                for end in range(start + 1, len(words) + 1):
+                    if end - start < len(words):
+                        keyword_ids.update(self._lookup.get(' '.join(words[start:end]), ()))
+        self._lookup = {variant: tuple(sorted(ids)) for variant, ids in self._lookup.items()}
+
+        trie = {}
+        for variant in self._lookup:
+            node = trie
+            for char in variant:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        # 英文单词和数字后面不能紧接其他字母或数字（前面的检查在 _finditer 中进行：
+        # 模式以字面字符开头时正则引擎可以按首字符集合快速跳过，加上后顾断言会使扫描慢数倍）；中文关键词按子串匹配
+        self._pattern = re.compile(_trie_pattern(trie) + r'(?![0-9a-z])') if trie else None
+
+    def _finditer(self, text):
+        """依次返回前面不紧接字母或数字的匹配；单词中间的匹配丢弃后从下一个字符继续查找"""
+        search = self._pattern.search
+        match = search(text)
+        while match is not None:
+            start = match.start()
+            previous = text[start - 1] if start else ''
+            if previous and ('a' <= previous <= 'z' or '0' <= previous <= '9'):
+                match = search(text, start + 1)
+                continue
+            yield match
+            match = search(text, match.end())
+
+    @property
+    def variant_count(self):
+        return len(self._lookup)
+
+    def scan(self, paper_indices):
+        """
+        扫描论文的标题和摘要
+
+        返回:
+            KeywordScan
+        """
+        start_time = time.perf_counter()
+        paper_indices = [i for i in paper_indices if i in data.paper_data]
+        tags = {}
+        if self._pattern is not None:
+            for chunk_start in range(0, len(paper_indices), SCAN_CHUNK):
+                chunk = paper_indices[chunk_start:chunk_start + SCAN_CHUNK]
+                texts = []
+                offsets = []
+                position = 0
+                for paper_index in chunk:
+                    paper = data.paper_data[paper_index]
+                    text = f"{paper['title']} {paper['abstract']}"
+                    offsets.append(position)
+                    texts.append(text)
+                    position += len(text) + 1
+                # 拼接后统一转为小写，一次扫描整块文本，按偏移找到所属论文
+                joined = _PAPER_SEPARATOR.join(texts).casefold()
+                if len(joined) != position - 1:
+                    # 个别字符转为小写后长度变化（如 ß），逐篇转换以保持偏移正确
+                    joined = _PAPER_SEPARATOR.join(text.casefold() for text in texts)
+                    offsets = []
+                    position = 0
+                    for text in texts:
+                        offsets.append(position)
+                        position += len(text.casefold()) + 1
+                for match in self._finditer(joined):
+                    keyword_ids = self._lookup.get(_SEPARATOR_RE.sub(' ', match.group()))
+                    if keyword_ids:
+                        paper_index = chunk[bisect_right(offsets, match.start()) - 1]
+                        tags.setdefault(paper_index, set()).update(keyword_ids)
+        tags = {paper_index: tuple(sorted(ids)) for paper_index, ids in tags.items()}
+        return KeywordScan(self, paper_indices, tags, time.perf_counter() - start_time)
+
+
+class KeywordScan:
+    """
+    一次扫描的结果
+
+    属性:
+        tags: {paper_index: 命中的关键词序号}，只包含至少命中一个关键词的论文
+        hits: 每个关键词命中的论文数
+    """
+
+    def __init__(self, matcher, paper_indices, tags, seconds):
+        self.matcher = matcher
+        self.paper_indices = paper_indices
+        self.tags = tags
+        self.seconds = seconds
+        self.hits = [0] * len(matcher.keywords)
+        for keyword_ids in tags.values():
+            for keyword_id in keyword_ids:
+                self.hits[keyword_id] += 1
+
+    def keywords_of(self, paper_index):
+        """论文命中的关键词"""
+        return [self.matcher.keywords[i] for i in self.tags.get(paper_index, ())]
+
+    def unmatched(self):
+        """没有命中任何关键词的论文（保持原顺序）"""
+        return [i for i in self.paper_indices if i not in self.tags]
+
+    def prioritized(self, paper_indices):
+        """按命中的关键词数从多到少排序（相同时保持原顺序）"""
+        return sorted(paper_indices, key=lambda i: -len(self.tags.get(i, ())))
+
+    def format_lines(self, lang, name=''):
+        """扫描结果和每个关键词的命中数"""
+        papers = len(self.paper_indices)
+        lines = [lang['keyword_scan'].format(
+            name=f"[{name}] " if name else '', mode=mode(), keywords=len(self.matcher.keywords),
+            variants=self.matcher.variant_count, papers=papers, seconds=self.seconds, matched=len(self.tags),
+            ratio=len(self.tags) / papers * 100 if papers else 0)]
+        for keyword, hits in zip(self.matcher.keywords, self.hits):
+            lines.append(lang['keyword_hits'].format(keyword=keyword, hits=hits,
+                                                     ratio=hits / papers * 100 if papers else 0))
+        if mode() == MODE_FILTER:
+            lines.append(lang['keyword_filtered'].format(count=papers - len(self.tags)))
+        return lines
+
+
+def get_matcher(keywords):
+    """按关键词和当前的同义词配置取得（编译并缓存）匹配器"""
+    synonyms = config.keyword_synonyms or {}
+    key = (keywords, repr(sorted((str(k), repr(v)) for k, v in synonyms.items())))
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = KeywordMatcher(keywords, synonyms)
+    return matcher
+
+
+def scan_job(job):
+    """扫描一个任务的论文"""
+    return get_matcher(job.keywords).scan(job.paper_indices)
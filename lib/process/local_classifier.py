@@ -0,0 +1,336 @@
+"""
+本地相关性分类器：用已有的判断结果训练哈希 n-gram 特征的逻辑回归（numpy，只用 CPU），
+预测其余论文的相关概率，概率极低的论文不再发送请求（按比例抽查）
+
+训练数据来自历史 Log_YoN 日志中同一研究问题的判断结果，不足时先让模型判断本次运行中随机抽取的一批论文。
+numpy 为可选依赖，未安装时不启用。
+"""
+import glob
+import os
+import random
+import re
+import threading
+import zlib
+from . import accounting
+from . import data
+from ..log import utils
+from ..log import verdict_log
+from ..config import config_loader as config
+from language import language
+
+# 哈希特征的维数（2 的幂）
+N_FEATURES = 1 << 18
+# 训练至少需要的判断结果数，以及相关、不相关各自至少需要的数量
+MIN_LABELS = 100
+MIN_PER_CLASS = 10
+# 留出评估的比例
+HOLDOUT_RATIO = 0.2
+# 抽取训练样本和划分留出集的随机种子（同一语料多次运行结果一致）
+RANDOM_SEED = 0
+# 训练参数
+EPOCHS = 300
+LEARNING_RATE = 0.05
+L2 = 1e-4
+
+# 本地分类器跳过的论文在Y/N日志中的 stage（不作为后续训练数据）和原因
+STAGE_CLASSIFIER = 'classifier'
+SKIP_REASON = "不相关原因：本地分类器判断为明显无关（相关概率 {probability:.4f}）"
+
+# decide 的结果：跳过 / 低于阈值但抽查
+ACTION_SKIP = 'skip'
+ACTION_AUDIT = 'audit'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[一-鿿]')
+
+
+def enabled():
+    return bool(config.local_classifier_enabled)
+
+
+def _hash(token):
+    return zlib.crc32(token.encode('utf-8')) & (N_FEATURES - 1)
+
+
+def _paper_features(paper):
+    """论文标题和摘要的哈希特征索引（单词和相邻单词对；中文按单字和相邻两字）"""
+    tokens = _TOKEN_RE.findall(f"{paper['title']} {paper['abstract']}".lower())
+    features = {_hash(token) for token in tokens}
+    features.update(_hash(f"{a} {b}") for a, b in zip(tokens, tokens[1:]))
+    return features
+
+
+def featurize(papers):
+    """
+    把论文转换为稀疏特征矩阵（每篇论文的特征按 L2 归一化）
+
+    返回:
+        (rows, columns, values)：非零元素所在的论文序号、特征索引和取值
+    """
+    import numpy as np
+
+    rows = []
+    columns = []
+    for row, paper in enumerate(papers):
+        features = _paper_features(paper)
+        rows.extend([row] * len(features))
+        columns.extend(features)
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.asarray(columns, dtype=np.int64)
+    counts = np.bincount(rows, minlength=len(papers)) if len(rows) else np.zeros(len(papers))
+    values = 1.0 / np.sqrt(np.maximum(counts, 1))[rows] if len(rows) else np.zeros(0)
+    return rows, columns, values
+
+
+class LogisticModel:
+    """带 L2 正则的逻辑回归，按类别频率加权（相关论文通常很少），用 Adam 全批量训练"""
+
+    def __init__(self):
+        self.weights = None
+        self.bias = 0.0
+
+    def _scores(self, matrix, count):
+        import numpy as np
+
+        rows, columns, values = matrix
+        return np.bincount(rows, weights=self.weights[columns] * values, minlength=count) + self.bias
+
+    def fit(self, matrix, labels):
+        import numpy as np
+
+        rows, columns, values = matrix
+        labels = np.asarray(labels, dtype=np.float64)
+        count = len(labels)
+        positive = labels.sum()
+        sample_weights = np.where(labels > 0, count / (2 * max(positive, 1)), count / (2 * max(count - positive, 1)))
+
+        self.weights = np.zeros(N_FEATURES)
+        self.bias = 0.0
+        moment = np.zeros(N_FEATURES + 1)
+        velocity = np.zeros(N_FEATURES + 1)
+        for step in range(1, EPOCHS + 1):
+            probabilities = 1.0 / (1.0 + np.exp(-self._scores(matrix, count)))
+            errors = (probabilities - labels) * sample_weights / count
+            gradient = np.empty(N_FEATURES + 1)
+            gradient[:-1] = np.bincount(columns, weights=errors[rows] * values, minlength=N_FEATURES) + L2 * self.weights
+            gradient[-1] = errors.sum()
+            moment = 0.9 * moment + 0.1 * gradient
+            velocity = 0.999 * velocity + 0.001 * gradient * gradient
+            update = LEARNING_RATE * (moment / (1 - 0.9 ** step)) / (np.sqrt(velocity / (1 - 0.999 ** step)) + 1e-8)
+            self.weights -= update[:-1]
+            self.bias -= update[-1]
+        return self
+
+    def predict(self, matrix, count):
+        """返回每篇论文为相关的概率"""
+        import numpy as np
+
+        return 1.0 / (1.0 + np.exp(-self._scores(matrix, count)))
+
+
+def load_past_labels(job, log_folder=None):
+    """
+    从历史 Log_YoN 日志中读取同一研究问题（研究问题和要求都相同）的判断结果
+
+    只使用模型完整判断的结果（跳过标题初筛和本地分类器给出的结果），
+    按（标题, 来源）对应到本任务的论文，同一论文以最近的结果为准。
+
+    返回:
+        {paper_index: 'Y' / 'N'}
+    """
+    log_folder = log_folder or config.LOG_FOLDER
+    index = {}
+    for paper_index in job.paper_indices:
+        paper = data.paper_data.get(paper_index)
+        if paper is not None:
+            source = f"{paper.get('source_folder', '')}/{paper.get('source_file', '')}"
+            index[(paper['title'], source)] = paper_index
+    labels = {}
+    for path in sorted(glob.glob(os.path.join(log_folder, 'Log_YoN_*.jsonl')), key=os.path.getmtime):
+        try:
+            header = verdict_log.read_header(path)
+            if not header or header.get('research_question') != job.rq or \
+                    (header.get('requirements') or '') != (job.requirements or ''):
+                continue
+            for record in verdict_log.iter_verdicts(path):
+                if record.get('stage') not in (None, 'full') or record.get('result') not in ('Y', 'N'):
+                    continue
+                paper_index = index.get((record.get('title'), record.get('source')))
+                if paper_index is not None:
+                    labels[paper_index] = record['result']
+        except (OSError, ValueError):
+            # 写入中断或格式错误的日志直接跳过
+            continue
+    return labels
+
+
+def _audit_selected(paper_index, rate):
+    """按论文索引的哈希确定是否抽查（与线程和处理顺序无关）"""
+    return zlib.crc32(str(paper_index).encode('ascii')) % 10000 < rate * 10000
+
+
+class JobClassifier:
+    """
+    单个任务的本地分类器
+
+    运行开始时读入历史判断结果；不足以训练时把随机抽取的 config.local_classifier_seed_size 篇论文排到最前面，
+    这些论文的判断结果到齐后训练并预测其余论文。预测前领取的论文照常发送请求。
+
+    参数:
+        job: 所属任务（会调整 job.paper_indices 的顺序）
+        past_labels: load_past_labels 的结果
+    """
+
+    def __init__(self, job, past_labels):
+        self.job = job
+        self.threshold = float(config.local_classifier_threshold)
+        self.audit_rate = float(config.local_classifier_audit_rate)
+        self.past_labels = past_labels
+        self.labels = {}  # 本次运行中模型给出的判断结果
+        self.scores = None  # 训练后：{paper_index: 相关概率}
+        self.evaluation = None
+        self.skipped = 0
+        self.audited = 0
+        self.audit_relevant = 0
+        self._lock = threading.Lock()
+
+        seed_size = max(0, int(config.local_classifier_seed_size))
+        self._next_attempt = 0
+        if not self._sufficient(past_labels):
+            # 历史结果不足：随机抽取一批论文排到最前面先判断
+            rng = random.Random(RANDOM_SEED)
+            unlabeled = [i for i in job.paper_indices if i not in past_labels]
+            seed = set(rng.sample(unlabeled, min(seed_size, len(unlabeled))))
+            job.paper_indices = [i for i in job.paper_indices if i in seed] + \
+                                [i for i in job.paper_indices if i not in seed]
+            self._next_attempt = len(seed)
+
+    @staticmethod
+    def _sufficient(labels):
+        positive = sum(1 for verdict in labels.values() if verdict == 'Y')
+        return len(labels) >= MIN_LABELS and positive >= MIN_PER_CLASS and len(labels) - positive >= MIN_PER_CLASS
+
+    def train_if_ready(self):
+        """判断结果足够时训练（运行开始时和每次收到判断结果后调用），返回是否已训练"""
+        if self.scores is not None:
+            return True
+        with self._lock:
+            if self.scores is not None or len(self.labels) < self._next_attempt:
+                return self.scores is not None
+            labels = dict(self.past_labels)
+            labels.update(self.labels)
+            if not self._sufficient(labels):
+                # 样本中相关或不相关的论文太少：再判断一批后重试
+                self._next_attempt = len(self.labels) + max(1, int(config.local_classifier_seed_size))
+                return False
+            self._train(labels)
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(self.format_training(lang))
+        return True
+
+    def _train(self, labels):
+        import numpy as np
+
+        indices = sorted(labels)
+        rng = random.Random(RANDOM_SEED)
+        holdout = set(rng.sample(indices, int(len(indices) * HOLDOUT_RATIO)))
+        train = [i for i in indices if i not in holdout]
+        test = [i for i in indices if i in holdout]
+
+        def fit(paper_indices):
+            matrix = featurize([data.paper_data[i] for i in paper_indices])
+            return LogisticModel().fit(matrix, [labels[i] == 'Y' for i in paper_indices])
+
+        # 留出评估：按 0.5 计算精确率和召回率，并统计会被阈值跳过的相关论文
+        probabilities = fit(train).predict(featurize([data.paper_data[i] for i in test]), len(test))
+        actual = np.array([labels[i] == 'Y' for i in test])
+        predicted = probabilities >= 0.5
+        true_positive = int((predicted & actual).sum())
+        self.evaluation = {
+            'labels': len(indices),
+            'past': len(self.past_labels),
+            'current': len(self.labels),
+            'positive': sum(1 for verdict in labels.values() if verdict == 'Y'),
+            'holdout': len(test),
+            'holdout_positive': int(actual.sum()),
+            'precision': true_positive / predicted.sum() if predicted.sum() else 0.0,
+            'recall': true_positive / actual.sum() if actual.sum() else 0.0,
+            'lost': int((actual & (probabilities < self.threshold)).sum()),
+            'below': int((probabilities < self.threshold).sum()),
+        }
+
+        # 用全部判断结果重新训练，预测其余论文
+        model = fit(indices)
+        remaining = [i for i in self.job.paper_indices if i not in labels and i in data.paper_data]
+        scores = model.predict(featurize([data.paper_data[i] for i in remaining]), len(remaining)) if remaining else []
+        self.scores = dict(zip(remaining, (float(p) for p in scores)))
+
+    def decide(self, paper_index):
+        """
+        领取论文时调用
+
+        返回:
+            (action, probability)：action 为 None（照常判断）、ACTION_SKIP（跳过）或 ACTION_AUDIT（低于阈值但抽查）
+        """
+        if self.scores is None:
+            return None, None
+        probability = self.scores.get(paper_index)
+        if probability is None or probability >= self.threshold:
+            return None, probability
+        if _audit_selected(paper_index, self.audit_rate):
+            with self._lock:
+                self.audited += 1
+            return ACTION_AUDIT, probability
+        with self._lock:
+            self.skipped += 1
+        return ACTION_SKIP, probability
+
+    def observe(self, paper_index, verdict, audit=False):
+        """记录模型对一篇论文的判断结果"""
+        with self._lock:
+            if self.scores is None:
+                self.labels[paper_index] = verdict
+            if audit and verdict == 'Y':
+                self.audit_relevant += 1
+        if self.scores is None:
+            self.train_if_ready()
+
+    def format_training(self, lang):
+        evaluation = self.evaluation
+        return lang['classifier_trained'].format(
+            name=self.job.name or '-', labels=evaluation['labels'], past=evaluation['past'],
+            current=evaluation['current'], positive=evaluation['positive'], holdout=evaluation['holdout'],
+            precision=evaluation['precision'] * 100, recall=evaluation['recall'] * 100,
+            threshold=self.threshold, lost=evaluation['lost'], holdout_positive=evaluation['holdout_positive'],
+            below=evaluation['below'])
+
+    def format_summary(self, lang):
+        if self.scores is None:
+            labels = dict(self.past_labels)
+            labels.update(self.labels)
+            return lang['classifier_untrained'].format(
+                name=self.job.name or '-', labels=len(labels),
+                positive=sum(1 for verdict in labels.values() if verdict == 'Y'))
+        miss_rate = self.audit_relevant / self.audited if self.audited else 0.0
+        return lang['classifier_summary'].format(
+            name=self.job.name or '-', skipped=self.skipped, audited=self.audited,
+            audit_relevant=self.audit_relevant, estimated=miss_rate * self.skipped)
+
+
+def attach(jobs):
+    """
+    为每个任务创建本地分类器（运行开始前、创建调度器之前调用）
+
+    返回:
+        是否已启用（未安装 numpy 时输出提示并返回 False）
+    """
+    lang = language.get_text(config.LANGUAGE)
+    if not accounting.numpy_available():
+        utils.print_and_log(lang['classifier_numpy_missing'])
+        return False
+    utils.print_and_log(lang['classifier_mode'].format(
+        threshold=config.local_classifier_threshold, audit=float(config.local_classifier_audit_rate) * 100,
+        seed=config.local_classifier_seed_size))
+    for job in jobs:
+        job.classifier = JobClassifier(job, load_past_labels(job))
+        job.classifier.train_if_ready()
+    return True
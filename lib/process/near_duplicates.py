@@ -0,0 +1,301 @@
+"""
+近似重复论文：同一工作的不同版本（预印本、会议、期刊扩展版）标题和 DOI 不同，但摘要几乎相同
+
+读取语料时按摘要的单词 3-gram 计算 MinHash 签名，用 LSH 分桶找出候选对，签名相似度不低于
+config.near_duplicate_threshold 的论文合并为一个簇。运行时每个簇中第一篇得到模型判断的论文把结果
+沿用到其余论文（Y/N日志中 stage 为 propagated），可按 config.near_duplicate_audit_rate 抽查。
+numpy 为可选依赖，未安装时不启用。
+"""
+import re
+import threading
+import time
+import zlib
+from . import accounting
+from . import data
+from ..log import utils
+from ..config import config_loader as config
+from language import language
+
+# MinHash 签名长度和 LSH 分段：16 段 × 4 行，估计相似度约 0.5 以上的论文对会成为候选
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# 单词 n-gram 的长度；摘要中少于该数量的 n-gram 时不参与（缺失或过短的摘要）
+SHINGLE_WORDS = 3
+MIN_SHINGLES = 10
+# 每批计算签名的 n-gram 数（一批的中间矩阵约 NUM_PERM × 该值 × 8 字节）
+BATCH_SHINGLES = 1 << 16
+# 生成哈希参数的随机种子
+RANDOM_SEED = 1
+
+# 沿用判断的论文在Y/N日志中的 stage（不作为本地分类器的训练数据）
+STAGE_PROPAGATED = 'propagated'
+PROPAGATED_REASON = "{reason}（沿用近似重复论文 #{source} 的判断，相似度 {similarity:.2f}）"
+
+# decide 的结果：沿用判断 / 抽查
+ACTION_PROPAGATE = 'propagate'
+ACTION_AUDIT = 'audit'
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[一-鿿]')
+
+
+def enabled():
+    return bool(config.near_duplicate_enabled)
+
+
+class NearDuplicateIndex:
+    """
+    近似重复簇
+
+    属性:
+        clusters: {paper_index: 簇代表（簇中最小的 paper_index）}，只包含属于某个簇的论文
+        papers: 参与索引的论文数（跳过缺失或过短的摘要）
+        seconds: 建立索引的耗时（秒）
+    """
+
+    def __init__(self, clusters, signatures, papers, seconds):
+        self.clusters = clusters
+        self.papers = papers
+        self.seconds = seconds
+        self._signatures = signatures  # 簇中论文的签名（每个值取低 16 位）
+
+    @property
+    def cluster_count(self):
+        return len(set(self.clusters.values()))
+
+    def similarity(self, paper_index, other_index):
+        """两篇同簇论文的估计 Jaccard 相似度"""
+        return float((self._signatures[paper_index] == self._signatures[other_index]).mean())
+
+    def nbytes(self):
+        """索引常驻内存的近似字节数（簇映射按每项约 100 字节估算）"""
+        return sum(signature.nbytes for signature in self._signatures.values()) + len(self.clusters) * 100
+
+
+def _hash_parameters(np):
+    rng = np.random.default_rng(RANDOM_SEED)
+    maximum = np.iinfo(np.uint64).max
+    # 乘数取奇数
+    multipliers = rng.integers(1, maximum, size=NUM_PERM, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    band_multipliers = rng.integers(1, maximum, size=ROWS, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    return multipliers, band_multipliers
+
+
+def _shingles(text, np):
+    """摘要的单词 3-gram 哈希（uint64），过短时返回 None"""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if len(tokens) < SHINGLE_WORDS + MIN_SHINGLES - 1:
+        return None
+    # 只在本进程内比较，可以使用 Python 内置的字符串哈希（已缓存在字符串对象上）
+    hashes = np.fromiter(map(hash, tokens), dtype=np.int64, count=len(tokens)).view(np.uint64)
+    return hashes[:-2] * np.uint64(0x9E3779B97F4A7C15) ^ hashes[1:-1] * np.uint64(0xC2B2AE3D27D4EB4F) ^ hashes[2:]
+
+
+def _signatures(batch, parameters, np):
+    """一批论文的 MinHash 签名，shape 为 (论文数, NUM_PERM)，uint32"""
+    multipliers, _ = parameters
+    starts = np.cumsum([0] + [len(shingles) for shingles in batch[:-1]])
+    values = np.concatenate(batch)
+    # 乘以奇数（模 2^64）是 uint64 上的一个排列：按论文取最小值后保留高 32 位
+    hashed = multipliers[:, None] * values[None, :]
+    return (np.minimum.reduceat(hashed, starts, axis=1).T >> np.uint64(32)).astype(np.uint32)
+
+
+def build_index(abstracts, threshold=None):
+    """
+    建立近似重复索引
+
+    参数:
+        abstracts: 可迭代的 (paper_index, 摘要)，按 paper_index 升序（可以是生成器，摘要不会被保留）
+        threshold: 合并为同一簇的最低估计相似度，默认为 config.near_duplicate_threshold
+
+    返回:
+        NearDuplicateIndex
+    """
+    import numpy as np
+
+    start_time = time.perf_counter()
+    threshold = float(config.near_duplicate_threshold if threshold is None else threshold)
+    parameters = _hash_parameters(np)
+    band_multipliers = parameters[1]
+
+    paper_indices = []
+    band_keys = []  # 每批 (论文数, BANDS) 的 uint32 分桶键
+    short_signatures = []  # 每批 (论文数, NUM_PERM) 的签名低 16 位，用于校验候选对
+    batch = []
+    batch_size = 0
+
+    def flush():
+        signatures = _signatures(batch, parameters, np)
+        rows = signatures.reshape(len(batch), BANDS, ROWS).astype(np.uint64)
+        band_keys.append(((rows * band_multipliers).sum(axis=2) >> np.uint64(32)).astype(np.uint32))
+        short_signatures.append((signatures & 0xFFFF).astype(np.uint16))
+
+    for paper_index, abstract in abstracts:
+        shingles = _shingles(abstract, np)
+        if shingles is None:
+            continue
+        paper_indices.append(paper_index)
+        batch.append(shingles)
+        batch_size += len(shingles)
+        if batch_size >= BATCH_SHINGLES:
+            flush()
+            batch, batch_size = [], 0
+    if batch:
+        flush()
+    if not paper_indices:
+        return NearDuplicateIndex({}, {}, 0, time.perf_counter() - start_time)
+
+    keys = np.concatenate(band_keys)
+    signatures = np.concatenate(short_signatures)
+    # 清空分批结果释放内存（列表仍被 flush 引用，不能 del）
+    band_keys.clear()
+    short_signatures.clear()
+
+    # 每段中分桶键相同的论文按顺序两两相邻成为候选对（稳定排序保证前一篇的序号更小）
+    candidates = []
+    for band in range(BANDS):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        same = np.flatnonzero(sorted_keys[1:] == sorted_keys[:-1])
+        candidates.append(np.stack([order[same], order[same + 1]], axis=1))
+    del keys
+    pairs = np.unique(np.concatenate(candidates), axis=0)
+
+    # 按签名估计相似度，分块计算避免大矩阵
+    accepted = []
+    for chunk_start in range(0, len(pairs), BATCH_SHINGLES):
+        chunk = pairs[chunk_start:chunk_start + BATCH_SHINGLES]
+        similarity = (signatures[chunk[:, 0]] == signatures[chunk[:, 1]]).mean(axis=1)
+        accepted.append(chunk[similarity >= threshold])
+    accepted = np.concatenate(accepted) if accepted else np.zeros((0, 2), dtype=np.int64)
+
+    # 并查集合并，簇代表为簇中序号最小的论文
+    parent = {}
+
+    def find(row):
+        root = row
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while parent.get(row, row) != root:
+            parent[row], row = root, parent[row]
+        return root
+
+    for first, second in accepted.tolist():
+        first_root, second_root = find(first), find(second)
+        if first_root != second_root:
+            parent[max(first_root, second_root)] = min(first_root, second_root)
+
+    clusters = {}
+    member_signatures = {}
+    for row in parent:
+        for member in (row, find(row)):
+            clusters[paper_indices[member]] = paper_indices[find(member)]
+            member_signatures[paper_indices[member]] = signatures[member].copy()
+    return NearDuplicateIndex(clusters, member_signatures, len(paper_indices), time.perf_counter() - start_time)
+
+
+def index_corpus():
+    """读取语料后调用：为 data.paper_data 建立索引并保存到 data.near_duplicate_index"""
+    data.near_duplicate_index = None
+    lang = language.get_text(config.LANGUAGE)
+    if not accounting.numpy_available():
+        utils.print_and_log(lang['near_duplicate_numpy_missing'])
+        return None
+    index = build_index((paper_index, data.paper_data[paper_index]['abstract'])
+                        for paper_index in sorted(data.paper_data))
+    data.near_duplicate_index = index
+    utils.print_and_log(lang['near_duplicate_index'].format(
+        papers=index.papers, clusters=index.cluster_count, members=len(index.clusters), seconds=index.seconds))
+    return index
+
+
+class JobPropagator:
+    """
+    单个任务的判断结果沿用
+
+    创建时把每个簇中（按任务顺序）第一篇以外的论文移到最后，使它们领取时通常已有判断结果。
+
+    参数:
+        job: 所属任务（会调整 job.paper_indices 的顺序）
+        index: NearDuplicateIndex
+    """
+
+    def __init__(self, job, index):
+        self.job = job
+        self.index = index
+        self.audit_rate = float(config.near_duplicate_audit_rate)
+        self.verdicts = {}  # 簇代表 -> (判断结果, 理由, 给出判断的论文)
+        self.propagated = 0
+        self.audited = 0
+        self.disagreed = 0
+        self._lock = threading.Lock()
+
+        seen = set()
+        first = []
+        rest = []
+        for paper_index in job.paper_indices:
+            root = index.clusters.get(paper_index)
+            if root is None or root not in seen:
+                first.append(paper_index)
+                seen.add(root)
+            else:
+                rest.append(paper_index)
+        job.paper_indices = first + rest
+
+    def decide(self, paper_index):
+        """
+        领取论文时调用
+
+        返回:
+            (action, source)：action 为 None（照常判断）、ACTION_PROPAGATE（沿用）或 ACTION_AUDIT（抽查），
+            source 为 (判断结果, 理由, 给出判断的论文)
+        """
+        root = self.index.clusters.get(paper_index)
+        source = self.verdicts.get(root) if root is not None else None
+        if source is None:
+            return None, None
+        # 按论文索引的哈希确定是否抽查（与线程和处理顺序无关）
+        if zlib.crc32(f"{root}:{paper_index}".encode('ascii')) % 10000 < self.audit_rate * 10000:
+            with self._lock:
+                self.audited += 1
+            return ACTION_AUDIT, source
+        with self._lock:
+            self.propagated += 1
+        return ACTION_PROPAGATE, source
+
+    def propagated_reason(self, paper_index, source):
+        verdict, reason, source_index = source
+        return PROPAGATED_REASON.format(reason=reason, source=source_index,
+                                        similarity=self.index.similarity(paper_index, source_index))
+
+    def observe(self, paper_index, verdict, reason, audit_source=None):
+        """记录模型对一篇论文的判断结果；audit_source 为抽查时 decide 返回的 source"""
+        root = self.index.clusters.get(paper_index)
+        if root is None:
+            return
+        with self._lock:
+            if audit_source is not None and audit_source[0] != verdict:
+                self.disagreed += 1
+            self.verdicts.setdefault(root, (verdict, reason, paper_index))
+
+    def format_summary(self, lang):
+        return lang['near_duplicate_summary'].format(
+            name=self.job.name or '-', propagated=self.propagated, audited=self.audited, disagreed=self.disagreed)
+
+
+def attach(jobs):
+    """
+    为每个任务创建 JobPropagator（运行开始前、创建调度器之前调用），语料尚未建立索引时先建立
+
+    返回:
+        是否已启用
+    """
+    index = data.near_duplicate_index
+    if index is None:
+        index = index_corpus()
+        if index is None:
+            return False
+    for job in jobs:
+        job.duplicates = JobPropagator(job, index)
+    return True
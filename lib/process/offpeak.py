@@ -0,0 +1,169 @@
+"""
+错峰运行：在 DeepSeek 优惠时段（北京时间 00:30-08:30）内提高并发，时段外降低并发或暂停
+
+工作线程每领取一篇论文前经过 OffPeakGate：线程在所属密钥中的序号不小于当前时段允许的线程数时，
+等待到下一次时段切换。正在进行的请求不会被打断，所以时段切换时所有输出都已完整写入，
+暂停期间可以随时停止。
+"""
+import threading
+from datetime import timedelta
+from . import data
+from ..log import utils
+from ..price import price
+from ..config import config_loader as config
+from language import language
+
+# 等待时段切换时每次等待的最长时间（秒），便于及时响应停止
+WAIT_SLICE_SECONDS = 1.0
+
+
+def enabled():
+    return bool(config.offpeak_enabled)
+
+
+def threads_per_key(discount):
+    """优惠时段内 / 外每个密钥的线程数（时段外为 0 表示暂停）"""
+    if discount:
+        return max(1, int(config.offpeak_threads_per_key))
+    return max(0, int(config.offpeak_outside_threads_per_key))
+
+
+class OffPeakGate:
+    """
+    按时段限制每个密钥同时工作的线程数
+
+    参数:
+        thread_count: 工作线程总数，用于判断所有线程是否都已暂停
+    """
+
+    def __init__(self, thread_count):
+        self.thread_count = thread_count
+        self._condition = threading.Condition()
+        self._waiting = 0
+        self._finished = 0
+        self._drained = False  # 有线程已领不到论文：调度器已空，等待中的线程不必再等
+        self._resume_time = None  # 等待中的线程恢复工作的时间（下一次时段切换）
+        self._announced = None  # 已输出信息的时段切换时间，避免每个线程重复输出
+
+    def wait_turn(self, rank):
+        """
+        等到当前时段允许序号为 rank 的线程工作
+
+        参数:
+            rank: 线程在所属API密钥中的序号（从0开始）
+
+        返回:
+            可以继续时返回 True；运行被停止或已没有剩余论文时返回 False
+        """
+        with self._condition:
+            while not (self._drained or data.progress_stop_event.is_set()):
+                now = price.pricing_time()
+                allowed = threads_per_key(price.is_discount_period(now))
+                if rank < allowed:
+                    return True
+                self._resume_time = price.next_period_change(now)
+                self._waiting += 1
+                self._announce(allowed)
+                self._condition.wait(min(WAIT_SLICE_SECONDS, max(0.01, (self._resume_time - now).total_seconds())))
+                self._waiting -= 1
+            return False
+
+    def finish(self):
+        """工作线程退出时调用（调度器已没有剩余论文或运行被停止），唤醒等待中的线程一并退出"""
+        with self._condition:
+            self._finished += 1
+            self._drained = True
+            self._condition.notify_all()
+
+    def _announce(self, allowed):
+        # 调用方持有 self._condition
+        if self._announced == self._resume_time:
+            return
+        lang = language.get_text(config.LANGUAGE)
+        resume = self._resume_time.strftime("%Y-%m-%d %H:%M")
+        if allowed > 0:
+            self._announced = self._resume_time
+            utils.print_and_log(lang['offpeak_throttled'].format(threads=allowed, time=resume))
+            return
+        # 所有仍在运行的线程都已暂停：此时没有进行中的请求，输出文件和日志都已完整写入
+        if self._waiting < self.thread_count - self._finished:
+            return
+        self._announced = self._resume_time
+        with data.file_write_lock:
+            if data.full_log_file and not data.full_log_file.closed:
+                data.full_log_file.flush()
+        processed, _ = utils.get_progress_snapshot()
+        utils.print_and_log(lang['offpeak_paused'].format(
+            processed=processed, total=data.total_papers_to_process, time=resume))
+
+
+def simulate(requests, per_thread_rate, keys, cost_per_request, start_time=None, offpeak=True):
+    """
+    模拟运行 requests 次请求所需的时间和费用
+
+    参数:
+        requests: 请求数
+        per_thread_rate: 单个线程每秒完成的请求数
+        keys: API密钥数
+        cost_per_request: {True: 优惠时段单次请求费用, False: 标准时段单次请求费用}
+        start_time: 开始时间，默认为当前时间
+        offpeak: True 按错峰设置调整并发，False 全程使用 threads_per_key
+
+    返回:
+        (预计完成时间（北京时间）, 预计费用)
+    """
+    current_time = price.pricing_time(start_time)
+    remaining = float(requests)
+    cost = 0.0
+    while remaining > 0 and per_thread_rate > 0:
+        discount = price.is_discount_period(current_time)
+        end_time = price.next_period_change(current_time)
+        threads = threads_per_key(discount) if offpeak else max(1, int(config.threads_per_key))
+        rate = per_thread_rate * threads * keys
+        window_requests = rate * (end_time - current_time).total_seconds()
+        if remaining <= window_requests:
+            cost += remaining * cost_per_request[discount]
+            current_time += timedelta(seconds=remaining / rate)
+            break
+        cost += window_requests * cost_per_request[discount]
+        remaining -= window_requests
+        current_time = end_time
+    return current_time, cost
+
+
+def estimate(plan, start_time=None):
+    """
+    根据 planner.estimate 的结果，比较错峰运行和立即以 threads_per_key 运行的完成时间和费用
+    """
+    requests = plan['requests']
+    if not requests:
+        return None
+    cost_per_request = {discount: price.calculate_token_price(
+        plan['prompt'], plan['completion'], plan['cache_hit'], plan['cache_miss'], discount=discount) / requests
+        for discount in (True, False)}
+    # 历史吞吐量按 threads_per_key 个线程测得，换算为单个线程的速度
+    per_thread_rate = plan['key_rate'] / max(1, int(config.threads_per_key))
+    offpeak_finish, offpeak_cost = simulate(requests, per_thread_rate, plan['keys'], cost_per_request, start_time)
+    now_finish, now_cost = simulate(requests, per_thread_rate, plan['keys'], cost_per_request, start_time,
+                                    offpeak=False)
+    return {
+        'finish': offpeak_finish,
+        'cost': offpeak_cost,
+        'now_finish': now_finish,
+        'now_cost': now_cost,
+        'saved': (1 - offpeak_cost / now_cost) * 100 if now_cost else 0,
+    }
+
+
+def format_estimate(estimate_result, lang):
+    """生成错峰运行估算的文本行"""
+    if estimate_result is None:
+        return []
+    return [lang['offpeak_estimate'].format(
+        inside=threads_per_key(True), outside=threads_per_key(False),
+        finish=estimate_result['finish'].strftime("%Y-%m-%d %H:%M"),
+        cost=price.format_price(estimate_result['cost']),
+        threads=max(1, int(config.threads_per_key)),
+        now_finish=estimate_result['now_finish'].strftime("%Y-%m-%d %H:%M"),
+        now_cost=price.format_price(estimate_result['now_cost']),
+        saved=estimate_result['saved'])]
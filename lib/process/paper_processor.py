@@ -5,103 +5,568 @@ from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from . import data
 from . import search_paper
+from . import accounting
+from . import cassette
+from . import cascade
+from . import compact
+from . import offpeak
+from . import governor
+from . import keyword_filter
+from . import local_classifier
+from . import near_duplicates
+from . import prompt_budget
+from . import quality_gate
+from . import sampling
+from . import scheduler
+from . import streaming
+from .job import Job
 from ..log import utils
+from ..log import metrics
+from ..log import tracing
 from ..config import config_loader as config
-import json
 from language import language
 
-def process_paper_batch(paper_indices, rq, keywords, requirements, api_key, thread_id, result_file_path, log_file_path, yon_log_file_path, yon_csv_file_path, total_papers):
+def _charge_aborted(e, accounts):
     """
-    处理一批论文的函数，由单个线程执行
+    推理超出上限而中止的请求同样按已输出的token计费，平均记入各记账对象
+
+    没有判断结果，不计论文数（中止次数由 streaming.StreamStats.capped 统计）
+    """
+    shares = zip(accounting.split_tokens(e.prompt_tokens, len(accounts)),
+                 accounting.split_tokens(e.reasoning_tokens, len(accounts)))
+    for account, (prompt_tokens, completion_tokens) in zip(accounts, shares):
+        account.add(e.model, prompt_tokens, completion_tokens, 0, prompt_tokens, prompt_tokens + completion_tokens,
+                    papers=0)
+
+def judge_paper(job, paper_index, api_key, thread_id, key_index, account, stage=None):
     """
-    relevant_count = 0
-    batch_tokens = 0
+    处理单篇论文：调用API判断相关性，并写入所属任务的输出文件
     
-    for idx, paper_index in enumerate(paper_indices):
-        if paper_index in data.paper_data:
-            # 记录单篇论文处理开始时间
-            single_start_time = time.time()
-            
-            paper = data.paper_data[paper_index]
-            title = paper['title']
-            abstract = paper['abstract']
-            entry = paper['entry']
-            
-            try:
-                # 调用searchpaper中的方法检查相关性，传入对应的API密钥和requirements
+    参数:
+        stage: 启用标题初筛时为 scheduler.STAGE_FULL，记录在Y/N日志中
+
+    返回:
+        判断结果（'Y' / 'N'），出错时返回 None
+    """
+    if paper_index not in data.paper_data:
+        return None
+    
+    # 记录单篇论文处理开始时间
+    single_start_time = time.time()
+    
+    paper = data.paper_data[paper_index]
+    
+    # 近似重复：同一簇中已有判断结果时直接沿用（按 audit_rate 抽查的仍照常判断）
+    duplicate_action, duplicate_source = job.duplicates.decide(paper_index) if job.duplicates else (None, None)
+    if duplicate_action == near_duplicates.ACTION_PROPAGATE:
+        verdict = duplicate_source[0]
+        write_local_verdict(job, paper_index, paper, verdict, job.duplicates.propagated_reason(paper_index, duplicate_source),
+                            account, key_index, single_start_time, stage=near_duplicates.STAGE_PROPAGATED,
+                            propagated_from=duplicate_source[2])
+        return verdict
+    
+    # 本地分类器：相关概率极低的论文不发送请求（按 audit_rate 抽查的仍照常判断）
+    classifier_action, probability = (None, None)
+    if job.classifier is not None and duplicate_action is None:
+        classifier_action, probability = job.classifier.decide(paper_index)
+    if classifier_action == local_classifier.ACTION_SKIP:
+        write_local_verdict(job, paper_index, paper, 'N', local_classifier.SKIP_REASON.format(probability=probability),
+                            account, key_index, single_start_time, stage=local_classifier.STAGE_CLASSIFIER,
+                            probability=round(probability, 4))
+        return 'N'
+    
+    # 清理标记并按 max_input_tokens 截断摘要
+    title, abstract = prompt_budget.prepare_paper(paper, job.prompt_overhead)
+    
+    try:
+        # 调用searchpaper中的方法检查相关性，传入对应的API密钥和requirements
+        metrics.request_started()
+        try:
+            if cascade.enabled():
+                # 级联判断：两级请求的token在 cascade.judge 中按模型分别记账
+                relevance, reason, token_info = cascade.judge(job, title, abstract, api_key, account)
+            else:
                 relevance, tokens, reason, prompt_tokens, completion_tokens, cache_hit, cache_miss = search_paper.check_paper_relevance(
-                    rq, keywords, requirements, title, abstract, api_key)
-                
-                # 累加token使用量
-                batch_tokens += tokens
-                with data.token_lock:
-                    data.token_used += tokens
-                    data.prompt_tokens_used += prompt_tokens
-                    data.completion_tokens_used += completion_tokens
-                    data.prompt_cache_hit_tokens_used += cache_hit
-                    data.prompt_cache_miss_tokens_used += cache_miss
+                    job.rq, job.keywords, job.requirements, title, abstract, api_key)
                 
-                # 计算单篇论文处理时间
-                single_elapsed_time = time.time() - single_start_time
-                
-                # 更新进度信息
-                utils.update_progress(single_elapsed_time)
-                
-                # 记录到Y/N日志文件（无论结果是Y还是N）
-                with data.file_write_lock:
-                    with open(yon_log_file_path, 'a', encoding='utf-8') as yon_log_file:
-                        yon_log_file.write('{\n')
-                        yon_log_file.write(f'    "title": "{title}",\n')
-                        yon_log_file.write(f'    "result": "{relevance.strip().upper()}",\n')
-                        yon_log_file.write(f'    "reason": "{reason}"\n')
-                        yon_log_file.write('}\n\n')
-                    # 新增：同步记录到 CSV（无表头，列顺序：title, result, reason, URL）
-                    url_value = extract_url_from_entry(entry)
-                    import csv
-                    # 组装来源信息：来源文件夹 + 原始 .bib 文件名，形式为 "folder/file"
-                    source_folder = paper.get('source_folder', '')
-                    source_file = paper.get('source_file', '')
-                    source = f"{source_folder}/{source_file}" if (source_folder or source_file) else ""
-                    with open(yon_csv_file_path, 'a', encoding='utf-8-sig', newline='') as yon_csv_file:
-                        writer = csv.writer(yon_csv_file)
-                        # 调整列顺序：title, source, result, reason, URL
-                        writer.writerow([title, source, relevance.strip().upper(), reason, url_value])
-                
-                # 如果相关，则添加到结果文件中
-                if relevance.strip().upper() == 'Y':
-                    relevant_count += 1
-                    
-                    # 使用线程锁保护文件写入
-                    with data.file_write_lock:
-                        # 将entry写入结果文件（追加模式）
-                        with open(result_file_path, 'a', encoding='utf-8') as result_file:
-                            result_file.write(entry + "\n\n")
-                        
-                        # 同时写入日志文件（JSON格式）
-                        with open(log_file_path, 'a', encoding='utf-8') as log_file:
-                            log_file.write('{\n')
-                            log_file.write(f'    "title": "{title}",\n')
-                            log_file.write(f'    "reason": "{reason}"\n')
-                            log_file.write('}\n')
-                    
-            except Exception as e:
-                # 静默处理错误，只在完整日志中记录
-                with data.file_write_lock:
-                    if config.save_full_log and data.full_log_file:
-                        data.full_log_file.write(f"[Thread-{thread_id}] 处理论文 {paper_index} 时出错: {str(e)}\n")
-                        data.full_log_file.flush()
-    
-    return relevant_count, batch_tokens
+                # 记录token使用量（只写本线程的记账对象，不需要加锁）
+                account.add(config.model_name, prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens)
+                token_info = {
+                    'prompt': prompt_tokens,
+                    'completion': completion_tokens,
+                    'cache_hit': cache_hit,
+                    'cache_miss': cache_miss,
+                    'total': tokens
+                }
+            if compact.enabled():
+                # 精简响应：记录省略的理由，相关论文省略理由时补充请求
+                reason = compact.complete(job, relevance, reason, title, abstract, api_key, account, token_info)
+        except Exception as e:
+            if isinstance(e, streaming.ReasoningLimitExceeded):
+                _charge_aborted(e, [account])
+            metrics.request_failed(e)
+            raise
+        metrics.request_finished(time.time() - single_start_time)
+        
+        # 计算单篇论文处理时间
+        single_elapsed_time = time.time() - single_start_time
+        
+        # 更新进度信息
+        utils.update_progress(single_elapsed_time)
+        
+        verdict = relevance.strip().upper()
+        extra = {'stage': stage} if stage else {}
+        if classifier_action == local_classifier.ACTION_AUDIT:
+            extra['probability'] = round(probability, 4)
+            extra['audit'] = True
+        if duplicate_action == near_duplicates.ACTION_AUDIT:
+            extra['propagated_from'] = duplicate_source[2]
+            extra['audit'] = True
+        write_verdict(job, paper_index, paper, verdict, reason, token_info, single_elapsed_time, key_index, single_start_time,
+                      **extra)
+        if job.classifier is not None and verdict in ('Y', 'N'):
+            job.classifier.observe(paper_index, verdict, classifier_action == local_classifier.ACTION_AUDIT)
+        if job.duplicates is not None and verdict in ('Y', 'N'):
+            job.duplicates.observe(paper_index, verdict, reason,
+                                   duplicate_source if duplicate_action == near_duplicates.ACTION_AUDIT else None)
+        return verdict
+            
+    except Exception as e:
+        # 静默处理错误，只在完整日志中记录
+        with data.file_write_lock:
+            if config.save_full_log and data.full_log_file:
+                job_tag = f"[{job.name}] " if job.name else ""
+                data.full_log_file.write(f"[Thread-{thread_id}] {job_tag}处理论文 {paper_index} 时出错: {str(e)}\n")
+                data.full_log_file.flush()
+        return None
+
+def write_local_verdict(job, paper_index, paper, verdict, reason, account, key_index, start_time, **extra):
+    """写入不发送请求得到的判断结果（本地分类器跳过、沿用近似重复论文的判断）：按零token计一篇已判断的论文"""
+    account.add(config.model_name, 0, 0, 0, 0, 0)
+    elapsed = time.time() - start_time
+    utils.update_progress(elapsed)
+    token_info = {'prompt': 0, 'completion': 0, 'cache_hit': 0, 'cache_miss': 0, 'total': 0}
+    write_verdict(job, paper_index, paper, verdict, reason, token_info, elapsed, key_index, start_time, **extra)
+
+def write_verdict(job, paper_index, paper, verdict, reason, token_info, elapsed, key_index, start_time, **extra):
+    """把一篇论文的判断结果写入所属任务的Y/N日志、CSV，相关时写入结果文件（extra 为Y/N日志的附加字段）"""
+    title = paper['title']
+    entry = paper['entry']
+    if job.keyword_scan is not None:
+        extra.setdefault('keywords', job.keyword_scan.keywords_of(paper_index))
+    
+    # 记录到Y/N日志文件（无论结果是Y还是N）
+    file_write_start = time.perf_counter()
+    source_folder = paper.get('source_folder', '')
+    source_file = paper.get('source_file', '')
+    source = f"{source_folder}/{source_file}" if (source_folder or source_file) else ""
+    job.yon_log.write_verdict(paper_index, title, source, verdict, reason, token_info,
+                              elapsed, key_index, start_time, **extra)
+    with data.file_write_lock:
+        # 新增：同步记录到 CSV（无表头，列顺序：title, source, result, reason, URL）
+        url_value = extract_url_from_entry(entry)
+        import csv
+        with open(job.yon_csv_file_path, 'a', encoding='utf-8-sig', newline='') as yon_csv_file:
+            writer = csv.writer(yon_csv_file)
+            # 调整列顺序：title, source, result, reason, URL
+            writer.writerow([title, source, verdict, reason, url_value])
+    
+    # 如果相关，则添加到结果文件中
+    if verdict == 'Y':
+        # 使用线程锁保护文件写入
+        with data.file_write_lock:
+            # 将entry写入结果文件（追加模式）
+            with open(job.result_file_path, 'a', encoding='utf-8') as result_file:
+                result_file.write(entry + "\n\n")
+        
+        # 同时写入相关论文日志（JSON Lines格式）
+        job.result_log.write_verdict(paper_index, title, source, verdict, reason, token_info,
+                                     elapsed, key_index, start_time, **extra)
+    tracing.record('file_write', time.perf_counter() - file_write_start)
+
+def write_cached_verdicts(job, cached):
+    """
+    把抽样运行中已判断的论文直接写入所属任务的输出文件（不发送请求，不计入进度）
+    
+    参数:
+        cached: sampling.load_cached 的结果 {paper_index: (判断结果, 理由, 日志文件名)}
+    
+    返回:
+        其中相关论文数
+    """
+    start_time = time.time()
+    token_info = {'prompt': 0, 'completion': 0, 'cache_hit': 0, 'cache_miss': 0, 'total': 0}
+    for paper_index, (verdict, reason, path) in sorted(cached.items()):
+        write_verdict(job, paper_index, data.paper_data[paper_index], verdict, reason, token_info, 0.0, None, start_time,
+                      stage=sampling.STAGE_SAMPLED, sampled_from=path)
+    return sum(1 for verdict, _, _ in cached.values() if verdict == 'Y')
+
+def write_keyword_filtered(job, paper_indices):
+    """把未命中任何关键词的论文直接记为 N，批量写入所属任务的Y/N日志和CSV（不发送请求，不计入进度）"""
+    import csv
+    start_time = time.time()
+    token_info = {'prompt': 0, 'completion': 0, 'cache_hit': 0, 'cache_miss': 0, 'total': 0}
+    rows = []
+    for paper_index in paper_indices:
+        paper = data.paper_data[paper_index]
+        source_folder = paper.get('source_folder', '')
+        source_file = paper.get('source_file', '')
+        source = f"{source_folder}/{source_file}" if (source_folder or source_file) else ""
+        job.yon_log.write_verdict(paper_index, paper['title'], source, 'N', keyword_filter.FILTERED_REASON, token_info,
+                                  0.0, None, start_time, stage=keyword_filter.STAGE_KEYWORD, keywords=[])
+        rows.append([paper['title'], source, 'N', keyword_filter.FILTERED_REASON, extract_url_from_entry(paper['entry'])])
+    with data.file_write_lock:
+        with open(job.yon_csv_file_path, 'a', encoding='utf-8-sig', newline='') as yon_csv_file:
+            csv.writer(yon_csv_file).writerows(rows)
+
+def write_unjudged(job, paper_indices, result, reason):
+    """把未判断的论文写入所属任务的CSV（结果列为 result），不写入Y/N日志"""
+    import csv
+    with data.file_write_lock:
+        with open(job.yon_csv_file_path, 'a', encoding='utf-8-sig', newline='') as yon_csv_file:
+            writer = csv.writer(yon_csv_file)
+            for paper_index in paper_indices:
+                paper = data.paper_data.get(paper_index)
+                if paper is None:
+                    continue
+                source_folder = paper.get('source_folder', '')
+                source_file = paper.get('source_file', '')
+                source = f"{source_folder}/{source_file}" if (source_folder or source_file) else ""
+                writer.writerow([paper['title'], source, result, reason, extract_url_from_entry(paper['entry'])])
+
+def screen_title_batch(job, paper_indices, api_key, thread_id, key_index, account):
+    """
+    标题初筛：一次请求判断一批论文的标题，明显无关的论文直接记为 N 写入输出文件
+    
+    本次请求的token平均分摊到这批论文：明显无关的论文计为已判断，
+    可能相关的论文只记token（论文数在完整判断时再计）。
+    
+    返回:
+        需要完整判断的论文索引列表；请求出错时返回整批论文，交给完整判断
+    """
+    paper_indices = [i for i in paper_indices if i in data.paper_data]
+    if not paper_indices:
+        return []
+    
+    result = request_title_labels(job, paper_indices, api_key, thread_id, account, "标题初筛")
+    if result is None:
+        return paper_indices
+    labels, shares, batch_start_time, batch_elapsed_time = result
+    maybe_papers = []
+    for paper_index, label, share in zip(paper_indices, labels, shares):
+        share_prompt, share_completion, share_hit, share_miss, share_total = share
+        if label != search_paper.TITLE_IRRELEVANT:
+            account.add(config.model_name, share_prompt, share_completion, share_hit, share_miss, share_total, papers=0)
+            maybe_papers.append(paper_index)
+            continue
+        account.add(config.model_name, share_prompt, share_completion, share_hit, share_miss, share_total)
+        token_info = {
+            'prompt': share_prompt,
+            'completion': share_completion,
+            'cache_hit': share_hit,
+            'cache_miss': share_miss,
+            'total': share_total,
+            'batch': len(paper_indices)
+        }
+        write_verdict(job, paper_index, data.paper_data[paper_index], 'N', "不相关原因：标题初筛判断为明显无关",
+                      token_info, batch_elapsed_time, key_index, batch_start_time, stage=scheduler.STAGE_TITLE)
+    
+    rejected = len(paper_indices) - len(maybe_papers)
+    if rejected:
+        utils.update_progress(batch_elapsed_time * rejected / len(paper_indices), rejected)
+    return maybe_papers
+
+def judge_title_only(job, paper_indices, api_key, thread_id, key_index, account):
+    """
+    只根据标题判断一批条目（条目质量检查发现缺少摘要、不是论文或过短的条目）
+    
+    明显无关的记为 N；其余记为待确认（quality_gate.TITLE_ONLY_RESULT），不写入结果文件，
+    在原因中注明需要人工确认。本次请求的token平均分摊到这批论文。
+    
+    返回:
+        (待确认的论文数, 需要完整判断的论文索引列表)；请求出错时整批论文交给完整判断
+    """
+    paper_indices = [i for i in paper_indices if i in data.paper_data]
+    if not paper_indices:
+        return 0, []
+    
+    result = request_title_labels(job, paper_indices, api_key, thread_id, account, "只根据标题判断")
+    if result is None:
+        return 0, paper_indices
+    labels, shares, batch_start_time, batch_elapsed_time = result
+    uncertain = 0
+    for paper_index, label, share in zip(paper_indices, labels, shares):
+        share_prompt, share_completion, share_hit, share_miss, share_total = share
+        account.add(config.model_name, share_prompt, share_completion, share_hit, share_miss, share_total)
+        token_info = {
+            'prompt': share_prompt,
+            'completion': share_completion,
+            'cache_hit': share_hit,
+            'cache_miss': share_miss,
+            'total': share_total,
+            'batch': len(paper_indices)
+        }
+        if label == search_paper.TITLE_IRRELEVANT:
+            verdict, reason = 'N', "不相关原因：只根据标题判断为明显无关"
+        else:
+            verdict, reason = quality_gate.TITLE_ONLY_RESULT, quality_gate.title_only_reason(paper_index)
+            uncertain += 1
+        write_verdict(job, paper_index, data.paper_data[paper_index], verdict, reason, token_info,
+                      batch_elapsed_time, key_index, batch_start_time, stage=quality_gate.STAGE_TITLE_ONLY)
+    utils.update_progress(batch_elapsed_time, len(paper_indices))
+    return uncertain, []
+
+def request_title_labels(job, paper_indices, api_key, thread_id, account, action):
+    """
+    发送一次标题批量判断请求
+    
+    参数:
+        action: 出错时写入完整日志的操作说明
+    
+    返回:
+        (labels, 每篇论文分摊的 (prompt, completion, cache_hit, cache_miss, total), 开始时间, 耗时)；
+        请求出错时返回 None
+    """
+    batch_start_time = time.time()
+    titles = [prompt_budget.prepare_title(data.paper_data[i]) for i in paper_indices]
+    try:
+        metrics.request_started()
+        try:
+            labels, tokens, prompt_tokens, completion_tokens, cache_hit, cache_miss = search_paper.screen_titles(
+                job.rq, job.keywords, job.requirements, titles, api_key)
+        except Exception as e:
+            if isinstance(e, streaming.ReasoningLimitExceeded):
+                _charge_aborted(e, [account])
+            metrics.request_failed(e)
+            raise
+        metrics.request_finished(time.time() - batch_start_time)
+    except Exception as e:
+        with data.file_write_lock:
+            if config.save_full_log and data.full_log_file:
+                job_tag = f"[{job.name}] " if job.name else ""
+                data.full_log_file.write(f"[Thread-{thread_id}] {job_tag}{action} {len(paper_indices)} 篇论文时出错: {str(e)}\n")
+                data.full_log_file.flush()
+        return None
+    
+    shares = list(zip(*(accounting.split_tokens(value, len(paper_indices)) for value in
+                        (prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens))))
+    return labels, shares, batch_start_time, time.time() - batch_start_time
+
+def judge_paper_multi(jobs, paper_index, api_key, thread_id, key_index, accounts, overhead_tokens=0):
+    """
+    多问题模式：一次请求同时判断一篇论文与多个任务的相关性，并分别写入各任务的输出文件
+    
+    本次请求的token按问题平均分摊到各任务的记账对象。
+    
+    参数:
+        accounts: {job: TokenAccount}，需包含 jobs 中的每个任务
+        overhead_tokens: 提示词中除标题和摘要以外部分的token数
+    
+    返回:
+        与 jobs 对应的判断结果列表，出错时返回 None
+    """
+    if paper_index not in data.paper_data:
+        return None
+    
+    single_start_time = time.time()
+    paper = data.paper_data[paper_index]
+    questions = [(job.rq, job.keywords, job.requirements) for job in jobs]
+    title, abstract = prompt_budget.prepare_paper(paper, overhead_tokens)
+    
+    try:
+        metrics.request_started()
+        try:
+            verdicts, tokens, prompt_tokens, completion_tokens, cache_hit, cache_miss, separate_prompt = \
+                search_paper.check_paper_relevance_multi(questions, title, abstract, api_key)
+        except Exception as e:
+            if isinstance(e, streaming.ReasoningLimitExceeded):
+                _charge_aborted(e, [accounts[job] for job in jobs])
+            metrics.request_failed(e)
+            raise
+        metrics.request_finished(time.time() - single_start_time)
+        
+        single_elapsed_time = time.time() - single_start_time
+        utils.update_progress(single_elapsed_time, len(jobs))
+        
+        # 按问题分摊token：每个（论文, 问题）各记一条
+        shares = list(zip(*(accounting.split_tokens(value, len(jobs)) for value in
+                            (prompt_tokens, completion_tokens, cache_hit, cache_miss, tokens))))
+        results = []
+        for job, (relevance, reason), share, separate in zip(jobs, verdicts, shares, separate_prompt):
+            share_prompt, share_completion, share_hit, share_miss, share_total = share
+            accounts[job].add(config.model_name, share_prompt, share_completion, share_hit, share_miss, share_total,
+                              separate)
+            verdict = relevance.strip().upper()
+            if compact.enabled():
+                compact.record(reason, share_completion)
+            token_info = {
+                'prompt': share_prompt,
+                'completion': share_completion,
+                'cache_hit': share_hit,
+                'cache_miss': share_miss,
+                'total': share_total,
+                'separate_prompt': separate,
+                'questions': len(jobs)
+            }
+            write_verdict(job, paper_index, paper, verdict, reason, token_info, single_elapsed_time, key_index, single_start_time)
+            results.append(verdict)
+        return results
+    
+    except Exception as e:
+        # 静默处理错误，只在完整日志中记录
+        with data.file_write_lock:
+            if config.save_full_log and data.full_log_file:
+                data.full_log_file.write(f"[Thread-{thread_id}] 处理论文 {paper_index} 时出错: {str(e)}\n")
+                data.full_log_file.flush()
+        return None
+
+def process_worker(job_scheduler, api_key, thread_id, key_index, gate=None, rank=0, budget=None):
+    """
+    工作线程：不断从调度器领取论文并处理，直到没有剩余论文
+    
+    每个线程为处理过的每个任务各创建一个token记账对象，记账时不需要加锁。
+    
+    参数:
+        gate: 错峰运行时的 offpeak.OffPeakGate，每领取一篇论文前等待当前时段允许本线程工作
+        rank: 线程在所属API密钥中的序号
+        budget: 设置了预算上限时的 governor.BudgetGovernor，接近上限时停止调度器
+    
+    返回:
+        {job: 相关论文数}
+    """
+    accounts = {}
+    relevant_counts = {}
+    while True:
+        if gate is not None and not gate.wait_turn(rank):
+            break
+        if budget is not None and not budget.check():
+            break
+        task = job_scheduler.next_task()
+        if task is None:
+            break
+        stage, job, payload = task
+        account = accounts.get(job)
+        if account is None:
+            account = accounts[job] = accounting.new_account(key_index, job)
+        started = budget.begin(stage, [account]) if budget is not None else None
+        try:
+            if stage == scheduler.STAGE_TITLE:
+                try:
+                    maybe_papers = screen_title_batch(job, payload, api_key, thread_id, key_index, account)
+                except BaseException:
+                    # 出错时整批交给完整判断，否则其他线程会一直等待该批次完成
+                    job_scheduler.finish_title_batch(job, payload, 0)
+                    raise
+                job_scheduler.finish_title_batch(job, maybe_papers, len(payload) - len(maybe_papers))
+                continue
+            if stage == scheduler.STAGE_TITLE_ONLY:
+                try:
+                    uncertain, failed_papers = judge_title_only(job, payload, api_key, thread_id, key_index, account)
+                except BaseException:
+                    job_scheduler.finish_title_batch(job, payload, 0)
+                    raise
+                job_scheduler.finish_title_batch(job, failed_papers, 0, uncertain)
+                continue
+            # 启用标题初筛时在日志中记录由哪个阶段给出判断
+            logged_stage = stage if job_scheduler.title_batch_size else None
+            if judge_paper(job, payload, api_key, thread_id, key_index, account, logged_stage) == 'Y':
+                relevant_counts[job] = relevant_counts.get(job, 0) + 1
+        finally:
+            if started is not None:
+                budget.finish(started)
+    if gate is not None:
+        gate.finish()
+    return relevant_counts
+
+def process_multi_worker(paper_queue, api_key, thread_id, key_index, gate=None, rank=0, budget=None):
+    """
+    多问题模式的工作线程：不断领取论文，一次请求判断所有包含该论文的任务
+    
+    返回:
+        {job: 相关论文数}
+    """
+    accounts = {}
+    relevant_counts = {}
+    overheads = {}  # 各任务组合的提示词固定部分token数
+    while True:
+        if gate is not None and not gate.wait_turn(rank):
+            break
+        if budget is not None and not budget.check():
+            break
+        task = paper_queue.next_task()
+        if task is None:
+            break
+        jobs, paper_index = task
+        for job in jobs:
+            if job not in accounts:
+                accounts[job] = accounting.new_account(key_index, job)
+        group = tuple(jobs)
+        if group not in overheads:
+            overheads[group] = search_paper.prompt_overhead_tokens_multi(
+                [(job.rq, job.keywords, job.requirements) for job in jobs])
+        started = budget.begin(scheduler.STAGE_FULL, [accounts[job] for job in jobs]) if budget is not None else None
+        try:
+            verdicts = judge_paper_multi(jobs, paper_index, api_key, thread_id, key_index, accounts, overheads[group])
+        finally:
+            if started is not None:
+                budget.finish(started)
+        if verdicts is None:
+            continue
+        for job, verdict in zip(jobs, verdicts):
+            if verdict == 'Y':
+                relevant_counts[job] = relevant_counts.get(job, 0) + 1
+    if gate is not None:
+        gate.finish()
+    return relevant_counts
 
 def process_papers(rq, keywords, requirements, n, selected_folders=None, year_range_info=None):
     """
     处理paper_data中的文章，将相关的文章保存到结果文件中
+    
+    返回:
+        本次运行的 Job 对象
     """
-    # 重置进度跟踪变量
+    # 处理前N篇文章（或者所有文章）
+    paper_count = len(data.paper_data)
+    if n == -1:
+        max_papers = paper_count
+    else:
+        max_papers = min(n, paper_count)
+    
+    job = Job(rq, keywords, requirements, range(1, max_papers + 1))
+    run_jobs([job], selected_folders, year_range_info)
+    return job
+
+def run_jobs(jobs, selected_folders=None, year_range_info=None, policy=scheduler.POLICY_FAIR, multi_question=False):
+    """
+    在同一个API密钥池上同时运行多个查询任务
+    
+    语料（data.paper_data）只读取一次，所有任务共享；每个任务写入自己的输出文件。
+    
+    参数:
+        jobs: Job 列表
+        selected_folders: 选择的文件夹（仅用于写入文件头）
+        year_range_info: 年份范围说明（仅用于写入文件头）
+        policy: 调度策略，'fair'（按权重公平分配）或 'priority'（按优先级）
+        multi_question: 为 True 时每篇论文只发送一次请求，同时判断所有任务的问题（忽略 policy）
+    """
+    # 重置进度跟踪变量和token记账
     utils.reset_progress_tracking()
+    accounting.reset_accounts()
+    cascade.reset_stats()
+    compact.reset_stats()
+    streaming.reset_stats()
+    prompt_budget.reset_stats()
+    metrics.reset_metrics()
+    tracing.reset_tracing()
+    # 按本次运行的配置重新编译提示词模板
+    search_paper.reset_templates()
+    data.progress_stop_event.clear()
+    data.jobs = list(jobs)
     
     # 获取语言文本
     lang = language.get_text(config.LANGUAGE)
+    from ..price import price
     
     # 确保Result文件夹存在
     result_folder = config.RESULT_FOLDER
@@ -117,196 +582,333 @@ def process_papers(rq, keywords, requirements, n, selected_folders=None, year_ra
     # 生成带时间戳的结果文件名
     timestamp = datetime.now().strftime("%Y%m%d_%H%M")
     query_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    data.result_file_name = f"Result_{timestamp}"
-    result_file_path = os.path.join(result_folder, f"{data.result_file_name}.bib")
     
-    # 创建日志文件路径（移到Log文件夹）
-    log_file_path = os.path.join(log_folder, f"Log_{data.result_file_name}.txt")
+    # 出错或中断（KeyboardInterrupt）时同样停止后台线程、关闭磁带和输出文件
+    profile_session = None
+    progress_thread = None
+    metrics_exporter = None
+    try:
+        try:
+            # 按配置打开API响应磁带（录制/回放），关闭时不做任何事
+            active_cassette = cassette.open_cassette()
+            if active_cassette is not None and active_cassette.mode == cassette.MODE_REPLAY:
+                utils.print_and_log(lang['cassette_loaded'].format(path=active_cassette.path, count=len(active_cassette)))
     
-    # 创建Y/N判断结果日志文件路径
-    yon_log_file_path = os.path.join(log_folder, f"Log_YoN_{timestamp}.txt")
-    # 新增：创建对应的 CSV 文件（无表头）
-    yon_csv_file_path = os.path.join(log_folder, f"Overall_{timestamp}.csv")
-    with open(yon_csv_file_path, 'w', encoding='utf-8') as _f:
-        pass
+            # 按配置启用cProfile/tracemalloc分析，结果写入Log文件夹
+            profile_session = tracing.ProfileSession(log_folder, timestamp, config.profile_cpu, config.profile_memory).start()
     
-    # 准备查询信息
-    folder_info = ", ".join(selected_folders) if selected_folders else "All folders"
-    year_info = year_range_info if year_range_info else "All years"
-    
-    # 如果启用完整日志，创建完整日志文件
-    if config.save_full_log:
-        full_log_file_path = os.path.join(log_folder, f"Log_ALL_{timestamp}.txt")
-        data.full_log_file = open(full_log_file_path, 'w', encoding='utf-8')
-        # 在完整日志文件开头写入详细的查询信息
-        data.full_log_file.write(f"// Query Time: {query_time}\n")
-        data.full_log_file.write(f"// Selected Folders: {folder_info}\n")
-        data.full_log_file.write(f"// Year Range: {year_info}\n")
-        data.full_log_file.write(f"// Research Question: {rq}\n")
-        data.full_log_file.write(f"// Keywords: {keywords}\n")
-        if requirements:
-            data.full_log_file.write(f"// Requirements: {requirements}\n")
-        data.full_log_file.write("\n")
-        utils.print_and_log(f"{lang['full_log_created'].format(path=full_log_file_path)}")
-    
-    # 在结果文件开头写入详细的查询信息
-    with open(result_file_path, 'w', encoding='utf-8') as result_file:
-        result_file.write(f"% Query Time: {query_time}\n")
-        result_file.write(f"% Selected Folders: {folder_info}\n")
-        result_file.write(f"% Year Range: {year_info}\n")
-        result_file.write(f"% Research Question: {rq}\n")
-        result_file.write(f"% Keywords: {keywords}\n")
-        if requirements:
-            result_file.write(f"% Requirements: {requirements}\n")
-        result_file.write(f"\n% Search Topic {{{rq}}}\n\n")
-    
-    # 在日志文件开头写入详细的查询信息
-    with open(log_file_path, 'w', encoding='utf-8') as log_file:
-        log_file.write(f"// Query Time: {query_time}\n")
-        log_file.write(f"// Selected Folders: {folder_info}\n")
-        log_file.write(f"// Year Range: {year_info}\n")
-        log_file.write(f"// Research Question: {rq}\n")
-        log_file.write(f"// Keywords: {keywords}\n")
-        if requirements:
-            log_file.write(f"// Requirements: {requirements}\n")
-        log_file.write("\n")
-    
-    # 在Y/N日志文件开头写入详细的查询信息
-    with open(yon_log_file_path, 'w', encoding='utf-8') as yon_log_file:
-        yon_log_file.write(f"// Query Time: {query_time}\n")
-        yon_log_file.write(f"// Selected Folders: {folder_info}\n")
-        yon_log_file.write(f"// Year Range: {year_info}\n")
-        yon_log_file.write(f"// Research Question: {rq}\n")
-        yon_log_file.write(f"// Keywords: {keywords}\n")
-        if requirements:
-            yon_log_file.write(f"// Requirements: {requirements}\n")
-    
-    # 获取研究方向
-    research_direction = rq
+            # 准备查询信息
+            folder_info = ", ".join(selected_folders) if selected_folders else "All folders"
+            year_info = year_range_info if year_range_info else "All years"
     
-    # 处理前N篇文章（或者所有文章）
-    paper_count = len(data.paper_data)
-    if n == -1:
-        max_papers = paper_count
-    else:
-        max_papers = min(n, paper_count)
+            # 如果启用完整日志，创建完整日志文件
+            if config.save_full_log:
+                full_log_file_path = os.path.join(log_folder, f"Log_ALL_{timestamp}.txt")
+                data.full_log_file = open(full_log_file_path, 'w', encoding='utf-8')
+                # 在完整日志文件开头写入详细的查询信息
+                data.full_log_file.write(f"// Query Time: {query_time}\n")
+                data.full_log_file.write(f"// Selected Folders: {folder_info}\n")
+                data.full_log_file.write(f"// Year Range: {year_info}\n")
+                for job in jobs:
+                    if job.name:
+                        data.full_log_file.write(f"// Job: {job.name}\n")
+                    data.full_log_file.write(f"// Research Question: {job.rq}\n")
+                    data.full_log_file.write(f"// Keywords: {job.keywords}\n")
+                    if job.requirements:
+                        data.full_log_file.write(f"// Requirements: {job.requirements}\n")
+                data.full_log_file.write("\n")
+                utils.print_and_log(f"{lang['full_log_created'].format(path=full_log_file_path)}")
+    
+            # 每个任务创建自己的结果文件和日志，并计算提示词固定部分的token数（用于摘要的token预算）
+            confidence_tokens = prompt_budget.count_tokens(search_paper.CONFIDENCE_INSTRUCTION) if cascade.enabled() else 0
+            for job in jobs:
+                job.open_outputs(result_folder, log_folder, timestamp, query_time, folder_info, year_info)
+                job.prompt_overhead = search_paper.prompt_overhead_tokens(job.rq, job.keywords, job.requirements) + confidence_tokens
+            data.result_file_name = jobs[0].result_file_name if jobs else ""
+    
+            # 复用抽样运行中已判断的论文（研究问题、关键词、要求和模型都相同时）
+            for job in jobs:
+                cached = sampling.load_cached(job)
+                if cached:
+                    relevant = write_cached_verdicts(job, cached)
+                    job.relevant_count += relevant
+                    job.paper_indices = [i for i in job.paper_indices if i not in cached]
+                    utils.print_and_log(lang['sample_reused'].format(
+                        name=f"[{job.name}] " if len(jobs) > 1 and job.name else '', count=len(cached), relevant=relevant))
+    
+            # 条目质量检查：缺少摘要、不是论文或过短的条目按配置只根据标题判断、跳过（CSV中标记为未判断）或照常判断
+            for job in jobs:
+                job.title_only_papers = []
+                if quality_gate.enabled():
+                    job.paper_indices, job.title_only_papers, skipped = quality_gate.split(job.paper_indices, multi_question)
+                    for category, paper_indices in skipped.items():
+                        write_unjudged(job, paper_indices, quality_gate.SKIPPED_RESULT,
+                                       quality_gate.SKIPPED_REASON.format(category=quality_gate.CATEGORY_LABELS[category]))
+                    utils.print_and_log(lang['quality_gate_routed'].format(
+                        name=f"[{job.name}] " if len(jobs) > 1 and job.name else '', title=len(job.title_only_papers),
+                        skipped=sum(len(paper_indices) for paper_indices in skipped.values())))
     
-    data.total_papers_to_process = max_papers
+            # 关键词预筛：在发送任何请求之前扫描标题和摘要，按模式记录、过滤未命中的论文或调整论文顺序
+            for job in jobs:
+                job.keyword_scan = None
+                if keyword_filter.enabled():
+                    job.keyword_scan = keyword_filter.scan_job(job)
+                    for line in job.keyword_scan.format_lines(lang, job.name if len(jobs) > 1 else ''):
+                        utils.print_and_log(line)
+                    if keyword_filter.mode() == keyword_filter.MODE_FILTER:
+                        unmatched = job.keyword_scan.unmatched()
+                        write_keyword_filtered(job, unmatched)
+                        job.paper_indices = [i for i in job.paper_indices if i in job.keyword_scan.tags]
+                    elif keyword_filter.mode() == keyword_filter.MODE_PRIORITIZE:
+                        job.paper_indices = job.keyword_scan.prioritized(job.paper_indices)
     
-    utils.print_and_log(f"\n{lang['start_processing_papers'].format(count=max_papers)}")
-    utils.print_and_log(f"{lang['total_papers'].format(count=paper_count)}")
-    utils.print_and_log(f"{lang['max_parallel_config'].format(count=len(config.API_KEYS))}")
+            # 本地分类器（多问题模式不使用）：在创建调度器之前读取历史判断结果，需要时调整论文顺序
+            for job in jobs:
+                job.classifier = None
+                job.duplicates = None
+            if local_classifier.enabled() and not multi_question:
+                local_classifier.attach(jobs)
+            # 近似重复（多问题模式不使用）：每个簇中第一篇以外的论文移到最后，领取时沿用已有的判断结果
+            if near_duplicates.enabled() and not multi_question:
+                near_duplicates.attach(jobs)
+    
+            # 多问题模式按论文分配（每篇论文一次请求），否则按（任务, 论文）分配
+            if multi_question:
+                job_scheduler = scheduler.PaperQueue(jobs)
+                worker = process_multi_worker
+                request_count = job_scheduler.papers
+            else:
+                # 标题初筛：每批 title_prescreen_batch_size 个标题一次请求，可能相关的论文再做完整判断
+                title_batch_size = config.title_prescreen_batch_size if config.title_prescreen_enabled else 0
+                job_scheduler = scheduler.JobScheduler(jobs, policy, title_batch_size, config.title_prescreen_batch_size)
+                worker = process_worker
+                request_count = job_scheduler.total
+            max_papers = job_scheduler.total
+            data.total_papers_to_process = max_papers
+    
+            utils.print_and_log(f"\n{lang['start_processing_papers'].format(count=max_papers)}")
+            utils.print_and_log(f"{lang['total_papers'].format(count=len(data.paper_data))}")
+            utils.print_and_log(f"{lang['max_parallel_config'].format(count=len(config.API_KEYS))}")
+            if multi_question:
+                utils.print_and_log(lang['multi_question_mode'].format(count=len(jobs), requests=request_count))
+            elif len(jobs) > 1:
+                utils.print_and_log(lang['scheduling_policy'].format(policy=policy, count=len(jobs)))
+            if not multi_question and job_scheduler.title_batch_size:
+                utils.print_and_log(lang['title_prescreen_mode'].format(size=job_scheduler.title_batch_size))
 
-    # 将论文索引分配给不同的线程
-    paper_indices = list(range(1, max_papers + 1))
-    num_threads = min(len(config.API_KEYS), max_papers)  # 关键代码：线程数取API密钥数和论文数的较小值
-    batch_size = max_papers // num_threads
-    remainder = max_papers % num_threads
-    
-    # 分配论文给各个线程
-    batches = []
-    start_idx = 0
-    for i in range(num_threads):
-        # 前remainder个线程多分配一篇论文
-        current_batch_size = batch_size + (1 if i < remainder else 0)
-        batch = paper_indices[start_idx:start_idx + current_batch_size]
-        batches.append(batch)
-        start_idx += current_batch_size
-    
-    # 计算平均每个线程分配的论文数
-    avg_papers_per_thread = max_papers / num_threads
-    utils.print_and_log(f"{lang['actual_threads_used'].format(threads=num_threads, avg=avg_papers_per_thread)}")
-    
-    # 启动进度监控线程
-    data.progress_stop_event.clear()
-    progress_thread = threading.Thread(target=utils.progress_monitor, daemon=True)
-    progress_thread.start()
-    
-    # 使用线程池并行处理
-    total_relevant_count = 0
-    
-    # 设置活跃线程数
-    data.active_threads = num_threads  # 记录实际使用的线程数
-    
-    with ThreadPoolExecutor(max_workers=num_threads) as executor:  # 使用动态计算的线程数
-        # 提交所有任务
-        future_to_thread = {}
-        for i, batch in enumerate(batches):
-            if batch:  # 确保批次不为空
-                future = executor.submit(
-                    process_paper_batch,
-                    batch,
-                    research_direction,
-                    keywords,
-                    requirements,  # 添加requirements参数
-                    config.API_KEYS[i],  # 为每个线程分配不同的API密钥
-                    i + 1,
-                    result_file_path,
-                    log_file_path,
-                    yon_log_file_path,  # 添加Y/N日志文件路径
-                    yon_csv_file_path,  # 新增：CSV 文件路径
-                    max_papers
-                )
-                future_to_thread[future] = i + 1
+            # 线程数取（API密钥数×每个密钥的线程数）和请求数的较小值，各线程从调度器动态领取论文
+            key_count = len(config.API_KEYS)
+            threads_per_key = max(1, int(config.threads_per_key))
+            gate = None
+            if offpeak.enabled():
+                # 错峰运行：按优惠时段内外较大的并发创建线程，由 OffPeakGate 控制各时段实际工作的线程数
+                threads_per_key = max(offpeak.threads_per_key(True), offpeak.threads_per_key(False))
+            num_threads = max(1, min(key_count * threads_per_key, request_count))
+            if offpeak.enabled():
+                gate = offpeak.OffPeakGate(num_threads)
+                utils.print_and_log(lang['offpeak_mode'].format(inside=offpeak.threads_per_key(True),
+                                                                outside=offpeak.threads_per_key(False)))
+                from . import planner
+                for line in offpeak.format_estimate(offpeak.estimate(planner.estimate(jobs)), lang):
+                    utils.print_and_log(line)
+            budget = None
+            if governor.enabled():
+                budget = governor.BudgetGovernor(job_scheduler)
+                utils.print_and_log(lang['spend_limit_mode'].format(
+                    cny=price.format_price(budget.limit_cny) if budget.limit_cny > 0 else '-',
+                    tokens=budget.limit_tokens or '-'))
+    
+            # 计算平均每个线程分配的论文数
+            avg_papers_per_thread = max_papers / num_threads
+            utils.print_and_log(f"{lang['actual_threads_used'].format(threads=num_threads, avg=avg_papers_per_thread)}")
+    
+            # 启动进度监控线程
+            progress_thread = threading.Thread(target=utils.progress_monitor, daemon=True)
+            progress_thread.start()
+    
+            # 按配置启动指标导出（Prometheus文本文件 / 本地HTTP端点）
+            metrics_exporter = metrics.start_exporter()
+    
+            # 设置活跃线程数
+            data.active_threads = num_threads  # 记录实际使用的线程数
+    
+            with ThreadPoolExecutor(max_workers=num_threads) as executor:  # 使用动态计算的线程数
+                # 提交所有工作线程，轮流为各线程分配API密钥
+                future_to_thread = {}
+                for i in range(num_threads):
+                    future = executor.submit(
+                        profile_session.wrap(worker),
+                        job_scheduler,
+                        config.API_KEYS[i % key_count],
+                        i + 1,
+                        i % key_count,
+                        gate,
+                        i // key_count,
+                        budget
+                    )
+                    future_to_thread[future] = i + 1
         
-        # 等待所有任务完成
-        for future in as_completed(future_to_thread):
-            thread_id = future_to_thread[future]
-            try:
-                relevant_count, batch_tokens = future.result()
-                total_relevant_count += relevant_count
-            except Exception as e:
-                with data.file_write_lock:
-                    if config.save_full_log and data.full_log_file:
-                        data.full_log_file.write(f"\n线程{thread_id}发生错误: {str(e)}\n")
-                        data.full_log_file.flush()
-    
-    # 停止进度监控线程
-    data.progress_stop_event.set()
-    progress_thread.join(timeout=2)
-    
-    # 计算总耗时
-    total_elapsed_time = time.time() - data.start_time
-    
-    # 格式化总耗时
-    hours = int(total_elapsed_time // 3600)
-    minutes = int((total_elapsed_time % 3600) // 60)
-    seconds = int(total_elapsed_time % 60)
-    
-    # 计算平均单篇文章耗时（考虑并发处理）
-    # 实际平均速度 = 总文章数 / 总耗时
-    actual_papers_per_second = max_papers / total_elapsed_time if total_elapsed_time > 0 else 0
-    # 实际单篇耗时 = 1 / 实际平均速度
-    average_time_per_paper = 1 / actual_papers_per_second if actual_papers_per_second > 0 else 0
-    
-    # 计算最终价格
-    from ..price import price
-    final_price = price.calculate_token_price(
-        data.prompt_tokens_used,
-        data.completion_tokens_used,
-        data.prompt_cache_hit_tokens_used,
-        data.prompt_cache_miss_tokens_used
-    )
-    
-    utils.print_and_log(f"\n{lang['processing_complete_summary'].format(count=total_relevant_count)}")
-    utils.print_and_log(lang['time_statistics'])
-    utils.print_and_log(lang['total_time'].format(hours=hours, minutes=minutes, seconds=seconds))
-    utils.print_and_log(lang['avg_time_per_paper'].format(time=average_time_per_paper, threads=num_threads))
-    utils.print_and_log(lang['processing_speed'].format(speed=actual_papers_per_second))
-    utils.print_and_log(lang['token_statistics'])
-    utils.print_and_log(lang['input_tokens'].format(total=data.prompt_tokens_used, hit=data.prompt_cache_hit_tokens_used, miss=data.prompt_cache_miss_tokens_used))
-    utils.print_and_log(lang['output_tokens'].format(count=data.completion_tokens_used))
-    utils.print_and_log(lang['total_tokens'].format(count=data.token_used))
-    utils.print_and_log(lang['price_statistics'])
-    utils.print_and_log(lang['total_cost'].format(price=price.format_price(final_price)))
-    utils.print_and_log(lang['result_files'])
-    utils.print_and_log(lang['relevant_papers_saved'].format(path=result_file_path))
-    utils.print_and_log(lang['log_saved'].format(path=log_file_path))
-    utils.print_and_log(lang['all_results_saved'].format(path=yon_log_file_path))
-    
-    # 关闭完整日志文件
-    if data.full_log_file:
-        data.full_log_file.close()
+                # 等待所有工作线程完成
+                try:
+                    for future in as_completed(future_to_thread):
+                        thread_id = future_to_thread[future]
+                        try:
+                            for job, relevant_count in future.result().items():
+                                job.relevant_count += relevant_count
+                        except Exception as e:
+                            with data.file_write_lock:
+                                if config.save_full_log and data.full_log_file:
+                                    data.full_log_file.write(f"\n线程{thread_id}发生错误: {str(e)}\n")
+                                    data.full_log_file.flush()
+                except KeyboardInterrupt:
+                    # 通知错峰运行中等待时段切换的线程退出，否则线程池会一直等待它们
+                    data.progress_stop_event.set()
+                    raise
+    
+            # 达到预算上限时，未派发的论文在CSV中标记为未判断
+            if budget is not None and budget.reached:
+                for job, paper_indices in job_scheduler.undispatched().items():
+                    job.unjudged = len(paper_indices)
+                    write_unjudged(job, paper_indices, governor.UNJUDGED_RESULT, governor.UNJUDGED_REASON)
+        finally:
+            for job in jobs:
+                job.close_outputs()
+            
+            # 停止进度监控线程
+            data.progress_stop_event.set()
+            if progress_thread is not None:
+                progress_thread.join(timeout=2)
+            if metrics_exporter:
+                metrics_exporter.stop()
+            
+            profile_files = profile_session.stop() if profile_session is not None else []
+            cassette.close_cassette()
+        
+        # 计算总耗时
+        total_elapsed_time = time.time() - data.start_time
+    
+        # 格式化总耗时
+        hours = int(total_elapsed_time // 3600)
+        minutes = int((total_elapsed_time % 3600) // 60)
+        seconds = int(total_elapsed_time % 60)
+    
+        # 计算平均单篇文章耗时（考虑并发处理）
+        # 实际平均速度 = 总文章数 / 总耗时
+        actual_papers_per_second = max_papers / total_elapsed_time if total_elapsed_time > 0 else 0
+        # 实际单篇耗时 = 1 / 实际平均速度
+        average_time_per_paper = 1 / actual_papers_per_second if actual_papers_per_second > 0 else 0
+    
+        # 合并各线程的token记账，计算最终价格（按模型分别计价）
+        merged_tokens = accounting.merge_accounts()
+        totals = merged_tokens['totals']
+        data.token_used = totals['total']
+        data.prompt_tokens_used = totals['prompt']
+        data.completion_tokens_used = totals['completion']
+        data.prompt_cache_hit_tokens_used = totals['cache_hit']
+        data.prompt_cache_miss_tokens_used = totals['cache_miss']
+        final_price = accounting.calculate_price(merged_tokens)
+    
+        total_relevant_count = sum(job.relevant_count for job in jobs)
+        utils.print_and_log(f"\n{lang['processing_complete_summary'].format(count=total_relevant_count)}")
+        utils.print_and_log(lang['time_statistics'])
+        utils.print_and_log(lang['total_time'].format(hours=hours, minutes=minutes, seconds=seconds))
+        utils.print_and_log(lang['avg_time_per_paper'].format(time=average_time_per_paper, threads=num_threads))
+        utils.print_and_log(lang['processing_speed'].format(speed=actual_papers_per_second))
+        utils.print_and_log(lang['token_statistics'])
+        utils.print_and_log(lang['input_tokens'].format(total=data.prompt_tokens_used, hit=data.prompt_cache_hit_tokens_used, miss=data.prompt_cache_miss_tokens_used))
+        utils.print_and_log(lang['output_tokens'].format(count=data.completion_tokens_used))
+        utils.print_and_log("  " + lang['total_tokens'].format(total=data.token_used, input=data.prompt_tokens_used, output=data.completion_tokens_used))
+        for model, model_totals in sorted(merged_tokens['by_model'].items()):
+            utils.print_and_log(lang['token_breakdown_model'].format(
+                model=model, papers=model_totals['papers'], hit=model_totals['cache_hit'],
+                miss=model_totals['cache_miss'], output=model_totals['completion']))
+        for key_index, key_totals in sorted(merged_tokens['by_key'].items()):
+            utils.print_and_log(lang['token_breakdown_key'].format(
+                key=key_index + 1, papers=key_totals['papers'], hit=key_totals['cache_hit'],
+                miss=key_totals['cache_miss'], output=key_totals['completion']))
+        utils.print_and_log(lang['price_statistics'])
+        utils.print_and_log(lang['total_cost'].format(price=price.format_price(final_price)))
+        if budget is not None:
+            spend, tokens = budget.refresh()
+            utils.print_and_log(lang['spend_limit_summary'].format(
+                spend=price.format_price(spend), tokens=tokens, unjudged=sum(job.unjudged for job in jobs)))
+        if not multi_question and job_scheduler.title_batch_size:
+            screened = sum(job.next_position for job in jobs)
+            rejected = sum(job.title_rejected for job in jobs)
+            utils.print_and_log(lang['title_prescreen_header'])
+            utils.print_and_log(lang['title_prescreen_statistics'].format(
+                screened=screened, rejected=rejected, ratio=rejected / screened * 100 if screened else 0,
+                full=sum(job.full_dispatched for job in jobs)))
+        title_only = sum(len(job.title_only_papers) for job in jobs)
+        if title_only:
+            utils.print_and_log(lang['quality_gate_title_only_summary'].format(
+                count=title_only, uncertain=sum(job.title_only_uncertain for job in jobs),
+                result=quality_gate.TITLE_ONLY_RESULT))
+        budget_lines = prompt_budget.format_summary(lang)
+        if budget_lines:
+            utils.print_and_log(lang['budget_statistics'])
+            for line in budget_lines:
+                utils.print_and_log(line)
+        cascade_lines = cascade.format_summary(lang, merged_tokens)
+        if cascade_lines:
+            utils.print_and_log(lang['cascade_statistics'])
+            for line in cascade_lines:
+                utils.print_and_log(line)
+        compact_lines = compact.format_summary(lang)
+        if compact_lines:
+            utils.print_and_log(lang['compact_statistics'])
+            for line in compact_lines:
+                utils.print_and_log(line)
+        stream_lines = streaming.format_summary(lang)
+        if stream_lines:
+            utils.print_and_log(lang['stream_statistics'])
+            for line in stream_lines:
+                utils.print_and_log(line)
+        classifier_lines = [job.classifier.format_summary(lang) for job in jobs if job.classifier is not None]
+        if classifier_lines:
+            utils.print_and_log(lang['classifier_statistics'])
+            for line in classifier_lines:
+                utils.print_and_log(line)
+        duplicate_lines = [job.duplicates.format_summary(lang) for job in jobs if job.duplicates is not None]
+        if duplicate_lines:
+            utils.print_and_log(lang['near_duplicate_statistics'])
+            for line in duplicate_lines:
+                utils.print_and_log(line)
+        phase_lines = tracing.format_summary(lang)
+        if phase_lines:
+            utils.print_and_log(lang['phase_statistics'])
+            for line in phase_lines:
+                utils.print_and_log(line)
+        if len(jobs) > 1:
+            utils.print_and_log(lang['job_statistics'])
+            if multi_question and totals['papers']:
+                # 与每个问题单独请求相比节省的输入token（单独请求的用量为估算值）
+                separate = totals['separate_prompt']
+                utils.print_and_log(lang['multi_question_statistics'].format(
+                    requests=request_count, questions=len(jobs), pairs=totals['papers'],
+                    per_pair=totals['prompt'] // totals['papers'], actual=totals['prompt'], separate=separate,
+                    saved=(1 - totals['prompt'] / separate) * 100 if separate else 0))
+            for job in jobs:
+                job_tokens = accounting.merge_accounts(job.accounts)
+                utils.print_and_log(lang['job_summary'].format(
+                    name=job.name, relevant=job.relevant_count, processed=job_tokens['totals']['papers'],
+                    total=job.total, cost=price.format_price(accounting.calculate_price(job_tokens))))
+        utils.print_and_log(lang['result_files'])
+        for job in jobs:
+            utils.print_and_log(lang['relevant_papers_saved'].format(path=job.result_file_path))
+            utils.print_and_log(lang['log_saved'].format(path=job.log_file_path))
+            utils.print_and_log(lang['all_results_saved'].format(path=job.yon_log_file_path))
+        for path in profile_files:
+            utils.print_and_log(lang['profile_saved'].format(path=path))
+        if active_cassette is not None:
+            if active_cassette.mode == cassette.MODE_RECORD:
+                utils.print_and_log(lang['cassette_recorded'].format(count=active_cassette.recorded, path=active_cassette.path))
+            else:
+                utils.print_and_log(lang['cassette_replayed'].format(hits=active_cassette.hits, misses=active_cassette.misses))
+    finally:
+        # 关闭完整日志文件
+        if data.full_log_file:
+            data.full_log_file.close()
 
 # 函数：extract_url_from_entry（新增）
 # 作用：从 BibTeX entry 中提取 url 或 doi（无 url 时），若为 doi 则拼接 https://doi.org/
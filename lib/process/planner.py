@@ -0,0 +1,255 @@
+"""
+运行前的离线估算：在本地统计所选语料中每个请求的输入token数，结合历史日志估算输出token、
+吞吐量、耗时和费用（按优惠/标准时段加权），不发送任何请求
+"""
+import glob
+import os
+import statistics
+import time
+from . import data
+from . import keyword_filter
+from . import local_classifier
+from . import near_duplicates
+from . import offpeak
+from . import prompt_budget
+from . import quality_gate
+from . import sampling
+from . import search_paper
+from ..log import verdict_log
+from ..config import config_loader as config
+
+# 没有历史日志时使用的默认值
+DEFAULT_COMPLETION_TOKENS = 60  # 每次请求的输出token数
+DEFAULT_LATENCY = 3.0  # 单次请求耗时（秒）
+# 最多读取最近的 Log_YoN 日志数
+HISTORY_FILES = 20
+# 计算单个密钥吞吐量时，一个日志中该密钥至少需要的记录数
+MIN_KEY_RECORDS = 5
+# DeepSeek 的上下文缓存以 64 token 为单位命中
+CACHE_BLOCK_TOKENS = 64
+
+
+def load_history(log_folder=None, max_files=HISTORY_FILES):
+    """
+    从最近的 Log_YoN_*.jsonl 中统计每次请求的输出token、缓存命中率和单个密钥的吞吐量
+
+    只使用单独判断的记录（跳过多问题模式和标题初筛按批分摊的记录，以及关键词预筛过滤、本地分类器跳过、沿用近似重复论文判断、复用抽样结果的记录）。
+
+    返回:
+        统计字典，没有可用记录时返回 None
+    """
+    log_folder = log_folder or config.LOG_FOLDER
+    paths = sorted(glob.glob(os.path.join(log_folder, 'Log_YoN_*.jsonl')), key=os.path.getmtime)[-max_files:]
+    records = 0
+    completion = 0
+    cache_hit = 0
+    cache_miss = 0
+    latency = 0.0
+    key_rates = []
+    for path in paths:
+        spans = {}  # key_index -> [记录数, 最早开始时间, 最晚完成时间]
+        try:
+            for record in verdict_log.iter_verdicts(path):
+                tokens = record.get('tokens') or {}
+                if 'questions' in tokens or 'batch' in tokens:
+                    continue
+                if record.get('stage') in (keyword_filter.STAGE_KEYWORD, local_classifier.STAGE_CLASSIFIER,
+                                           near_duplicates.STAGE_PROPAGATED, sampling.STAGE_SAMPLED):
+                    continue
+                records += 1
+                completion += tokens.get('completion', 0)
+                cache_hit += tokens.get('cache_hit', 0)
+                cache_miss += tokens.get('cache_miss', 0)
+                latency += record.get('latency') or 0.0
+                started, finished = record.get('started_at'), record.get('finished_at')
+                if started is None or finished is None:
+                    continue
+                span = spans.get(record.get('key_index'))
+                if span is None:
+                    spans[record.get('key_index')] = [1, started, finished]
+                else:
+                    span[0] += 1
+                    span[1] = min(span[1], started)
+                    span[2] = max(span[2], finished)
+        except (OSError, ValueError):
+            # 写入中断或格式错误的日志直接跳过
+            continue
+        for count, started, finished in spans.values():
+            if count >= MIN_KEY_RECORDS and finished > started:
+                key_rates.append(count / (finished - started))
+
+    if records == 0:
+        return None
+    return {
+        'files': len(paths),
+        'records': records,
+        'completion': completion / records,
+        'cache_hit_ratio': cache_hit / (cache_hit + cache_miss) if (cache_hit + cache_miss) else None,
+        'latency': latency / records,
+        'key_rate': statistics.median(key_rates) if key_rates else None,
+    }
+
+
+def _corpus_token_counts(paper_indices):
+    """按提示词预处理的配置清理所选论文的标题和摘要，批量统计token数"""
+    titles = []
+    abstracts = []
+    for paper_index in paper_indices:
+        paper = data.paper_data[paper_index]
+        title, abstract = paper['title'], paper['abstract']
+        if config.normalize_abstracts:
+            title, abstract = prompt_budget.normalize_text(title), prompt_budget.normalize_text(abstract)
+        titles.append(title)
+        abstracts.append(abstract)
+    return (dict(zip(paper_indices, prompt_budget.count_tokens_batch(titles))),
+            dict(zip(paper_indices, prompt_budget.count_tokens_batch(abstracts))))
+
+
+def estimate(jobs, history=None):
+    """
+    估算运行 jobs 的token用量、耗时和费用
+
+    每个（任务, 论文）计一次请求：输入token = 提示词固定部分 + 标题 + 摘要（超出 max_input_tokens 时按上限截断），
+    与实际运行时 prompt_budget.prepare_paper 的规则相同。启用关键词预筛时扫描各任务的论文，
+    filter 模式下未命中关键词的论文不计请求。启用条目质量检查时，跳过的条目不计请求，
+    只根据标题判断的条目按 title_prescreen_batch_size 一批计一次请求（输入token = 标题请求的固定部分 + 标题）。
+    抽样运行中已判断、完整运行会复用的论文不计请求。
+
+    参数:
+        jobs: Job 列表（论文需已读入 data.paper_data）
+        history: load_history 的结果，None 时自动读取 LOG_FOLDER 中的日志
+
+    返回:
+        估算结果字典
+    """
+    from ..price import price
+
+    count_start = time.perf_counter()
+    search_paper.reset_templates()
+    keyword_scans = []
+    if keyword_filter.enabled():
+        # 运行中调用时（错峰运行的估算）使用运行开始时的扫描结果
+        keyword_scans = [(job, job.keyword_scan or keyword_filter.scan_job(job)) for job in jobs]
+    filtered = {job: scan.tags for job, scan in keyword_scans if keyword_filter.mode() == keyword_filter.MODE_FILTER}
+    paper_indices = sorted({i for job in jobs for i in job.paper_indices + job.title_only_papers if i in data.paper_data})
+    entry_counts = quality_gate.count(paper_indices) if quality_gate.enabled() else None
+    title_batch_size = max(1, int(config.title_prescreen_batch_size))
+    title_tokens, abstract_tokens = _corpus_token_counts(paper_indices)
+
+    max_input_tokens = int(config.max_input_tokens)
+    requests = 0
+    prompt_tokens = 0
+    prefix_tokens = 0
+    truncated = 0
+    for job in jobs:
+        overhead = search_paper.prompt_overhead_tokens(job.rq, job.keywords, job.requirements)
+        job_indices, title_only = job.paper_indices, list(job.title_only_papers)
+        if quality_gate.enabled():
+            job_indices, gated, _ = quality_gate.split(job.paper_indices)
+            title_only += gated
+        cached = sampling.load_cached(job)
+        if cached:
+            job_indices = [i for i in job_indices if i not in cached]
+            title_only = [i for i in title_only if i not in cached]
+        title_only = [i for i in title_only if i in title_tokens]
+        if title_only:
+            title_overhead = search_paper.compile_title_template(job.rq, job.keywords, job.requirements).overhead_tokens
+            for batch_start in range(0, len(title_only), title_batch_size):
+                requests += 1
+                prompt_tokens += title_overhead + sum(title_tokens[i] for i in title_only[batch_start:batch_start + title_batch_size])
+                prefix_tokens += title_overhead // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+        for paper_index in job_indices:
+            if paper_index not in title_tokens:
+                continue
+            if job in filtered and paper_index not in filtered[job]:
+                continue
+            paper_tokens = title_tokens[paper_index] + abstract_tokens[paper_index]
+            if max_input_tokens > 0:
+                budget = max(0, max_input_tokens - overhead - title_tokens[paper_index])
+                if abstract_tokens[paper_index] > budget:
+                    truncated += 1
+                    paper_tokens = title_tokens[paper_index] + budget
+            requests += 1
+            prompt_tokens += overhead + paper_tokens
+            # 同一任务的请求共享系统提示词和研究主题前缀，按 64 token 为单位命中缓存
+            prefix_tokens += overhead // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+    count_seconds = time.perf_counter() - count_start
+
+    if history is None:
+        history = load_history()
+    completion_per_request = history['completion'] if history else DEFAULT_COMPLETION_TOKENS
+    completion_tokens = int(completion_per_request * requests)
+    if history and history['cache_hit_ratio'] is not None:
+        cache_hit = int(prompt_tokens * history['cache_hit_ratio'])
+    else:
+        cache_hit = prefix_tokens
+    cache_miss = prompt_tokens - cache_hit
+
+    # 吞吐量：优先使用历史日志中单个密钥的实测值，否则按默认单次耗时和每个密钥的线程数推算
+    keys = max(1, len(config.API_KEYS))
+    if history and history['key_rate']:
+        key_rate = history['key_rate']
+    else:
+        latency = history['latency'] if history and history['latency'] else DEFAULT_LATENCY
+        key_rate = max(1, int(config.threads_per_key)) / latency
+    duration = requests / (key_rate * keys) if requests else 0.0
+
+    total_tokens = prompt_tokens + completion_tokens
+    return {
+        'papers': len(paper_indices),
+        'jobs': len(jobs),
+        'requests': requests,
+        'count_seconds': count_seconds,
+        'tokenizer': prompt_budget.has_tokenizer(),
+        'prompt': prompt_tokens,
+        'completion': completion_tokens,
+        'cache_hit': cache_hit,
+        'cache_miss': cache_miss,
+        'truncated': truncated,
+        'entry_counts': entry_counts,
+        'keyword_scans': [(job.name if len(jobs) > 1 else '', scan) for job, scan in keyword_scans],
+        'history': history,
+        'keys': keys,
+        'key_rate': key_rate,
+        'duration': duration,
+        'cost_now': price.calculate_weighted_price(
+            duration, total_tokens / duration if duration else 0,
+            prompt_ratio=prompt_tokens / total_tokens if total_tokens else 0.8,
+            cache_miss_ratio=cache_miss / prompt_tokens if prompt_tokens else 1.0),
+        'cost_standard': price.calculate_token_price(prompt_tokens, completion_tokens, cache_hit, cache_miss,
+                                                     discount=False),
+        'cost_discount': price.calculate_token_price(prompt_tokens, completion_tokens, cache_hit, cache_miss,
+                                                     discount=True),
+    }
+
+
+def format_plan(plan, lang):
+    """生成估算结果的文本行"""
+    from ..price import price
+
+    requests = plan['requests']
+    history = plan['history']
+    if history:
+        source = lang['plan_source_history'].format(files=history['files'], records=history['records'])
+    else:
+        source = lang['plan_source_default']
+    seconds = int(plan['duration'])
+    return [
+        lang['plan_header'],
+        lang['plan_corpus'].format(
+            papers=plan['papers'], jobs=plan['jobs'], requests=requests, seconds=plan['count_seconds'],
+            method=lang['plan_method_tokenizer'] if plan['tokenizer'] else lang['plan_method_estimate']),
+        lang['plan_input'].format(
+            prompt=plan['prompt'], per_request=plan['prompt'] // requests if requests else 0,
+            hit_ratio=plan['cache_hit'] / plan['prompt'] * 100 if plan['prompt'] else 0,
+            truncated=plan['truncated'], limit=config.max_input_tokens),
+        lang['plan_output'].format(completion=plan['completion'],
+                                   per_request=plan['completion'] / requests if requests else 0),
+        lang['plan_time'].format(hours=seconds // 3600, minutes=seconds % 3600 // 60, seconds=seconds % 60,
+                                 keys=plan['keys'], rate=plan['key_rate']),
+        lang['plan_cost'].format(now=price.format_price(plan['cost_now']),
+                                 standard=price.format_price(plan['cost_standard']),
+                                 discount=price.format_price(plan['cost_discount'])),
+        lang['plan_source'].format(source=source),
+    ] + (quality_gate.format_counts(plan['entry_counts'], lang) if plan.get('entry_counts') else []) + [
+        line for name, scan in plan.get('keyword_scans', ()) for line in scan.format_lines(lang, name)] + (offpeak.format_estimate(offpeak.estimate(plan), lang) if offpeak.enabled() else [])
@@ -0,0 +1,290 @@
+"""
+提示词预处理：清理标题和摘要中的 LaTeX / HTML 标记、合并空白，
+在本地统计 token 数，并按 config.max_input_tokens 限制单篇论文的输入长度
+"""
+import html
+import re
+import threading
+from . import data
+from . import accounting
+from ..config import config_loader as config
+
+# 截断后追加在摘要末尾的标记
+TRUNCATION_MARK = ' …'
+
+# 每个工作线程自己的统计对象，通过 threading.local 找到
+_local = threading.local()
+
+# 本地分词器（tokenizers 为可选依赖，首次使用时按 config.tokenizer_path 加载）
+_tokenizer = None
+_tokenizer_path = None
+_tokenizer_lock = threading.Lock()
+
+# LaTeX / HTML 清理规则（按顺序应用）
+_HTML_TAG_RE = re.compile(r'<\/?[A-Za-z][^<>]*>')
+_LATEX_MATH_RE = re.compile(r'\$\$?([^$]*)\$\$?')
+# 保留参数内容的格式命令，如 \textit{...}、\emph{...}
+_LATEX_STYLE_RE = re.compile(r'\\(?:text(?:it|bf|tt|sc|rm|sf|up|normal)?|emph|mathrm|mathit|mathbf|mathcal|'
+                             r'mbox|url|texttt|underline)\s*\{([^{}]*)\}')
+# 需要连同参数一起删除的命令，如 \cite{...}、\ref{...}
+_LATEX_DROP_RE = re.compile(r'\\(?:cite\w*|ref|label|footnote)\s*\{[^{}]*\}')
+_LATEX_ESCAPE_RE = re.compile(r'\\([&%$#_{}])')
+_LATEX_ACCENT_RE = re.compile(r'\\[\'"`^~=.uvHcdbrk]\s*\{?([A-Za-z])\}?')
+_LATEX_COMMAND_RE = re.compile(r'\\[A-Za-z]+\*?')
+_TIE_RE = re.compile(r'(?<=\S)~(?=\S)')
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?。！？；;])\s+')
+
+# LaTeX 重音命令对应的组合字符
+_ACCENTS = {"'": '\u0301', '`': '\u0300', '^': '\u0302', '"': '\u0308', '~': '\u0303', '=': '\u0304',
+            '.': '\u0307', 'u': '\u0306', 'v': '\u030c', 'H': '\u030b', 'c': '\u0327', 'r': '\u030a', 'k': '\u0328'}
+
+
+class BudgetStats:
+    """
+    单个工作线程的提示词预处理统计
+
+    只由所属线程写入，运行结束后用 merge_stats 合并。
+    """
+    __slots__ = ('papers', 'raw_tokens', 'normalized_saved', 'truncated', 'truncated_saved')
+
+    def __init__(self):
+        self.papers = 0  # 预处理的论文数（每次请求计一次）
+        self.raw_tokens = 0  # 原始标题和摘要的token数
+        self.normalized_saved = 0  # 清理标记和空白节省的token数
+        self.truncated = 0  # 超出预算被截断的论文数
+        self.truncated_saved = 0  # 截断节省的token数
+
+
+def _get_tokenizer():
+    """按 config.tokenizer_path 加载本地分词器，未配置或无法加载时返回 None"""
+    global _tokenizer, _tokenizer_path
+    path = config.tokenizer_path
+    if path == _tokenizer_path:
+        return _tokenizer
+    with _tokenizer_lock:
+        if path != _tokenizer_path:
+            tokenizer = None
+            if path:
+                try:
+                    from tokenizers import Tokenizer
+                    tokenizer = Tokenizer.from_file(path)
+                except Exception:
+                    # 未安装 tokenizers 或文件无效时回退到按字符估算
+                    tokenizer = None
+            _tokenizer = tokenizer
+            _tokenizer_path = path
+    return _tokenizer
+
+
+def has_tokenizer():
+    """是否使用本地分词器统计token（否则按字符估算）"""
+    return _get_tokenizer() is not None
+
+
+def count_tokens(text):
+    """
+    统计文本的token数
+
+    配置了 tokenizer_path（与模型配套的 tokenizer.json）且安装了 tokenizers 时精确统计，
+    否则按 DeepSeek 的经验比例估算（中文字符约 0.6 个 token，其他字符约 0.3 个 token）。
+    """
+    if not text:
+        return 0
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return accounting.estimate_tokens(text)
+
+
+def count_tokens_batch(texts):
+    """
+    批量统计多段文本的token数（用于离线估算整个语料）
+
+    配置了分词器时用 encode_batch 并行编码，否则用 accounting.estimate_tokens_batch 向量化估算。
+    """
+    texts = list(texts)
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return [len(encoding.ids) for encoding in tokenizer.encode_batch(texts, add_special_tokens=False)]
+    return accounting.estimate_tokens_batch(texts)
+
+
+def _replace_accent(match):
+    command = match.group(0)[1]
+    return match.group(1) + _ACCENTS.get(command, '')
+
+
+def normalize_text(text):
+    """清理 LaTeX 命令、HTML 标签和实体，把连续空白合并为一个空格"""
+    if not text:
+        return text
+    # 各步骤先检查是否含有相关字符，纯文本摘要只需合并空白（离线估算时要处理整个语料）
+    if '&' in text:
+        text = html.unescape(text)
+    if '<' in text:
+        text = _HTML_TAG_RE.sub(' ', text)
+    if '~' in text:
+        # BibTeX 的不换行空格（如 Fig.~3、methods~\cite{...}）
+        text = _TIE_RE.sub(' ', text)
+    if '\\' in text or '$' in text:
+        text = _LATEX_MATH_RE.sub(r'\1', text)
+        text = _LATEX_DROP_RE.sub('', text)
+        # 嵌套的格式命令需要多次展开
+        for _ in range(3):
+            expanded = _LATEX_STYLE_RE.sub(r'\1', text)
+            if expanded == text:
+                break
+            text = expanded
+        text = _LATEX_ESCAPE_RE.sub(r'\1', text)
+        text = _LATEX_ACCENT_RE.sub(_replace_accent, text)
+        text = text.replace('\\\\', ' ')
+        text = _LATEX_COMMAND_RE.sub('', text)
+    if '--' in text:
+        text = text.replace('---', '—').replace('--', '–')
+    if '{' in text or '}' in text:
+        text = text.replace('{', '').replace('}', '')
+    return ' '.join(text.split())
+
+
+def truncate_to_budget(text, budget):
+    """
+    把文本截断到 budget 个token以内
+
+    按句子截断：保留开头的句子，预算允许时再保留最后一句（摘要的结论通常在末尾）；
+    第一句就超出预算时按词截断。
+
+    返回:
+        (截断后的文本, 是否截断)
+    """
+    if budget <= 0:
+        return '', bool(text)
+    if count_tokens(text) <= budget:
+        return text, False
+
+    budget -= count_tokens(TRUNCATION_MARK)
+    sentences = _SENTENCE_END_RE.split(text)
+    last = sentences[-1] if len(sentences) > 1 else ''
+    last_tokens = count_tokens(last)
+    # 最后一句太长（超过预算的三分之一）时不保留
+    reserve = last_tokens + 1 if last and last_tokens <= budget // 3 else 0
+
+    kept = []
+    used = 0
+    for sentence in sentences[:-1] if reserve else sentences:
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > budget - reserve:
+            break
+        kept.append(sentence)
+        used += tokens
+
+    if not kept:
+        # 第一句就超出预算：按词二分查找能放下的最长前缀
+        words = sentences[0].split(' ')
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count_tokens(' '.join(words[:middle])) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return ' '.join(words[:low]) + TRUNCATION_MARK, True
+
+    result = ' '.join(kept) + TRUNCATION_MARK
+    if reserve:
+        result += ' ' + last
+    return result, True
+
+
+def reset_stats():
+    """清空统计，在每次运行开始前调用"""
+    with data.token_lock:
+        data.budget_stats = []
+
+
+def _get_stats():
+    # 每次运行开始后（progress_generation 变化）重新注册
+    stats = getattr(_local, 'stats', None)
+    if stats is None or getattr(_local, 'generation', None) != data.progress_generation:
+        stats = BudgetStats()
+        with data.token_lock:
+            data.budget_stats.append(stats)
+        _local.stats = stats
+        _local.generation = data.progress_generation
+    return stats
+
+
+def merge_stats():
+    """合并各线程的统计（应在所有工作线程结束后调用）"""
+    merged = BudgetStats()
+    for stats in data.budget_stats:
+        merged.papers += stats.papers
+        merged.raw_tokens += stats.raw_tokens
+        merged.normalized_saved += stats.normalized_saved
+        merged.truncated += stats.truncated
+        merged.truncated_saved += stats.truncated_saved
+    return merged
+
+
+def _normalized(paper):
+    """
+    返回清理后的标题和摘要及其token数
+
+    结果缓存在论文字典中（'_prepared'），多个任务、多个阶段共用，每篇论文只清理和统计一次；
+    相关配置改变后重新计算。
+    """
+    key = (bool(config.normalize_abstracts), config.tokenizer_path)
+    prepared = paper.get('_prepared')
+    if prepared is None or prepared[0] != key:
+        title, abstract = paper['title'], paper['abstract']
+        raw_tokens = count_tokens(title) + count_tokens(abstract)
+        if config.normalize_abstracts:
+            title, abstract = normalize_text(title), normalize_text(abstract)
+        prepared = (key, title, abstract, raw_tokens, count_tokens(title), count_tokens(abstract))
+        paper['_prepared'] = prepared
+    return prepared[1:]
+
+
+def prepare_title(paper):
+    """返回用于提示词的标题（按配置清理）"""
+    return _normalized(paper)[0]
+
+
+def prepare_paper(paper, overhead_tokens):
+    """
+    返回用于提示词的标题和摘要
+
+    参数:
+        paper: data.paper_data 中的论文字典
+        overhead_tokens: 提示词中除标题和摘要以外部分的token数（系统提示词、研究主题等）
+
+    返回:
+        (title, abstract)
+    """
+    title, abstract, raw_tokens, title_tokens, abstract_tokens = _normalized(paper)
+    stats = _get_stats()
+    stats.papers += 1
+    stats.raw_tokens += raw_tokens
+    stats.normalized_saved += raw_tokens - title_tokens - abstract_tokens
+
+    max_input_tokens = int(config.max_input_tokens)
+    if max_input_tokens > 0:
+        budget = max_input_tokens - overhead_tokens - title_tokens
+        if abstract_tokens > budget:
+            abstract, truncated = truncate_to_budget(abstract, budget)
+            if truncated:
+                stats.truncated += 1
+                stats.truncated_saved += abstract_tokens - count_tokens(abstract)
+    return title, abstract
+
+
+def format_summary(lang):
+    """生成提示词预处理的统计文本，没有处理论文时返回空列表"""
+    stats = merge_stats()
+    if stats.papers == 0:
+        return []
+    saved = stats.normalized_saved + stats.truncated_saved
+    return [lang['budget_summary'].format(
+        papers=stats.papers, raw=stats.raw_tokens, saved=saved,
+        ratio=saved / stats.raw_tokens * 100 if stats.raw_tokens else 0,
+        normalized=stats.normalized_saved, truncated=stats.truncated,
+        truncated_saved=stats.truncated_saved, limit=config.max_input_tokens)]
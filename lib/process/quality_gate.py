@@ -0,0 +1,151 @@
+"""
+条目质量检查：读取语料时找出缺少摘要、不是论文（会议前言、Session details、Keynote 等）或文本过短的条目
+
+这些条目按完整提示词判断的结果接近随机，却按完整价格计费。按配置对每一类条目：
+    title: 与其他条目分开，按批只根据标题判断（明显无关的记为 N，可能相关的记为待确认，不写入结果文件）
+    skip: 不发送请求，在CSV中标记为未判断并注明原因
+    include: 照常判断
+"""
+import re
+from . import data
+from ..log import utils
+from ..config import config_loader as config
+from language import language
+
+# 条目类别（按顺序判断，一个条目只属于一类）
+CATEGORY_NON_PAPER = 'non_paper'
+CATEGORY_MISSING_ABSTRACT = 'missing_abstract'
+CATEGORY_SHORT_TEXT = 'short_text'
+CATEGORIES = (CATEGORY_NON_PAPER, CATEGORY_MISSING_ABSTRACT, CATEGORY_SHORT_TEXT)
+# 写入原因时的类别说明
+CATEGORY_LABELS = {
+    CATEGORY_NON_PAPER: '非论文条目',
+    CATEGORY_MISSING_ABSTRACT: '摘要缺失',
+    CATEGORY_SHORT_TEXT: '摘要过短',
+}
+
+# 处理方式
+ACTION_TITLE = 'title'
+ACTION_SKIP = 'skip'
+ACTION_INCLUDE = 'include'
+ACTIONS = (ACTION_TITLE, ACTION_SKIP, ACTION_INCLUDE)
+
+# 只根据标题判断的论文在Y/N日志中的 stage，以及可能相关时的结果和原因
+# （初筛提示词宽松，可能相关不等于相关：结果既不是 Y 也不是 N，不写入结果文件）
+STAGE_TITLE_ONLY = 'title_only'
+TITLE_ONLY_RESULT = '?'
+TITLE_ONLY_REASON = "待确认：{category}，仅根据标题判断为可能相关，未写入结果文件，请人工确认"
+# 跳过的条目在CSV中的结果和原因
+SKIPPED_RESULT = '-'
+SKIPPED_REASON = "未判断：{category}"
+
+# read_bib_files 读不到摘要时填入的占位文本
+MISSING_ABSTRACT = "摘要未知"
+# 不是论文的条目类型和标题开头（忽略大小写）
+NON_PAPER_TYPES = ('proceedings', 'book', 'collection', 'periodical')
+_NON_PAPER_TITLE_RE = re.compile(
+    r'^\W*(?:session details|keynote|front ?matter|back ?matter|table of contents|title page|preface|foreword'
+    r'|welcome (?:message|from|to)|message from|organi[sz]ing committee|program committee|steering committee'
+    r'|author index|index of authors|copyright notice|list of reviewers|proceedings of)',
+    re.IGNORECASE)
+_ENTRY_TYPE_RE = re.compile(r'@(\w+)\s*\{')
+_WORD_RE = re.compile(r'[0-9A-Za-z]+|[一-鿿]')
+
+
+def enabled():
+    return bool(config.quality_gate_enabled)
+
+
+def action(category):
+    """某一类条目的处理方式（配置无效时照常判断）"""
+    value = {
+        CATEGORY_NON_PAPER: config.quality_gate_non_paper,
+        CATEGORY_MISSING_ABSTRACT: config.quality_gate_missing_abstract,
+        CATEGORY_SHORT_TEXT: config.quality_gate_short_text,
+    }[category]
+    value = str(value or ACTION_INCLUDE).lower()
+    return value if value in ACTIONS else ACTION_INCLUDE
+
+
+def classify(paper):
+    """
+    条目类别
+
+    返回:
+        CATEGORIES 之一，正常的论文返回 None
+    """
+    type_match = _ENTRY_TYPE_RE.match(paper.get('entry', '').lstrip())
+    if (type_match and type_match.group(1).lower() in NON_PAPER_TYPES) or _NON_PAPER_TITLE_RE.match(paper['title']):
+        return CATEGORY_NON_PAPER
+    abstract = paper['abstract'].strip()
+    if not abstract or abstract == MISSING_ABSTRACT:
+        return CATEGORY_MISSING_ABSTRACT
+    if len(_WORD_RE.findall(abstract)) < int(config.quality_gate_min_abstract_words):
+        return CATEGORY_SHORT_TEXT
+    return None
+
+
+def classify_corpus():
+    """读取语料后调用：检查 data.paper_data 中的所有条目，结果保存到 data.entry_categories"""
+    categories = {}
+    for paper_index, paper in data.paper_data.items():
+        category = classify(paper)
+        if category is not None:
+            categories[paper_index] = category
+    data.entry_categories = categories
+    lang = language.get_text(config.LANGUAGE)
+    for line in format_counts(count(data.paper_data), lang):
+        utils.print_and_log(line)
+    return categories
+
+
+def count(paper_indices):
+    """各类条目的论文数"""
+    categories = data.entry_categories if data.entry_categories is not None else classify_corpus()
+    counts = dict.fromkeys(CATEGORIES, 0)
+    for paper_index in paper_indices:
+        category = categories.get(paper_index)
+        if category is not None:
+            counts[category] += 1
+    return counts
+
+
+def format_counts(counts, lang):
+    """各类条目的数量和处理方式"""
+    lines = [lang['quality_gate_header']]
+    for category in CATEGORIES:
+        lines.append(lang['quality_gate_category'].format(
+            category=lang[f'quality_gate_{category}'], count=counts[category],
+            action=lang[f'quality_gate_action_{action(category)}']))
+    return lines
+
+
+def split(paper_indices, multi_question=False):
+    """
+    按处理方式拆分论文（保持原顺序）
+
+    参数:
+        multi_question: 多问题模式不支持只根据标题判断，这类论文照常判断
+
+    返回:
+        (照常判断的论文, 只根据标题判断的论文, {类别: 跳过的论文})
+    """
+    categories = data.entry_categories if data.entry_categories is not None else classify_corpus()
+    included = []
+    title_only = []
+    skipped = {}
+    for paper_index in paper_indices:
+        category = categories.get(paper_index)
+        handling = action(category) if category is not None else ACTION_INCLUDE
+        if handling == ACTION_TITLE and not multi_question:
+            title_only.append(paper_index)
+        elif handling == ACTION_SKIP:
+            skipped.setdefault(category, []).append(paper_index)
+        else:
+            included.append(paper_index)
+    return included, title_only, skipped
+
+
+def title_only_reason(paper_index):
+    category = (data.entry_categories or {}).get(paper_index)
+    return TITLE_ONLY_REASON.format(category=CATEGORY_LABELS.get(category, CATEGORY_LABELS[CATEGORY_MISSING_ABSTRACT]))
@@ -0,0 +1,250 @@
+"""
+抽样估算：按文件夹和年份分层随机抽取一部分论文判断，推算全部论文的相关比例、token用量、费用和耗时（含 95% 置信区间）
+
+抽样运行的Y/N日志在运行信息中记录抽样参数；之后研究问题、关键词、要求和模型都相同的完整运行
+直接复用这些论文的判断结果（Y/N日志中 stage 为 sampled），不再发送请求。
+"""
+import glob
+import math
+import os
+import random
+from . import data
+from . import scheduler
+from .job import Job
+from ..log import utils
+from ..log import verdict_log
+from ..config import config_loader as config
+from ..load_data.load_paper import extract_year_from_filename
+from language import language
+
+# 抽样运行的任务名（输出文件名带 _sample 后缀）和运行信息中记录抽样参数的字段
+SAMPLE_JOB_NAME = 'sample'
+HEADER_FIELD = 'sample'
+# 复用的判断结果在Y/N日志中的 stage
+STAGE_SAMPLED = 'sampled'
+# 只复用模型给出的判断（不复用关键词预筛、本地分类器等本地规则给出的结果）
+REUSABLE_STAGES = (None, scheduler.STAGE_FULL, scheduler.STAGE_TITLE)
+# 每个分层至少抽取的论文数（估计方差至少需要 2 篇）
+MIN_PER_STRATUM = 2
+# 95% 置信区间的正态分位数
+Z_95 = 1.96
+
+
+def _stratum_keys(paper):
+    """论文按（文件夹, 年份）和只按文件夹的分层键"""
+    folder = paper.get('source_folder', '')
+    return (folder, extract_year_from_filename(paper.get('source_file', ''))), (folder, None)
+
+
+def build_strata(paper_indices, size):
+    """
+    把论文分层：优先按（文件夹, 年份），分层数过多（每层无法抽到 MIN_PER_STRATUM 篇）时只按文件夹，仍过多时不分层
+
+    返回:
+        {分层键: [paper_index, ...]}
+    """
+    for level in (0, 1):
+        strata = {}
+        for paper_index in paper_indices:
+            strata.setdefault(_stratum_keys(data.paper_data[paper_index])[level], []).append(paper_index)
+        if len(strata) * MIN_PER_STRATUM <= size:
+            return strata
+    return {('', None): list(paper_indices)}
+
+
+def allocate(strata, size):
+    """
+    按各层论文数成比例分配样本量（最大余数法），每层至少 MIN_PER_STRATUM 篇（不超过该层论文数）
+
+    补足小分层的最低篇数后超出样本量时，依次从扣减后相对比例份额偏差最小的分层中扣回。
+    """
+    population = sum(len(indices) for indices in strata.values())
+    if size >= population:
+        return {key: len(indices) for key, indices in strata.items()}
+    quotas = {key: size * len(indices) / population for key, indices in strata.items()}
+    counts = {key: min(len(strata[key]), max(MIN_PER_STRATUM, int(quota))) for key, quota in quotas.items()}
+    while sum(counts.values()) > size:
+        reducible = [key for key in counts if counts[key] > MIN_PER_STRATUM]
+        if not reducible:
+            break
+        key = max(reducible, key=lambda k: (counts[k] - 1) / quotas[k])
+        counts[key] -= 1
+    for key in sorted(quotas, key=lambda k: quotas[k] - int(quotas[k]), reverse=True):
+        if sum(counts.values()) >= size:
+            break
+        if counts[key] < len(strata[key]):
+            counts[key] += 1
+    return counts
+
+
+def stratified_sample(paper_indices, size, seed=0):
+    """
+    分层随机抽样
+
+    返回:
+        (抽中的 paper_index 列表（升序）, {分层键: [该层全部 paper_index]})
+    """
+    paper_indices = sorted(i for i in paper_indices if i in data.paper_data)
+    strata = build_strata(paper_indices, size)
+    counts = allocate(strata, size)
+    rng = random.Random(seed)
+    sample = []
+    for key in sorted(strata, key=lambda k: (k[0], k[1] or 0)):
+        sample.extend(rng.sample(strata[key], counts[key]))
+    return sorted(sample), strata
+
+
+class SampleEstimate:
+    """
+    分层估计：比例和总量按各层论文数加权，方差含有限总体校正
+
+    参数:
+        strata: {分层键: [该层全部 paper_index]}
+        records: {paper_index: Y/N日志中的判断记录}（只包含已判断的抽样论文）
+        spent: 抽样运行的实际花费（元，按运行时的价格），推算的费用则一律按标准时段价格
+    """
+
+    def __init__(self, strata, records, spent=0.0):
+        from ..price import price
+
+        self.population = sum(len(indices) for indices in strata.values())
+        self.strata = len(strata)
+        self.judged = len(records)
+        relevant = []
+        tokens = []
+        cost = []
+        latency = []
+        for key, indices in strata.items():
+            stratum_records = [records[i] for i in indices if i in records]
+            if not stratum_records:
+                continue
+            weight = len(indices)
+            relevant.append((weight, [1.0 if r['result'] == 'Y' else 0.0 for r in stratum_records]))
+            tokens.append((weight, [float((r.get('tokens') or {}).get('total', 0)) for r in stratum_records]))
+            cost.append((weight, [price.calculate_token_price(
+                (r.get('tokens') or {}).get('prompt', 0), (r.get('tokens') or {}).get('completion', 0),
+                (r.get('tokens') or {}).get('cache_hit', 0), (r.get('tokens') or {}).get('cache_miss', 0),
+                discount=False) for r in stratum_records]))
+            latency.append((weight, [float(r.get('latency') or 0.0) for r in stratum_records]))
+        # 只统计有判断结果的分层（按这些分层的论文数推算）
+        self.covered = sum(weight for weight, _ in relevant)
+        self.relevant = self._total(relevant)
+        self.tokens = self._total(tokens)
+        self.cost = self._total(cost)
+        total_latency = self._total(latency)
+
+        # 耗时：按抽样运行中实际的并发程度（累计单篇耗时 / 实际经过时间）换算
+        started = [r['started_at'] for r in records.values() if r.get('started_at') is not None]
+        finished = [r['finished_at'] for r in records.values() if r.get('finished_at') is not None]
+        elapsed = max(finished) - min(started) if started and finished else 0.0
+        sample_latency = sum(float(r.get('latency') or 0.0) for r in records.values())
+        concurrency = sample_latency / elapsed if elapsed > 0 and sample_latency > 0 else 1.0
+        self.duration = tuple(value / concurrency for value in total_latency)
+        self.spent = spent
+
+    @staticmethod
+    def _total(groups):
+        """分层总量的估计值和 95% 置信区间 (估计值, 下限, 上限)"""
+        total = 0.0
+        variance = 0.0
+        for weight, values in groups:
+            count = len(values)
+            mean = sum(values) / count
+            total += weight * mean
+            if count > 1 and count < weight:
+                sample_variance = sum((value - mean) ** 2 for value in values) / (count - 1)
+                variance += weight ** 2 * (1 - count / weight) * sample_variance / count
+        margin = Z_95 * math.sqrt(variance)
+        return total, max(0.0, total - margin), total + margin
+
+    def format_lines(self, lang):
+        from ..price import price
+
+        def ratio(value):
+            return value / self.covered * 100 if self.covered else 0
+
+        def hms(seconds):
+            seconds = int(seconds)
+            return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+        relevant, relevant_low, relevant_high = self.relevant
+        return [
+            lang['sample_header'],
+            lang['sample_corpus'].format(population=self.population, strata=self.strata, judged=self.judged,
+                                         cost=price.format_price(self.spent)),
+            lang['sample_relevant'].format(ratio=ratio(relevant), low=ratio(relevant_low), high=ratio(relevant_high),
+                                           count=round(relevant), count_low=round(relevant_low),
+                                           count_high=round(relevant_high)),
+            lang['sample_tokens'].format(tokens=round(self.tokens[0]), low=round(self.tokens[1]), high=round(self.tokens[2])),
+            lang['sample_cost'].format(cost=price.format_price(self.cost[0]), low=price.format_price(self.cost[1]),
+                                       high=price.format_price(self.cost[2])),
+            lang['sample_duration'].format(duration=hms(self.duration[0]), low=hms(self.duration[1]),
+                                           high=hms(self.duration[2])),
+            lang['sample_reuse'].format(count=self.judged) if config.sample_reuse else lang['sample_no_reuse'],
+        ]
+
+
+def run_sample(rq, keywords, requirements, size=None, selected_folders=None, year_range_info=None, seed=None):
+    """
+    抽样运行：从 data.paper_data 中分层抽取 size 篇论文判断，运行结束后输出推算结果
+
+    返回:
+        (本次运行的 Job 对象, SampleEstimate)
+    """
+    from . import accounting
+    from .paper_processor import run_jobs
+
+    size = int(config.sample_size if size is None else size)
+    seed = int(config.sample_seed if seed is None else seed)
+    sample, strata = stratified_sample(data.paper_data, size, seed)
+    job = Job(rq, keywords, requirements, sample, name=SAMPLE_JOB_NAME)
+    job.sample_info = {'size': len(sample), 'seed': seed, 'population': sum(len(v) for v in strata.values()),
+                       'strata': len(strata), 'model': config.model_name}
+    run_jobs([job], selected_folders, year_range_info)
+
+    records = {}
+    for record in verdict_log.iter_verdicts(job.yon_log_file_path):
+        if record.get('result') in ('Y', 'N'):
+            records[record['id']] = record
+    estimate = SampleEstimate(strata, records, accounting.calculate_price(accounting.merge_accounts(job.accounts)))
+    lang = language.get_text(config.LANGUAGE)
+    for line in estimate.format_lines(lang):
+        utils.print_and_log(line)
+    return job, estimate
+
+
+def load_cached(job, log_folder=None):
+    """
+    读取研究问题、关键词、要求和模型都相同的抽样运行的判断结果，按（标题, 来源）对应到本任务的论文
+
+    返回:
+        {paper_index: (判断结果, 理由, 日志文件名)}，同一论文以最近的结果为准
+    """
+    if not config.sample_reuse or job.sample_info is not None:
+        return {}
+    log_folder = log_folder or config.LOG_FOLDER
+    index = {}
+    for paper_index in job.paper_indices:
+        paper = data.paper_data.get(paper_index)
+        if paper is not None:
+            source = f"{paper.get('source_folder', '')}/{paper.get('source_file', '')}"
+            index[(paper['title'], source)] = paper_index
+    cached = {}
+    for path in sorted(glob.glob(os.path.join(log_folder, f'Log_YoN_*_{SAMPLE_JOB_NAME}.jsonl')), key=os.path.getmtime):
+        try:
+            header = verdict_log.read_header(path)
+            sample_info = (header or {}).get(HEADER_FIELD)
+            if not sample_info or sample_info.get('model') != config.model_name or \
+                    header.get('research_question') != job.rq or (header.get('keywords') or '') != (job.keywords or '') or \
+                    (header.get('requirements') or '') != (job.requirements or ''):
+                continue
+            for record in verdict_log.iter_verdicts(path):
+                if record.get('stage') not in REUSABLE_STAGES or record.get('result') not in ('Y', 'N'):
+                    continue
+                paper_index = index.get((record.get('title'), record.get('source')))
+                if paper_index is not None:
+                    cached[paper_index] = (record['result'], record.get('reason', ''), os.path.basename(path))
+        except (OSError, ValueError):
+            # 写入中断或格式错误的日志直接跳过
+            continue
+    return cached
@@ -0,0 +1,213 @@
+import collections
+import threading
+from . import data
+
+# 调度策略
+POLICY_FAIR = 'fair'  # 按权重轮流分配请求，所有任务同时推进
+POLICY_PRIORITY = 'priority'  # 优先级高的任务先处理完，同优先级之间按权重分配
+POLICIES = (POLICY_FAIR, POLICY_PRIORITY)
+
+
+# 任务阶段
+STAGE_TITLE = 'title'  # 标题初筛（一次请求包含一批标题）
+STAGE_FULL = 'full'  # 标题+摘要的完整判断
+STAGE_TITLE_ONLY = 'title_only'  # 缺少摘要等条目只根据标题判断（一次请求包含一批标题，结果即最终判断）
+
+
+class JobScheduler:
+    """
+    多任务调度器：所有工作线程从这里领取下一项工作
+
+    每次领取时在有剩余论文的任务中选择“已分配数 / 权重”最小的一个（加权公平分配）；
+    priority 策略下只在优先级最高的任务中选择。每次领取只持有一次锁，
+    与单篇论文数秒的API耗时相比开销可以忽略。
+
+    启用标题初筛（title_batch_size > 0）时，每个任务的论文先按批领取做标题初筛，
+    初筛为“可能相关”的论文由 finish_title_batch 放回调度器，再领取做完整判断；
+    完整判断优先于新的初筛批次，使结果尽早写出。
+
+    各任务的 title_only_papers（条目质量检查后只根据标题判断的论文）按 title_only_batch_size 一批领取，
+    在新的论文之前分配；请求出错的批次由 finish_title_batch 放回做完整判断。
+
+    参数:
+        jobs: Job 列表
+        policy: 'fair' 或 'priority'
+        title_batch_size: 每次标题初筛的论文数，0 表示不初筛
+        title_only_batch_size: 每次只根据标题判断的论文数
+    """
+
+    def __init__(self, jobs, policy=POLICY_FAIR, title_batch_size=0, title_only_batch_size=0):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown scheduling policy: {policy}")
+        self.jobs = list(jobs)
+        self.policy = policy
+        self.title_batch_size = max(0, int(title_batch_size))
+        self.title_only_batch_size = max(1, int(title_only_batch_size))
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._titles_in_flight = 0
+        self._stopped = False
+        for order, job in enumerate(self.jobs):
+            job.order = order
+            job.full_dispatched = 0
+            job.maybe_papers = collections.deque()
+            job.title_only_position = 0
+
+    @property
+    def total(self):
+        return sum(job.total for job in self.jobs)
+
+    def stop(self):
+        """停止分配新的论文（正在处理的论文会继续完成）"""
+        self._stopped = True
+        with self._changed:
+            self._changed.notify_all()
+
+    def stopped(self):
+        # 界面点击“停止”时会设置 progress_stop_event
+        return self._stopped or data.progress_stop_event.is_set()
+
+    def _pick(self, candidates, dispatched):
+        if self.policy == POLICY_PRIORITY:
+            top = max(job.priority for job in candidates)
+            candidates = [job for job in candidates if job.priority == top]
+        return min(candidates, key=lambda j: (dispatched(j) / j.weight, j.order))
+
+    def next_task(self):
+        """
+        领取下一项工作
+
+        返回:
+            (STAGE_FULL, job, paper_index)、(STAGE_TITLE, job, [paper_index, ...]) 或 (STAGE_TITLE_ONLY, job, [paper_index, ...])；
+            没有剩余工作或已停止时返回 None
+        """
+        with self._changed:
+            while not self.stopped():
+                # 已通过初筛的论文优先做完整判断
+                waiting = [job for job in self.jobs if job.maybe_papers]
+                if waiting:
+                    job = self._pick(waiting, lambda j: j.full_dispatched)
+                    job.full_dispatched += 1
+                    return STAGE_FULL, job, job.maybe_papers.popleft()
+
+                title_only = [job for job in self.jobs if job.title_only_position < len(job.title_only_papers)]
+                if title_only:
+                    job = self._pick(title_only, lambda j: j.title_only_position)
+                    batch = job.title_only_papers[job.title_only_position:job.title_only_position + self.title_only_batch_size]
+                    job.title_only_position += len(batch)
+                    self._titles_in_flight += 1
+                    return STAGE_TITLE_ONLY, job, batch
+
+                candidates = [job for job in self.jobs if job.remaining > 0]
+                if candidates:
+                    job = self._pick(candidates, lambda j: j.next_position)
+                    if not self.title_batch_size:
+                        paper_index = job.paper_indices[job.next_position]
+                        job.next_position += 1
+                        job.full_dispatched += 1
+                        return STAGE_FULL, job, paper_index
+                    batch = job.paper_indices[job.next_position:job.next_position + self.title_batch_size]
+                    job.next_position += len(batch)
+                    self._titles_in_flight += 1
+                    return STAGE_TITLE, job, batch
+
+                # 还有初筛批次在处理中，它们可能产生新的完整判断任务
+                if not self._titles_in_flight:
+                    return None
+                self._changed.wait(0.5)
+        return None
+
+    def undispatched(self):
+        """
+        尚未分配的论文（停止后调用）
+
+        返回:
+            {job: [paper_index, ...]}，包含已通过初筛、尚未完整判断的论文
+        """
+        with self._changed:
+            return {job: list(job.maybe_papers) + job.title_only_papers[job.title_only_position:] +
+                    job.paper_indices[job.next_position:] for job in self.jobs}
+
+    def finish_title_batch(self, job, maybe_papers, rejected, uncertain=0):
+        """
+        提交一个初筛批次的结果：maybe_papers 为需要完整判断的论文，rejected 为明显无关的论文数，
+        uncertain 为只根据标题判断为可能相关、待人工确认的论文数
+        """
+        with self._changed:
+            job.maybe_papers.extend(maybe_papers)
+            job.title_rejected += rejected
+            job.title_only_uncertain += uncertain
+            self._titles_in_flight -= 1
+            self._changed.notify_all()
+
+
+class PaperQueue:
+    """
+    多问题模式的调度器：按论文分配，每次领取一篇论文以及包含它的所有任务
+
+    各任务的论文列表可以不同（folders / limit），同一篇论文只发送一次请求。
+
+    参数:
+        jobs: Job 列表
+    """
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        jobs_by_paper = {}
+        for order, job in enumerate(self.jobs):
+            job.order = order
+            for paper_index in job.paper_indices:
+                jobs_by_paper.setdefault(paper_index, []).append(job)
+        self._tasks = sorted(jobs_by_paper.items())
+        self._position = 0
+        self._lock = threading.Lock()
+        self._stopped = False
+
+    @property
+    def papers(self):
+        """需要发送请求的论文数"""
+        return len(self._tasks)
+
+    @property
+    def total(self):
+        """（论文, 问题）组合数"""
+        return sum(job.total for job in self.jobs)
+
+    def stop(self):
+        """停止分配新的论文（正在处理的论文会继续完成）"""
+        self._stopped = True
+
+    def stopped(self):
+        return self._stopped or data.progress_stop_event.is_set()
+
+    def undispatched(self):
+        """
+        尚未分配的论文（停止后调用）
+
+        返回:
+            {job: [paper_index, ...]}
+        """
+        result = {job: [] for job in self.jobs}
+        with self._lock:
+            for paper_index, jobs in self._tasks[self._position:]:
+                for job in jobs:
+                    result[job].append(paper_index)
+        return result
+
+    def next_task(self):
+        """
+        领取下一篇论文
+
+        返回:
+            (jobs, paper_index)，没有剩余论文或已停止时返回 None
+        """
+        if self.stopped():
+            return None
+        with self._lock:
+            if self._position >= len(self._tasks):
+                return None
+            paper_index, jobs = self._tasks[self._position]
+            self._position += 1
+            for job in jobs:
+                job.next_position += 1
+        return jobs, paper_index
@@ -1,60 +1,141 @@
-from openai import OpenAI
 import time
+import threading
 from ..config import config_loader as config
 import sys
 from ..log import utils
+from ..log import tracing
+from . import cassette
+from . import prompt_budget
+from . import streaming
 import json
+import re
 from language import language
 
-def check_paper_relevance(research_direction, keywords, requirements, paper_title, paper_abstract, api_key=None):    
-    # 记录API调用开始时间
-    api_start_time = time.time()
-    
-    # 从config导入系统提示词并根据当前语言设置填充占位符
-    lang_text = language.get_text(config.LANGUAGE)
+# OpenAI 客户端缓存：同一密钥和服务地址复用同一个客户端（连接池），openai 在首次请求时才导入
+_clients = {}
+_clients_lock = threading.Lock()
+
+def _get_client(api_key):
+    """获取（必要时创建）指定API密钥对应的OpenAI客户端"""
+    cache_key = (api_key, config.api_base_url)
+    client = _clients.get(cache_key)
+    if client is None:
+        from openai import OpenAI
+        with _clients_lock:
+            client = _clients.get(cache_key)
+            if client is None:
+                client = _clients[cache_key] = OpenAI(api_key=api_key, base_url=config.api_base_url)
+    return client
+
+# 多问题模式追加在系统提示词之后的说明（问题编号为 Q1、Q2……）
+MULTI_QUESTION_INSTRUCTION = """
+
+本次需要同时判断多个研究主题，编号为 Q1、Q2……，每个主题有各自的#要求#和#关键词#。
+请按上面的判断标准对每个主题分别独立判断，输出一个JSON对象，键为主题编号，值为该主题的判断结果，必须包含所有编号：
+{
+    "Q1": {"relevant": "Y", "reason": "..."},
+    "Q2": {"relevant": "N", "reason": "..."}
+}"""
+
+# 级联判断时追加在初筛模型系统提示词之后的说明
+CONFIDENCE_INSTRUCTION = """
+
+另外，请在JSON中增加 confidence 字段（0到1之间的小数），表示你对本次判断的把握程度，例如 "confidence": 0.9。
+摘要信息不足、处于相关与不相关边界的论文请给出较低的置信度。"""
+
+# 精简响应模式追加在系统提示词之后的说明（config.compact_response）：不相关的论文不输出理由
+COMPACT_INSTRUCTION = """
+
+精简输出：判断为不相关（"N"）时只输出 {"relevant": "N"}，不要输出 reason 字段；判断为相关时照常输出 reason。"""
+
+# 同时开启 config.compact_lazy_reasons 时的说明：所有论文都不输出理由，相关论文的理由由补充请求获取
+COMPACT_LAZY_INSTRUCTION = """
+
+精简输出：只输出 relevant 字段，不要输出 reason 字段，例如 {"relevant": "Y"}。"""
+
+# 多问题模式的精简说明
+COMPACT_MULTI_INSTRUCTION = """
+
+精简输出：判断为不相关（"N"）的主题只输出 {"relevant": "N"}，不要输出 reason 字段；判断为相关的主题照常输出 reason。"""
+
+# 补充理由请求中追加的用户消息
+REASON_REQUEST = """#补充理由#：请给出上面判断为相关的理由，以JSON格式输出 {"reason": "..."}，reason 必须是一句简短精炼的理由。"""
+
+# 只输出判断结果（以及级联初筛的置信度）时的 max_tokens
+VERDICT_MAX_TOKENS = 32
+
+# 输出被 max_tokens 截断、JSON 不完整时，从中找回判断结果
+_RELEVANT_RE = re.compile(r'"relevant"\s*:\s*"([YNyn])"')
+
+# 标题初筛的系统提示词（一次请求判断一批标题，编号为 T1、T2……）
+TITLE_SCREEN_PROMPT = """你是一个学术论文初筛助手。用户会给出研究主题和一批论文标题，你需要只根据标题排除明显与研究主题无关的论文。
+
+判断标准：
+- 只有仅凭标题就能确定论文与研究主题、要求和关键词都无关时，才标记为 "N"（明显无关）
+- 只要标题有可能与研究主题相关，或者标题信息不足以判断，都标记为 "M"（可能相关），交给后续结合摘要的判断
+
+你必须以JSON格式输出，键为标题编号，值为 "N" 或 "M"，必须包含所有编号，例如：
+{
+    "T1": "N",
+    "T2": "M"
+}"""
+
+# 标题初筛的标签
+TITLE_IRRELEVANT = 'N'
+TITLE_MAYBE = 'M'
+
+def _build_system_prompt():
+    """根据当前语言设置填充系统提示词中的占位符"""
     if config.LANGUAGE == 'en_US':
         language_name = "English"
     else:
         language_name = "中文"
-    
-    system_prompt = config.system_prompt.replace("{language}", language_name)
-    
-    # 构建user_prompt，根据配置决定是否包含关键词和要求
-    user_prompt = f"""#研究主题#：{research_direction}
-"""
-    
-    # 根据配置决定是否添加要求
-    #if config.include_requirements_in_prompt and requirements:
-    user_prompt += f"""#要求#：{requirements}
+    return config.system_prompt.replace("{language}", language_name)
 
-"""
-    
-    # 根据配置决定是否添加关键词
-    #if config.include_keywords_in_prompt:
-    user_prompt += f"""#关键词#：{keywords}
+def _is_reasoner(model):
+    """推理模型的 max_tokens 包含思维链，不设上限，也不使用补充理由请求（再次请求会重新推理）"""
+    return 'reasoner' in (model or config.model_name)
 
-"""
-    
-    # 始终包含论文标题和摘要
-    user_prompt += f"""#论文标题#：{paper_title}
+def _lazy_reasons(model):
+    """判断请求是否省略相关论文的理由（之后由 fetch_reason 补充）"""
+    return bool(config.compact_response and config.compact_lazy_reasons) and not _is_reasoner(model)
 
-#论文摘要#：{paper_abstract}
-"""
-    # 使用DeepSeek API进行模型调用
+def _compact_instruction(model):
+    """精简响应模式追加的说明，未启用时为空"""
+    if not config.compact_response:
+        return ''
+    return COMPACT_LAZY_INSTRUCTION if _lazy_reasons(model) else COMPACT_INSTRUCTION
+
+def _judge_system_prompt(model, extra_instruction=''):
+    """单个研究主题判断请求的系统提示词（补充理由请求沿用同一提示词以命中前缀缓存）"""
+    return _build_system_prompt() + extra_instruction + _compact_instruction(model)
+
+def _judge_max_tokens(model):
+    """精简响应模式下判断请求的 max_tokens，未启用或推理模型时为 None（不限制）"""
+    if not config.compact_response or _is_reasoner(model):
+        return None
+    return VERDICT_MAX_TOKENS if _lazy_reasons(model) else int(config.reason_max_tokens)
+
+def _require_api_key(api_key):
     # 如果没有传入api_key，报错并终止程序
     if api_key is None:
         lang = language.get_text(config.LANGUAGE)
         utils.print_and_log(lang['api_key_not_provided'])
         utils.print_and_log(lang['api_key_usage_hint'])
         sys.exit(1)
-        
-    client = OpenAI(
-        api_key=api_key, 
-        base_url=config.api_base_url
-        )
-    
-    response = client.chat.completions.create(
-        model=config.model_name,
+
+def _build_request(system_prompt, user_prompt, model=None, max_tokens=None, followup=()):
+    """
+    构建请求参数
+
+    参数:
+        max_tokens: 输出token上限，None 时不设置
+        followup: 追加在用户消息之后的消息（补充理由请求中的上一轮回答和追问）
+    """
+    model = model or config.model_name
+    stream = streaming.enabled(model)
+    request = dict(
+        model=model,
         messages=[
             {
                 'role': 'system',
@@ -64,70 +145,109 @@ def check_paper_relevance(research_direction, keywords, requirements, paper_titl
                 'role': 'user',
                 'content': user_prompt
             },
-        ],
-        stream=False,  # 不使用流式响应
+        ] + list(followup),
+        stream=stream,  # 推理模型使用流式响应（见 streaming.consume），其余模型不使用
         temperature=1.0,
         response_format={
             'type': 'json_object'
         }
     )
+    if stream:
+        request['stream_options'] = {'include_usage': True}
+    if max_tokens:
+        request['max_tokens'] = max_tokens
+    return request
+
+def _send_request(request, api_key):
+    """发送请求并返回响应；回放模式直接从磁带读取响应，不访问网络；录制模式在真实请求后写入磁带"""
+    recorder = cassette.get_cassette()
+    if recorder is not None and recorder.mode == cassette.MODE_REPLAY:
+        with tracing.span('network'):
+            return recorder.replay(request)
     
-    # 提取结果并清理
-    response_text = response.choices[0].message.content.strip()
-    # print(f"  ********************** 模型返回内容: {response_text} **********************")
+    client = _get_client(api_key)
+    
+    network_start = time.perf_counter()
+    with tracing.span('network'):
+        response = client.chat.completions.create(**request)
+        if request.get('stream'):
+            try:
+                response = streaming.consume(response, request['model'], network_start)
+            except streaming.ReasoningLimitExceeded as e:
+                # 中止的请求没有 usage，输入token在本地统计，供调用方记账
+                e.prompt_tokens = prompt_budget.count_tokens(''.join(m['content'] for m in request['messages']))
+                raise
+    if recorder is not None:
+        recorder.record(request, response, time.perf_counter() - network_start)
+    return response
 
-    # response_text变量只保留"</think>"之后的内容
+def _response_text(response):
+    """提取模型返回内容，只保留"</think>"之后的部分"""
+    response_text = response.choices[0].message.content.strip()
     if '</think>' in response_text:
         # 找到 </think> 的位置并截取之后的内容
         think_end_index = response_text.find('</think>')
         response_text = response_text[think_end_index + len('</think>'):].strip()
+    return response_text
+
+def _parse_verdict(json_response, response_text):
+    """
+    从单个判断结果对象中提取相关性和原因
     
-    # 解析JSON结果
+    精简响应模式下允许省略的理由返回空字符串，不输出缺少 reason 的提示。
+    
+    返回:
+        (result, reason)，result 为 'Y' 或 'N'
+    """
     result = ''
     reason = ''
+    if not isinstance(json_response, dict):
+        json_response = {}
     
-    try:
-        # 解析JSON响应
-        json_response = json.loads(response_text)
-        
-        # 提取相关性判断结果
-        if 'relevant' in json_response:
-            result = json_response['relevant'].upper()
-            if result not in ['Y', 'N']:
-                lang = language.get_text(config.LANGUAGE)
-                utils.print_and_log(lang['unexpected_relevant_value'].format(result=result))
-                result = 'N'
-        else:
+    # 提取相关性判断结果
+    if 'relevant' in json_response:
+        result = str(json_response['relevant']).upper()
+        if result not in ['Y', 'N']:
             lang = language.get_text(config.LANGUAGE)
-            utils.print_and_log(lang['missing_relevant_field'].format(response=response_text))
+            utils.print_and_log(lang['unexpected_relevant_value'].format(result=result))
             result = 'N'
-        
-        # 提取原因
-        if 'reason' in json_response:
-            reason = json_response['reason']
-            # 根据结果类型添加前缀
-            if result == 'Y':
-                reason = f"相关原因：{reason}"
-            else:
-                reason = f"不相关原因：{reason}"
-        else:
-            lang = language.get_text(config.LANGUAGE)
-            utils.print_and_log(lang['missing_reason_field'])
-            
-    except json.JSONDecodeError as e:
+    else:
         lang = language.get_text(config.LANGUAGE)
-        utils.print_and_log(lang['json_parse_error'].format(error=e))
-        utils.print_and_log(lang['original_response'].format(response=response_text))
+        utils.print_and_log(lang['missing_relevant_field'].format(response=response_text))
         result = 'N'
-        reason = "不相关原因：模型响应格式错误"
     
-    # DeepSeek API返回的token信息
-    tokens = 0
-    prompt_tokens = 0
-    completion_tokens = 0
-    cache_hit_tokens = 0
-    cache_miss_tokens = 0
+    # 提取原因
+    if 'reason' in json_response:
+        reason = json_response['reason']
+        # 根据结果类型添加前缀
+        if result == 'Y':
+            reason = f"相关原因：{reason}"
+        else:
+            reason = f"不相关原因：{reason}"
+    elif not config.compact_response:
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(lang['missing_reason_field'])
+    return result, reason
+
+def _parse_confidence(json_response):
+    """提取 confidence 字段并限制在 0~1 之间，缺失或无法解析时返回 0（视为没有把握）"""
+    if not isinstance(json_response, dict):
+        return 0.0
+    try:
+        confidence = float(json_response.get('confidence', 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+    if confidence != confidence:  # NaN
+        return 0.0
+    return min(1.0, max(0.0, confidence))
+
+def _token_usage(response, prompt_text, response_text):
+    """
+    读取响应中的token信息，响应中没有usage时在本地统计
     
+    返回:
+        (tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens)
+    """
     if hasattr(response, 'usage'):
         # 使用总token数（prompt_tokens + completion_tokens）
         tokens = response.usage.total_tokens
@@ -138,14 +258,320 @@ def check_paper_relevance(research_direction, keywords, requirements, paper_titl
         cache_hit_tokens = getattr(response.usage, 'prompt_cache_hit_tokens', 0)
         cache_miss_tokens = getattr(response.usage, 'prompt_cache_miss_tokens', 0)
     else:
-        # 如果没有usage信息，使用估算值, 1 个英文字符 ≈ 0.3 个 token，1 个中文字符 ≈ 0.6 个 token
+        # 如果没有usage信息，用本地分词器（未配置时按字符比例估算）分别统计输入和输出
         lang = language.get_text(config.LANGUAGE)
         utils.print_and_log(lang['no_token_info'])
-        total_chars = len(system_prompt + user_prompt + response_text)
-        tokens = int(total_chars * 0.6)  # 假设平均每个字符占0.6个token
-        # 估算输入输出比例（假设输入占80%，输出占20%）
-        prompt_tokens = int(tokens * 0.8)
-        completion_tokens = tokens - prompt_tokens
+        prompt_tokens = prompt_budget.count_tokens(prompt_text)
+        completion_tokens = prompt_budget.count_tokens(response_text)
+        tokens = prompt_tokens + completion_tokens
+        cache_hit_tokens = 0
         cache_miss_tokens = prompt_tokens  # 估算时假设全部未命中
+    return tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens
+
+def _build_question_header(research_direction, keywords, requirements, number=''):
+    """
+    研究主题部分的提示词，按 include_requirements_in_prompt / include_keywords_in_prompt 决定是否包含要求和关键词
+
+    参数:
+        number: 多问题模式中的主题编号（如 "Q1"），单个主题时为空
+    """
+    tag = f" {number}" if number else ''
+    separator = '\n' if number else '\n\n'
+    header = f"#研究主题{tag}#：{research_direction}\n"
+    if config.include_requirements_in_prompt and requirements:
+        header += f"#要求{tag}#：{requirements}{separator}"
+    if config.include_keywords_in_prompt:
+        header += f"#关键词{tag}#：{keywords}{separator}"
+    if number:
+        header += '\n'
+    return header
+
+def _build_paper_block(paper_title, paper_abstract):
+    return f"""#论文标题#：{paper_title}
+
+#论文摘要#：{paper_abstract}
+"""
+
+class PromptTemplate:
+    """
+    编译后的提示词模板：每次运行每种请求只构建一次
+
+    system 和 prefix（研究主题、要求、关键词）在同一次运行中逐字节相同，每篇论文只在末尾追加自己的内容，
+    服务端的前缀缓存可以命中除论文以外的全部内容（DeepSeek 按 64 token 为单位缓存前缀）。
+    """
+    __slots__ = ('system', 'prefix', 'overhead_tokens')
+
+    def __init__(self, system, prefix, suffix_template=''):
+        self.system = system
+        self.prefix = prefix
+        # 提示词中除论文内容以外部分的token数（suffix_template 为论文内容为空时的固定部分）
+        self.overhead_tokens = prompt_budget.count_tokens(system) + prompt_budget.count_tokens(prefix + suffix_template)
+
+    def render(self, paper_text):
+        """返回完整的用户消息"""
+        return self.prefix + paper_text
+
+class MultiPromptTemplate(PromptTemplate):
+    """多问题模式的模板，另外记录各主题片段的token数，用于估算每个主题单独请求时的输入token"""
+    __slots__ = ('question_tokens', 'instruction_tokens')
+
+    def __init__(self, system, question_blocks):
+        super().__init__(system, ''.join(question_blocks), _build_paper_block('', ''))
+        self.question_tokens = [prompt_budget.count_tokens(block) for block in question_blocks]
+        self.instruction_tokens = prompt_budget.count_tokens(MULTI_QUESTION_INSTRUCTION)
+
+# 本次运行已编译的模板，运行开始时由 reset_templates 清空（配置在此时读取）
+_templates = {}
+
+def reset_templates():
+    """清空已编译的模板，在每次运行开始前调用，使修改后的提示词和配置生效"""
+    _templates.clear()
+
+def compile_template(research_direction, keywords, requirements, model=None, extra_instruction=''):
+    """单个研究主题判断请求的模板（补充理由请求沿用同一模板）"""
+    key = ('judge', research_direction, keywords, requirements, model or config.model_name, extra_instruction)
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = PromptTemplate(
+            _judge_system_prompt(model, extra_instruction),
+            _build_question_header(research_direction, keywords, requirements),
+            _build_paper_block('', ''))
+    return template
+
+def compile_multi_template(questions):
+    """多问题模式的模板，questions 为 [(研究主题, 关键词, 要求), ...]，按顺序编号为 Q1、Q2……"""
+    key = ('multi', tuple(questions))
+    template = _templates.get(key)
+    if template is None:
+        system = _build_system_prompt() + MULTI_QUESTION_INSTRUCTION + (
+            COMPACT_MULTI_INSTRUCTION if config.compact_response else '')
+        template = _templates[key] = MultiPromptTemplate(system, _build_question_blocks(questions))
+    return template
+
+def compile_title_template(research_direction, keywords, requirements):
+    """标题初筛请求的模板"""
+    key = ('title', research_direction, keywords, requirements)
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = PromptTemplate(
+            TITLE_SCREEN_PROMPT,
+            _build_question_header(research_direction, keywords, requirements) + "#论文标题#：\n")
+    return template
+
+def _build_question_blocks(questions):
+    """多问题模式中每个研究主题的提示词片段，按顺序编号为 Q1、Q2……"""
+    return [_build_question_header(research_direction, keywords, requirements, f"Q{number}")
+            for number, (research_direction, keywords, requirements) in enumerate(questions, 1)]
+
+def prompt_overhead_tokens(research_direction, keywords, requirements):
+    """提示词中除论文标题和摘要以外部分的token数，用于计算摘要的token预算"""
+    return compile_template(research_direction, keywords, requirements).overhead_tokens
+
+def prompt_overhead_tokens_multi(questions):
+    """多问题模式下提示词中除论文标题和摘要以外部分的token数"""
+    return compile_multi_template(questions).overhead_tokens
+
+def check_paper_relevance(research_direction, keywords, requirements, paper_title, paper_abstract, api_key=None, model=None):    
+    """
+    判断论文与研究主题的相关性
+    
+    参数:
+        model: 使用的模型，默认为 config.model_name
+    
+    返回:
+        (result, tokens, reason, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens)
+    """
+    return _check_paper_relevance(research_direction, keywords, requirements, paper_title, paper_abstract,
+                                  api_key, model)[:7]
+
+def check_paper_relevance_with_confidence(research_direction, keywords, requirements, paper_title, paper_abstract,
+                                          api_key=None, model=None):
+    """
+    判断论文相关性，并要求模型给出置信度（用于级联判断的初筛）
+    
+    返回:
+        (result, tokens, reason, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens, confidence)
+        响应格式错误时 confidence 为 0
+    """
+    result = _check_paper_relevance(research_direction, keywords, requirements, paper_title, paper_abstract,
+                                    api_key, model, CONFIDENCE_INSTRUCTION)
+    return result[:7] + (_parse_confidence(result[7]),)
+
+def _check_paper_relevance(research_direction, keywords, requirements, paper_title, paper_abstract, api_key,
+                           model=None, extra_instruction=''):
+    prompt_build_start = time.perf_counter()
+    
+    # 运行中编译一次的模板：系统提示词和研究主题部分逐字节相同，只追加论文标题和摘要
+    template = compile_template(research_direction, keywords, requirements, model, extra_instruction)
+    system_prompt = template.system
+    user_prompt = template.render(_build_paper_block(paper_title, paper_abstract))
+    tracing.record('prompt_build', time.perf_counter() - prompt_build_start)
+    
+    # 使用DeepSeek API进行模型调用
+    _require_api_key(api_key)
+    response = _send_request(_build_request(system_prompt, user_prompt, model, _judge_max_tokens(model)), api_key)
+    
+    # 提取结果并清理
+    json_parse_start = time.perf_counter()
+    response_text = _response_text(response)
+    
+    # 解析JSON结果
+    json_response = None
+    try:
+        json_response = json.loads(response_text)
+        result, reason = _parse_verdict(json_response, response_text)
+    except json.JSONDecodeError as e:
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(lang['json_parse_error'].format(error=e))
+        utils.print_and_log(lang['original_response'].format(response=response_text))
+        # 理由被 max_tokens 截断时判断结果通常已经完整输出
+        match = _RELEVANT_RE.search(response_text)
+        if match:
+            result = match.group(1).upper()
+            reason = ''
+        else:
+            result = 'N'
+            reason = "不相关原因：模型响应格式错误"
+    tracing.record('json_parse', time.perf_counter() - json_parse_start)
+    
+    # DeepSeek API返回的token信息
+    tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens = _token_usage(
+        response, system_prompt + user_prompt, response_text)
+    
+    return result, tokens, reason, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens, json_response
+
+def needs_reason(result, reason, model=None):
+    """精简响应模式下判断请求省略了相关论文的理由，需要用 fetch_reason 补充"""
+    return result == 'Y' and not reason and _lazy_reasons(model)
+
+def fetch_reason(research_direction, keywords, requirements, paper_title, paper_abstract, api_key=None, model=None,
+                 extra_instruction=''):
+    """
+    补充理由：为精简响应模式下判断为相关的论文请求理由
+    
+    沿用判断请求的系统提示词和用户消息（命中前缀缓存），追加上一轮的判断结果和补充理由的要求。
+    
+    参数:
+        model, extra_instruction: 与判断请求相同
+    
+    返回:
+        (reason, tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens)
+    """
+    template = compile_template(research_direction, keywords, requirements, model, extra_instruction)
+    system_prompt = template.system
+    user_prompt = template.render(_build_paper_block(paper_title, paper_abstract))
+    followup = [
+        {'role': 'assistant', 'content': json.dumps({'relevant': 'Y'})},
+        {'role': 'user', 'content': REASON_REQUEST},
+    ]
+    
+    _require_api_key(api_key)
+    response = _send_request(_build_request(system_prompt, user_prompt, model, int(config.reason_max_tokens), followup),
+                             api_key)
+    
+    json_parse_start = time.perf_counter()
+    response_text = _response_text(response)
+    try:
+        json_response = json.loads(response_text)
+    except json.JSONDecodeError:
+        # 理由被截断时保留已输出的部分
+        json_response = {'reason': response_text.split(':', 1)[-1].strip(' "{}\n')}
+    reason = json_response.get('reason', '') if isinstance(json_response, dict) else ''
+    tracing.record('json_parse', time.perf_counter() - json_parse_start)
+    
+    tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens = _token_usage(
+        response, system_prompt + user_prompt + REASON_REQUEST, response_text)
+    return (f"相关原因：{reason}" if reason else ''), tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens
+
+def check_paper_relevance_multi(questions, paper_title, paper_abstract, api_key=None):
+    """
+    一次请求同时判断论文与多个研究主题的相关性（论文标题和摘要只发送一次）
+    
+    参数:
+        questions: [(研究主题, 关键词, 要求), ...]，按顺序编号为 Q1、Q2……
+    
+    返回:
+        (verdicts, tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens, separate_prompt_tokens)
+        verdicts 为与 questions 对应的 [(result, reason), ...]；
+        separate_prompt_tokens 为每个主题单独发送请求时输入token数的估算值
+    """
+    prompt_build_start = time.perf_counter()
+    template = compile_multi_template(questions)
+    system_prompt = template.system
+    user_prompt = template.render(_build_paper_block(paper_title, paper_abstract))
+    tracing.record('prompt_build', time.perf_counter() - prompt_build_start)
+    
+    _require_api_key(api_key)
+    response = _send_request(_build_request(system_prompt, user_prompt), api_key)
+    
+    json_parse_start = time.perf_counter()
+    response_text = _response_text(response)
+    verdicts = []
+    try:
+        json_response = json.loads(response_text)
+        if not isinstance(json_response, dict):
+            json_response = {}
+        for number in range(1, len(questions) + 1):
+            question_id = f"Q{number}"
+            if question_id in json_response:
+                verdicts.append(_parse_verdict(json_response[question_id], response_text))
+            else:
+                lang = language.get_text(config.LANGUAGE)
+                utils.print_and_log(lang['missing_question_verdict'].format(question=question_id, response=response_text))
+                verdicts.append(('N', "不相关原因：模型未返回该主题的判断"))
+    except json.JSONDecodeError as e:
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(lang['json_parse_error'].format(error=e))
+        utils.print_and_log(lang['original_response'].format(response=response_text))
+        verdicts = [('N', "不相关原因：模型响应格式错误")] * len(questions)
+    tracing.record('json_parse', time.perf_counter() - json_parse_start)
+    
+    tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens = _token_usage(
+        response, system_prompt + user_prompt, response_text)
+    
+    # 单独运行时每个请求都要发送一遍共享部分（系统提示词和论文），但不需要多问题说明
+    shared_tokens = max(0, prompt_tokens - sum(template.question_tokens) - template.instruction_tokens)
+    separate_prompt_tokens = [shared_tokens + q for q in template.question_tokens]
+    
+    return verdicts, tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens, separate_prompt_tokens
+
+def screen_titles(research_direction, keywords, requirements, paper_titles, api_key=None):
+    """
+    标题初筛：一次请求判断一批论文标题是否明显与研究主题无关
+    
+    参数:
+        paper_titles: 论文标题列表，按顺序编号为 T1、T2……
+    
+    返回:
+        (labels, tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens)
+        labels 为与 paper_titles 对应的 TITLE_IRRELEVANT / TITLE_MAYBE；
+        缺失或无法识别的标签按 TITLE_MAYBE 处理（交给完整判断，不会漏掉论文）
+    """
+    prompt_build_start = time.perf_counter()
+    template = compile_title_template(research_direction, keywords, requirements)
+    user_prompt = template.render(''.join(f"T{number}: {title}\n" for number, title in enumerate(paper_titles, 1)))
+    tracing.record('prompt_build', time.perf_counter() - prompt_build_start)
+    
+    _require_api_key(api_key)
+    response = _send_request(_build_request(template.system, user_prompt), api_key)
+    
+    json_parse_start = time.perf_counter()
+    response_text = _response_text(response)
+    try:
+        json_response = json.loads(response_text)
+    except json.JSONDecodeError as e:
+        lang = language.get_text(config.LANGUAGE)
+        utils.print_and_log(lang['json_parse_error'].format(error=e))
+        utils.print_and_log(lang['original_response'].format(response=response_text))
+        json_response = {}
+    if not isinstance(json_response, dict):
+        json_response = {}
+    labels = []
+    for number in range(1, len(paper_titles) + 1):
+        label = str(json_response.get(f"T{number}", TITLE_MAYBE)).strip().upper()
+        labels.append(TITLE_IRRELEVANT if label == TITLE_IRRELEVANT else TITLE_MAYBE)
+    tracing.record('json_parse', time.perf_counter() - json_parse_start)
     
-    return result, tokens, reason, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens  # 返回相关原因
\ No newline at end of file
+    tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens = _token_usage(
+        response, template.system + user_prompt, response_text)
+    return labels, tokens, prompt_tokens, completion_tokens, cache_hit_tokens, cache_miss_tokens
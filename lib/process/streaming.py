@@ -0,0 +1,248 @@
+"""
+推理模型的流式响应：逐块读取响应，推理内容只计数不保存，判断结果的 JSON 一完整就解析
+
+推理内容超出 config.reasoning_token_cap 时立即关闭连接，不再等待（也不再为之付费）。
+返回与非流式响应结构相同的对象，磁带录制和后续解析不需要区分两种请求。
+"""
+import threading
+import time
+from types import SimpleNamespace
+from . import data
+from . import accounting
+from ..log import tracing
+from ..config import config_loader as config
+
+# 内容中以 <think>...</think> 形式返回推理过程时的标记
+THINK_START = '<think>'
+THINK_END = '</think>'
+# 推理内容每累计到该字符数估算一次token（逐块估算时取整误差较大），缓冲区大小固定
+COUNT_CHARS = 256
+
+# 每个工作线程自己的统计对象，通过 threading.local 找到
+_local = threading.local()
+
+
+class ReasoningLimitExceeded(Exception):
+    """
+    推理内容超出 config.reasoning_token_cap，请求已中止
+
+    属性:
+        model: 请求的模型
+        reasoning_tokens: 中止前收到的推理token数（估算，按输出token计费）
+        prompt_tokens: 输入token数（由发起请求的函数在本地统计后填入）
+    """
+
+    def __init__(self, model, reasoning_tokens):
+        super().__init__(f"{model} 推理内容超出 {config.reasoning_token_cap} token 上限，已中止")
+        self.model = model
+        self.reasoning_tokens = reasoning_tokens
+        self.prompt_tokens = 0
+
+
+class StreamStats:
+    """
+    单个工作线程的流式请求统计
+
+    只由所属线程写入，运行结束后用 merge_stats 合并。
+    """
+    __slots__ = ('requests', 'reasoning_tokens', 'capped', 'time_to_verdict', 'latency')
+
+    def __init__(self):
+        self.requests = 0  # 流式请求数（含中止的请求）
+        self.reasoning_tokens = 0  # 丢弃的推理内容token数（估算，含中止的请求）
+        self.capped = 0  # 其中推理超出上限而中止的请求数
+        self.time_to_verdict = 0.0  # 完成的请求从发送到判断结果完整的累计耗时（秒）
+        self.latency = 0.0  # 完成的请求从发送到响应结束的累计耗时（秒）
+
+
+def enabled(model):
+    """该模型的请求是否使用流式响应"""
+    return bool(config.stream_reasoner) and 'reasoner' in (model or config.model_name)
+
+
+def reset_stats():
+    """清空统计，在每次运行开始前调用"""
+    with data.token_lock:
+        data.stream_stats = []
+
+
+def _get_stats():
+    # 每次运行开始后（progress_generation 变化）重新注册
+    stats = getattr(_local, 'stats', None)
+    if stats is None or getattr(_local, 'generation', None) != data.progress_generation:
+        stats = StreamStats()
+        with data.token_lock:
+            data.stream_stats.append(stats)
+        _local.stats = stats
+        _local.generation = data.progress_generation
+    return stats
+
+
+def merge_stats():
+    """合并各线程的统计（应在所有工作线程结束后调用）"""
+    merged = StreamStats()
+    for stats in data.stream_stats:
+        merged.requests += stats.requests
+        merged.reasoning_tokens += stats.reasoning_tokens
+        merged.capped += stats.capped
+        merged.time_to_verdict += stats.time_to_verdict
+        merged.latency += stats.latency
+    return merged
+
+
+class _ReasoningCounter:
+    """累计推理内容的token数，只保留不超过 COUNT_CHARS 个字符的缓冲"""
+    __slots__ = ('tokens', 'buffer')
+
+    def __init__(self):
+        self.tokens = 0
+        self.buffer = ''
+
+    def feed(self, text):
+        self.buffer += text
+        if len(self.buffer) >= COUNT_CHARS:
+            self.tokens += accounting.estimate_tokens(self.buffer)
+            self.buffer = ''
+
+    def total(self):
+        return self.tokens + accounting.estimate_tokens(self.buffer)
+
+
+class _JsonTracker:
+    """跟踪内容中第一个 JSON 对象的括号层级（忽略字符串中的括号），判断对象是否已完整"""
+    __slots__ = ('depth', 'started', 'in_string', 'escaped')
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text):
+        """处理一段内容，对象完整时返回 True"""
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = self.started
+            elif char == '{':
+                self.depth += 1
+                self.started = True
+            elif char == '}' and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    return True
+        return False
+
+
+def consume(stream, model, start_time):
+    """
+    读取流式响应
+
+    推理内容（delta.reasoning_content，或内容开头的 <think>...</think>）只累计token数；
+    判断结果的 JSON 对象完整后记录 time_to_verdict，之后的内容不再保存，只读取末尾的 usage。
+
+    参数:
+        stream: client.chat.completions.create(stream=True) 的返回值
+        model: 请求的模型（用于异常信息）
+        start_time: 发送请求时的 time.perf_counter()
+
+    返回:
+        与非流式响应结构相同的对象（choices[0].message.content、usage），另含 reasoning_tokens 和 time_to_verdict
+
+    异常:
+        ReasoningLimitExceeded: 推理内容超出 config.reasoning_token_cap
+    """
+    cap = int(config.reasoning_token_cap)
+    stats = _get_stats()
+    parts = []  # 推理之后的内容
+    pending = ''  # 内容开头尚不能确定是否为 <think> 的部分，或 <think> 中可能是结束标记前缀的末尾
+    thinking = None  # None：尚未确定；True：正在读取 <think> 中的推理；False：推理已结束
+    counter = _ReasoningCounter()
+    tracker = _JsonTracker()
+    time_to_verdict = None
+    usage = None
+    try:
+        for chunk in stream:
+            if getattr(chunk, 'usage', None) is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            reasoning = getattr(delta, 'reasoning_content', None)
+            if reasoning:
+                counter.feed(reasoning)
+            text = getattr(delta, 'content', None)
+            if text and time_to_verdict is None:
+                if thinking is not False:
+                    # 内容以 <think> 开头时推理过程在内容中，丢弃到 </think> 为止，只保留可能跨块的标记前缀
+                    pending += text
+                    if thinking is None:
+                        stripped = pending.lstrip()
+                        if THINK_START.startswith(stripped):
+                            continue
+                        thinking = stripped.startswith(THINK_START)
+                    end = pending.find(THINK_END) if thinking else -1
+                    if thinking and end < 0:
+                        keep = len(THINK_END) - 1
+                        counter.feed(pending[:-keep])
+                        pending = pending[-keep:]
+                        text = ''
+                    else:
+                        if thinking:
+                            counter.feed(pending[:end])
+                            pending = pending[end + len(THINK_END):]
+                        thinking = False
+                        text, pending = pending, ''
+                if text:
+                    parts.append(text)
+                    if tracker.feed(text):
+                        time_to_verdict = time.perf_counter() - start_time
+            if cap > 0 and counter.tokens > cap:
+                stats.requests += 1
+                stats.reasoning_tokens += counter.tokens
+                stats.capped += 1
+                raise ReasoningLimitExceeded(model, counter.tokens)
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+    latency = time.perf_counter() - start_time
+    # usage 中有推理token数时以其为准
+    details = getattr(usage, 'completion_tokens_details', None)
+    reasoning_tokens = getattr(details, 'reasoning_tokens', None) or counter.total()
+    if time_to_verdict is None:
+        time_to_verdict = latency
+    stats.requests += 1
+    stats.reasoning_tokens += reasoning_tokens
+    stats.time_to_verdict += time_to_verdict
+    stats.latency += latency
+    tracing.record('time_to_verdict', time_to_verdict)
+
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=''.join(parts) + pending))],
+        reasoning_tokens=reasoning_tokens,
+        time_to_verdict=time_to_verdict,
+    )
+    if usage is not None:
+        response.usage = usage
+    return response
+
+
+def format_summary(lang):
+    """生成流式请求的统计文本，没有流式请求时返回空列表"""
+    stats = merge_stats()
+    if stats.requests == 0:
+        return []
+    completed = stats.requests - stats.capped
+    return [lang['stream_summary'].format(
+        requests=stats.requests, reasoning=stats.reasoning_tokens,
+        time_to_verdict=stats.time_to_verdict / completed if completed else 0,
+        latency=stats.latency / completed if completed else 0,
+        capped=stats.capped, cap=config.reasoning_token_cap or '-')]
@@ -5,13 +5,13 @@ from ..log import utils
 from ..process import data
 from ..load_data import load_paper
 from ..process.paper_processor import process_papers
+from ..process import sampling
 from ..load_data.load_api_keys import load_api_keys_from_files, print_loaded_keys
 from ..tools.txt_to_bib_converter import TxtToBibConverter
 import threading
 import sys
 import os
 import re
-from PIL import Image, ImageTk
 import colorsys
 
 # Correct the path to import the language module
@@ -242,10 +242,10 @@ class App(tk.Tk):
         self.status_bar.pack(side=tk.BOTTOM, fill=tk.X, padx=5, pady=2)
 
         # Redirect print_and_log to the UI
-        utils.print_and_log = self.log_message
+        utils.set_output_handler(self.log_message)
 
-        # Initial load
-        self.preload_info()
+        # 窗口显示之后再读取API密钥和论文数据，避免启动时窗口长时间无响应
+        self.after(100, self.preload_info)
 
     def apply_theme(self):
         """应用主题样式到UI组件"""
@@ -617,6 +617,12 @@ class App(tk.Tk):
         self.clear_log_button = ttk.Button(utility_button_frame, text=self.lang.get("clear_log_button", "清空日志"), command=self.clear_log, style="TButton")
         self.clear_log_button.pack(side=tk.LEFT, expand=True, fill='x', padx=(0, 5))
         
+        self.plan_button = ttk.Button(utility_button_frame, text=self.lang["plan_button"], command=self.plan_processing, style="TButton")
+        self.plan_button.pack(side=tk.LEFT, expand=True, fill='x', padx=5)
+        
+        self.sample_button = ttk.Button(utility_button_frame, text=self.lang["sample_button"], command=lambda: self.start_processing(sample=True), style="TButton")
+        self.sample_button.pack(side=tk.LEFT, expand=True, fill='x', padx=5)
+        
         self.help_button = ttk.Button(utility_button_frame, text=self.lang["help_button"], command=self.show_help, style="TButton")
         self.help_button.pack(side=tk.LEFT, expand=True, fill='x', padx=(5, 0))
 
@@ -670,7 +676,8 @@ class App(tk.Tk):
         self.log_text.config(state='disabled')
         self.log_message(self.lang.get("log_cleared", "日志已清空"))
 
-    def start_processing(self):
+    def start_processing(self, sample=False):
+        """开始处理；sample 为 True 时只分层抽样判断 config.sample_size 篇论文并推算全部论文的结果"""
         # 检查文件夹路径是否已设置
         if (config.DATA_FOLDER == "default" or 
             config.APIKEY_FOLDER == "default" or 
@@ -688,6 +695,7 @@ class App(tk.Tk):
         
         # 禁用开始按钮，启用停止按钮
         self.start_button.config(state='disabled')
+        self.sample_button.config(state='disabled')
         self.stop_button.config(state='normal')
         
         # 清空日志
@@ -699,24 +707,52 @@ class App(tk.Tk):
         self.lock_config_widgets(True)
 
         # 更新config中的配置
-        config.save_full_log = self.save_full_log_var.get()
-        config.include_requirements_in_prompt = self.include_req_var.get()
-        config.include_keywords_in_prompt = self.include_keywords_var.get()
-        config.ResearchQuestion = self.research_question_text.get("1.0", tk.END).strip()
-        config.Requirements = self.requirements_text.get("1.0", tk.END).strip()
-        config.Keywords = self.keywords_text.get("1.0", tk.END).strip()
+        self.update_config_from_widgets()
         
         # 保存配置到JSON文件
         config.save_config()
 
         # 在单独的线程中运行处理
-        self.processing_thread = threading.Thread(target=self.run_paper_processing)
+        self.processing_thread = threading.Thread(target=self.run_paper_processing, args=(sample,))
         self.processing_thread.daemon = True
         self.processing_thread.start()
         
         # 记录开始处理的日志
         self.log_message(self.lang["processing_start"])
 
+    def update_config_from_widgets(self):
+        """把界面中的选项和研究问题写入config（不保存到文件）"""
+        config.save_full_log = self.save_full_log_var.get()
+        config.include_requirements_in_prompt = self.include_req_var.get()
+        config.include_keywords_in_prompt = self.include_keywords_var.get()
+        config.ResearchQuestion = self.research_question_text.get("1.0", tk.END).strip()
+        config.Requirements = self.requirements_text.get("1.0", tk.END).strip()
+        config.Keywords = self.keywords_text.get("1.0", tk.END).strip()
+
+    def plan_processing(self):
+        """不发送请求，离线估算当前选择的论文和研究问题所需的token、耗时和费用"""
+        if not data.paper_data:
+            self.log_message(self.lang["no_papers"])
+            self.log_message(self.lang["check_data_folder"])
+            return
+        
+        self.update_config_from_widgets()
+        self.plan_button.config(state='disabled')
+        
+        def run_plan():
+            from ..process import planner
+            from ..process.job import Job
+            try:
+                job = Job(config.ResearchQuestion, config.Keywords, config.Requirements, list(data.paper_data))
+                for line in planner.format_plan(planner.estimate([job]), self.lang):
+                    self.log_message(line)
+            except Exception as e:
+                self.log_message(f"{self.lang['plan_failed']} {e}")
+            finally:
+                self.after(0, lambda: self.plan_button.config(state='normal'))
+        
+        threading.Thread(target=run_plan, daemon=True).start()
+
     def stop_processing(self):
         self.log_message(self.lang["processing_stop"])
         
@@ -1090,7 +1126,7 @@ class App(tk.Tk):
                 end=config.YEAR_RANGE_END
             )
 
-    def run_paper_processing(self):
+    def run_paper_processing(self, sample=False):
         try:
             # API keys are already loaded during preload
             if not config.API_KEYS:
@@ -1110,7 +1146,12 @@ class App(tk.Tk):
             # 获取年份范围信息
             year_range_info = self.get_year_range_info_text()
 
-            process_papers(config.ResearchQuestion, config.Keywords, config.Requirements, -1, selected_folders, year_range_info)
+            if sample:
+                # 抽样估算的结果由 run_sample 输出到日志
+                sampling.run_sample(config.ResearchQuestion, config.Keywords, config.Requirements,
+                                    selected_folders=selected_folders, year_range_info=year_range_info)
+            else:
+                process_papers(config.ResearchQuestion, config.Keywords, config.Requirements, -1, selected_folders, year_range_info)
             self.log_message(self.lang["processing_complete"])
         except Exception as e:
             self.log_message(f"{self.lang['error_occurred']} {e}")
@@ -1123,6 +1164,7 @@ class App(tk.Tk):
         
         # 启用开始按钮，禁用停止按钮
         self.start_button.config(state='normal')
+        self.sample_button.config(state='normal')
         self.stop_button.config(state='disabled')
         
         # 解锁配置控件
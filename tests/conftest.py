@@ -0,0 +1,55 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# 保证从任意工作目录运行时都能导入 lib、language 和 benchmark
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lib.config import config_loader as config  # noqa: E402
+from lib.process import data  # noqa: E402
+
+# 价格等配置项只在加载 config.json 后才有值
+config.ensure_loaded()
+
+
+def make_paper(title, abstract, folder='CHI', file_name='CHI2020.bib', entry_type='inproceedings'):
+    """构造与 load_paper 读取结果结构相同的论文"""
+    entry = f"@{entry_type}{{key,\n  title = {{{title}}},\n  abstract = {{{abstract}}}\n}}"
+    return {'title': title, 'abstract': abstract, 'entry': entry, 'source_folder': folder, 'source_file': file_name}
+
+
+@pytest.fixture
+def paper_data(monkeypatch):
+    """替换 data.paper_data（测试结束后恢复），返回可以直接填充的字典"""
+    papers = {}
+    monkeypatch.setattr(data, 'paper_data', papers)
+    monkeypatch.setattr(data, 'entry_categories', None)
+    return papers
+
+
+@pytest.fixture(autouse=True)
+def clear_stop_event():
+    data.progress_stop_event.clear()
+    yield
+    data.progress_stop_event.clear()
+
+
+@pytest.fixture(scope='session')
+def stub_server():
+    """在独立进程中启动 benchmark/stub_server.py（端口由系统分配），返回服务地址"""
+    command = [sys.executable, os.path.join(ROOT, 'benchmark', 'stub_server.py'), '--port', '0',
+               '--latency-mean', '0.01', '--seed', '1']
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    first_line = process.stdout.readline()
+    if 'http://' not in first_line:
+        process.kill()
+        pytest.fail(f"桩服务器启动失败: {first_line!r}")
+    yield first_line[first_line.index('http://'):].strip()
+    process.terminate()
+    try:
+        process.wait(timeout=5)
+    except subprocess.TimeoutExpired:
+        process.kill()
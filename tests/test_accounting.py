@@ -0,0 +1,36 @@
+import pytest
+
+from lib.process import accounting
+from lib.process.job import Job
+
+
+@pytest.fixture(autouse=True)
+def accounts():
+    accounting.reset_accounts()
+    yield
+    accounting.reset_accounts()
+
+
+def test_snapshot_keeps_running_totals_per_job():
+    first = Job('q1', '', '', range(10), name='a')
+    second = Job('q2', '', '', range(10), name='b')
+    for key_index in range(3):
+        accounting.new_account(key_index, first).add('m', 100, 10, 60, 40, 110)
+    accounting.new_account(0, second).add('m', 50, 5, 0, 50, 55)
+
+    totals = accounting.snapshot()
+    assert (totals['papers'], totals['prompt'], totals['total']) == (4, 350, 385)
+    assert (first.processed(), second.processed()) == (3, 1)
+
+    # 只累加上次读取以来的增量
+    second.accounts[0].add('m', 50, 5, 0, 50, 55, papers=0)
+    totals = accounting.snapshot()
+    assert (totals['papers'], totals['total']) == (4, 440)
+    assert second.processed() == 1
+    assert totals == accounting.merge_accounts()['totals']
+
+
+def test_reset_clears_running_totals():
+    accounting.new_account(0).add('m', 100, 10, 0, 100, 110)
+    accounting.reset_accounts()
+    assert accounting.snapshot()['total'] == 0
@@ -0,0 +1,93 @@
+"""通过命令行对 benchmark/stub_server.py 完整运行一次，覆盖各调度模式"""
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark.run_benchmark import generate_corpus
+from tests.conftest import ROOT
+
+pytest.importorskip('openai')
+
+FOLDERS = {'CHI': 12, 'UIST': 8}
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    """写入合成 .bib 文件和两个假 API 密钥，返回工作目录"""
+    for seed, (folder, count) in enumerate(FOLDERS.items()):
+        os.makedirs(tmp_path / 'Data' / folder)
+        entries = [paper['entry'] for paper in generate_corpus(count, abstract_words=60, seed=seed).values()]
+        with open(tmp_path / 'Data' / folder / f"{folder}2020.bib", 'w', encoding='utf-8') as f:
+            f.write('\n\n'.join(entries))
+    os.makedirs(tmp_path / 'Key')
+    with open(tmp_path / 'Key' / 'k.txt', 'w', encoding='utf-8') as f:
+        f.write('sk-1\nsk-2')
+    return tmp_path
+
+
+def run_cli(workspace, stub_server, *args):
+    command = [sys.executable, '-m', 'autopapersearch', *args,
+               '--data-folder', str(workspace / 'Data'), '--apikey-folder', str(workspace / 'Key'),
+               '--result-folder', str(workspace / 'Result'), '--log-folder', str(workspace / 'Log'),
+               '--base-url', stub_server, '--all-years', '--no-full-log']
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, encoding='utf-8',
+                               timeout=120)
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+
+
+def csv_rows(workspace):
+    """{任务名: 结果行数}，单任务运行时任务名为空"""
+    rows = {}
+    for path in glob.glob(str(workspace / 'Log' / 'Overall_*.csv')):
+        name = os.path.basename(path)[:-len('.csv')].split('_', 3)[3:]
+        with open(path, encoding='utf-8-sig') as f:
+            rows[name[0] if name else ''] = sum(1 for line in f if line.strip())
+    return rows
+
+
+def write_job_file(workspace, policy=None):
+    jobs = {'jobs': [
+        {'name': 'all', 'question': 'Text entry in VR', 'weight': 2},
+        {'name': 'chi', 'question': 'Gaze interaction', 'folders': ['CHI'], 'priority': 1},
+        {'name': 'few', 'question': 'Haptics', 'limit': 5},
+    ]}
+    if policy:
+        jobs['policy'] = policy
+    path = workspace / 'jobs.json'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(jobs, f)
+    return str(path)
+
+
+JOB_ROWS = {'all': 20, 'chi': 12, 'few': 5}
+
+
+def test_run(workspace, stub_server):
+    run_cli(workspace, stub_server, 'run', '--question', 'test')
+    assert csv_rows(workspace) == {'': 20}
+
+
+def test_run_with_title_prescreen(workspace, stub_server):
+    run_cli(workspace, stub_server, 'run', '--question', 'test', '--title-prescreen', '--title-batch-size', '5')
+    assert csv_rows(workspace) == {'': 20}
+
+
+@pytest.mark.parametrize('policy', ['fair', 'priority'])
+def test_jobs(workspace, stub_server, policy):
+    run_cli(workspace, stub_server, 'jobs', write_job_file(workspace), '--policy', policy)
+    assert csv_rows(workspace) == JOB_ROWS
+
+
+def test_jobs_policy_from_job_file(workspace, stub_server):
+    run_cli(workspace, stub_server, 'jobs', write_job_file(workspace, 'priority'))
+    assert csv_rows(workspace) == JOB_ROWS
+
+
+def test_jobs_multi_question(workspace, stub_server):
+    run_cli(workspace, stub_server, 'jobs', write_job_file(workspace), '--multi-question')
+    assert csv_rows(workspace) == JOB_ROWS
@@ -0,0 +1,73 @@
+import pytest
+
+from lib.config import config_loader as config
+from lib.process import accounting
+from lib.process import governor
+from lib.process import scheduler
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.stopped = False
+
+    def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(config, 'budget_limit_cny', 0)
+    monkeypatch.setattr(config, 'budget_limit_tokens', 1000)
+    monkeypatch.setattr(config, 'save_full_log', False)
+    accounting.reset_accounts()
+    yield governor.BudgetGovernor(FakeScheduler())
+    accounting.reset_accounts()
+
+
+def run_task(budget, account, kind, tokens):
+    started = budget.begin(kind, [account])
+    account.add(config.model_name, tokens, 0, 0, tokens, tokens)
+    budget.finish(started)
+
+
+def test_enabled_follows_limits(monkeypatch):
+    monkeypatch.setattr(config, 'budget_limit_cny', 0)
+    monkeypatch.setattr(config, 'budget_limit_tokens', 0)
+    assert not governor.enabled()
+    monkeypatch.setattr(config, 'budget_limit_cny', 0.5)
+    assert governor.enabled()
+
+
+def test_reserves_highest_recent_cost_for_each_busy_task(budget):
+    account = accounting.new_account(0)
+    run_task(budget, account, scheduler.STAGE_FULL, 100)
+    run_task(budget, account, scheduler.STAGE_FULL, 300)
+
+    # 已用 400：本次派发预留 300，未超出
+    assert budget.check()
+    # 再有一个完整判断在进行中：400 + 300 + 300 >= 1000
+    budget.begin(scheduler.STAGE_FULL, [accounting.new_account(1)])
+    assert not budget.check()
+    assert budget.reached
+    assert budget.job_scheduler.stopped
+    assert not budget.check()
+
+
+def test_cheap_title_batches_do_not_lower_full_reserve(budget):
+    account = accounting.new_account(0)
+    run_task(budget, account, scheduler.STAGE_FULL, 250)
+    for _ in range(20):
+        run_task(budget, account, scheduler.STAGE_TITLE, 5)
+
+    # 按平均每篇花费预留时这里不会停止；按完整判断的最高花费预留：350 + 250 × 3 >= 1000
+    budget.begin(scheduler.STAGE_FULL, [accounting.new_account(1)])
+    budget.begin(scheduler.STAGE_FULL, [accounting.new_account(2)])
+    assert not budget.check()
+
+
+def test_refresh_includes_final_requests(budget):
+    account = accounting.new_account(0)
+    run_task(budget, account, scheduler.STAGE_FULL, 120)
+    spend, tokens = budget.refresh()
+    assert tokens == 120
+    assert spend > 0
@@ -0,0 +1,69 @@
+from lib.process import keyword_filter
+from tests.conftest import make_paper
+
+
+def test_split_keywords_deduplicates_and_accepts_chinese_separators():
+    assert keyword_filter.split_keywords('gaze,  Text   Entry；GAZE，视线') == ['gaze', 'Text Entry', '视线']
+
+
+def test_word_variants():
+    assert {'gaze', 'gazes', 'gazed', 'gazing'} <= keyword_filter.word_variants('gaze')
+    assert 'gaz' not in keyword_filter.word_variants('gaze')
+    assert {'entry', 'entries'} <= keyword_filter.word_variants('entry')
+    assert keyword_filter.word_variants('视线') == {'视线'}
+
+
+def test_phrase_variants_only_inflect_last_word():
+    variants = keyword_filter.phrase_variants('Text Entry')
+    assert 'text entries' in variants
+    assert all(variant.startswith('text ') for variant in variants)
+
+
+def test_scan_matches_whole_words_and_variants(paper_data):
+    paper_data.update({
+        1: make_paper('Gazing at menus', 'We study selection.'),
+        2: make_paper('A gazette of history', 'Megaze is not a word.'),
+        3: make_paper('Fast text-entry', 'Text entries on phones.'),
+        4: make_paper('Haptics', 'Vibration feedback.'),
+        5: make_paper('视线交互', '基于视线的输入'),
+    })
+    scan = keyword_filter.KeywordMatcher('gaze, text entry, 视线').scan([1, 2, 3, 4, 5])
+
+    assert scan.keywords_of(1) == ['gaze']
+    assert scan.keywords_of(2) == []
+    assert scan.keywords_of(3) == ['text entry']
+    assert scan.keywords_of(5) == ['视线']
+    assert scan.unmatched() == [2, 4]
+    assert scan.hits == [1, 1, 1]
+
+
+def test_phrase_match_also_counts_contained_keyword(paper_data):
+    paper_data[1] = make_paper('Eye tracking for text entry', 'Entry rates improve.')
+    scan = keyword_filter.KeywordMatcher('entry, text entry').scan([1])
+    assert scan.keywords_of(1) == ['entry', 'text entry']
+
+
+def test_synonyms_count_towards_keyword(paper_data):
+    paper_data.update({1: make_paper('Eye tracking study', ''), 2: make_paper('Other', '')})
+    scan = keyword_filter.KeywordMatcher('gaze', {'Gaze': ['eye tracking']}).scan([1, 2])
+    assert scan.keywords_of(1) == ['gaze']
+    assert scan.unmatched() == [2]
+
+
+def test_prioritized_orders_by_hit_count_stably(paper_data):
+    paper_data.update({
+        1: make_paper('Nothing here', ''),
+        2: make_paper('Gaze', ''),
+        3: make_paper('Gaze and haptics', ''),
+        4: make_paper('Haptics', ''),
+    })
+    scan = keyword_filter.KeywordMatcher('gaze, haptics').scan([1, 2, 3, 4])
+    assert scan.prioritized([1, 2, 3, 4]) == [3, 2, 4, 1]
+
+
+def test_scan_spans_chunks(paper_data, monkeypatch):
+    monkeypatch.setattr(keyword_filter, 'SCAN_CHUNK', 2)
+    for index in range(1, 8):
+        paper_data[index] = make_paper('gaze' if index % 2 else 'other', '')
+    scan = keyword_filter.KeywordMatcher('gaze').scan(range(1, 8))
+    assert sorted(scan.tags) == [1, 3, 5, 7]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from lib.config import config_loader as config  # noqa: E402
+from lib.process import near_duplicates  # noqa: E402
+from lib.process.job import Job  # noqa: E402
+
+WORDS = ('gaze typing virtual reality headset keyboard selection pointing latency accuracy participants '
+         'study technique model evaluation error rate speed display controller gesture').split()
+
+
+def abstract(seed, length=80):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+@pytest.fixture
+def index():
+    base = abstract(1)
+    abstracts = [
+        (1, base),
+        (2, abstract(2)),
+        (3, base + ' we also release the dataset'),
+        (4, 'too short to index'),
+        (5, abstract(5)),
+    ]
+    return near_duplicates.build_index(iter(abstracts), threshold=0.7)
+
+
+def test_build_index_clusters_near_identical_abstracts(index):
+    assert index.clusters == {1: 1, 3: 1}
+    assert index.cluster_count == 1
+    # 过短的摘要不参与索引
+    assert index.papers == 4
+    assert index.similarity(1, 3) >= 0.7
+
+
+def test_build_index_without_duplicates():
+    index = near_duplicates.build_index(((i, abstract(i)) for i in range(1, 6)), threshold=0.7)
+    assert index.clusters == {}
+    assert index.papers == 5
+
+
+def test_propagator_moves_duplicates_last_and_reuses_verdict(index, monkeypatch):
+    monkeypatch.setattr(config, 'near_duplicate_audit_rate', 0.0)
+    job = Job('q', '', '', [3, 2, 1, 5])
+    propagator = near_duplicates.JobPropagator(job, index)
+
+    # 簇中按任务顺序第一篇（3）保留原位，其余移到最后
+    assert job.paper_indices == [3, 2, 5, 1]
+    assert propagator.decide(1) == (None, None)
+
+    propagator.observe(3, 'Y', 'relevant')
+    action, source = propagator.decide(1)
+    assert action == near_duplicates.ACTION_PROPAGATE
+    assert source == ('Y', 'relevant', 3)
+    assert '#3' in propagator.propagated_reason(1, source)
+    assert propagator.decide(2) == (None, None)
+
+
+def test_propagator_audits_at_full_rate(index, monkeypatch):
+    monkeypatch.setattr(config, 'near_duplicate_audit_rate', 1.0)
+    propagator = near_duplicates.JobPropagator(Job('q', '', '', [1, 3]), index)
+    propagator.observe(1, 'Y', 'relevant')
+
+    action, source = propagator.decide(3)
+    assert action == near_duplicates.ACTION_AUDIT
+    propagator.observe(3, 'N', 'not relevant', source)
+    assert (propagator.audited, propagator.disagreed) == (1, 1)
@@ -0,0 +1,44 @@
+import pytest
+
+from lib.process import accounting
+from lib.process import paper_processor
+from lib.process import scheduler
+from lib.process import streaming
+from lib.process.job import Job
+
+
+def test_aborted_request_is_charged_but_not_counted_as_judged():
+    e = streaming.ReasoningLimitExceeded('deepseek-reasoner', 101)
+    e.prompt_tokens = 50
+    accounts = [accounting.TokenAccount(0), accounting.TokenAccount(0)]
+    paper_processor._charge_aborted(e, accounts)
+
+    merged = accounting.merge_accounts(accounts)
+    assert merged['totals']['papers'] == 0
+    assert merged['totals']['prompt'] == 50
+    assert merged['totals']['completion'] == 101
+    assert merged['by_model']['deepseek-reasoner']['papers'] == 0
+
+
+@pytest.mark.parametrize('stage_function, title_only', [('screen_title_batch', False), ('judge_title_only', True)])
+def test_failed_title_batch_falls_back_to_full_judging(monkeypatch, stage_function, title_only):
+    def fail(*args):
+        raise IOError('disk full')
+
+    def judge(job, paper_index, *args):
+        judged.append(paper_index)
+        return 'N'
+
+    judged = []
+    monkeypatch.setattr(paper_processor, stage_function, fail)
+    monkeypatch.setattr(paper_processor, 'judge_paper', judge)
+    job = Job('q', '', '', [] if title_only else [1, 2, 3], name='a')
+    if title_only:
+        job.title_only_papers = [1, 2, 3]
+    job_scheduler = scheduler.JobScheduler([job], title_batch_size=0 if title_only else 3, title_only_batch_size=3)
+
+    with pytest.raises(IOError):
+        paper_processor.process_worker(job_scheduler, 'sk-1', 0, 0)
+    # 出错的批次已经结束，其余线程不会一直等待
+    paper_processor.process_worker(job_scheduler, 'sk-1', 1, 0)
+    assert judged == [1, 2, 3]
@@ -0,0 +1,43 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from lib.price import price
+
+
+def beijing(hour, minute, day=2):
+    return datetime(2026, 1, day, hour, minute, tzinfo=price.PRICING_TIMEZONE)
+
+
+@pytest.mark.parametrize('hour, minute, expected', [
+    (0, 29, False),
+    (0, 30, True),
+    (8, 29, True),
+    (8, 30, False),
+    (23, 59, False),
+])
+def test_discount_window_edges(hour, minute, expected):
+    assert price.is_discount_period(beijing(hour, minute)) is expected
+
+
+def test_pricing_time_converts_to_beijing_time():
+    # UTC 16:30 为北京时间次日 00:30
+    converted = price.pricing_time(datetime(2026, 1, 1, 16, 30, tzinfo=timezone.utc))
+    assert (converted.day, converted.hour, converted.minute) == (2, 0, 30)
+    assert price.is_discount_period(datetime(2026, 1, 1, 16, 30, tzinfo=timezone.utc))
+
+
+@pytest.mark.parametrize('current, expected', [
+    (beijing(0, 0), beijing(0, 30)),
+    (beijing(0, 30), beijing(8, 30)),
+    (beijing(8, 29), beijing(8, 30)),
+    (beijing(8, 30), beijing(0, 30, day=3)),
+    (beijing(23, 59), beijing(0, 30, day=3)),
+])
+def test_next_period_change(current, expected):
+    assert price.next_period_change(current) == expected
+
+
+def test_next_period_change_ignores_seconds_within_boundary_minute():
+    current = beijing(0, 30).replace(second=45)
+    assert price.next_period_change(current) == beijing(8, 30)
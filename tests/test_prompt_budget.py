@@ -0,0 +1,58 @@
+import unicodedata
+
+import pytest
+
+from lib.config import config_loader as config
+from lib.process import prompt_budget
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # 不使用本地分词器，按字符估算token数
+    monkeypatch.setattr(config, 'tokenizer_path', '')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('plain   text\n with  spaces', 'plain text with spaces'),
+    ('Fish &amp; chips <i>today</i>', 'Fish & chips today'),
+    (r'\textit{Gaze} typing~\cite{smith2020} in VR', 'Gaze typing in VR'),
+    (r'\emph{\textbf{nested}} style', 'nested style'),
+    (r'Accuracy of 95\% with $n=12$', 'Accuracy of 95% with n=12'),
+    (r"Caf\'{e} study", 'Café study'),
+    ('pages 1--10 --- done', 'pages 1–10 — done'),
+    ('{VR} {Headsets}', 'VR Headsets'),
+    ('', ''),
+])
+def test_normalize_text(text, expected):
+    # 重音命令转为组合字符，按NFC比较
+    assert unicodedata.normalize('NFC', prompt_budget.normalize_text(text)) == expected
+
+
+def test_truncate_keeps_short_text():
+    assert prompt_budget.truncate_to_budget('Short abstract.', 100) == ('Short abstract.', False)
+
+
+def test_truncate_zero_budget():
+    assert prompt_budget.truncate_to_budget('Some text.', 0) == ('', True)
+
+
+def test_truncate_keeps_first_sentences_and_conclusion():
+    sentences = [f"Sentence number {i} describes part {i} of the method in some detail." for i in range(20)]
+    text = ' '.join(sentences[:-1] + ['We conclude it works.'])
+    result, truncated = prompt_budget.truncate_to_budget(text, 80)
+
+    assert truncated
+    assert prompt_budget.count_tokens(result) <= 80
+    assert result.startswith(sentences[0])
+    assert result.endswith('We conclude it works.')
+    assert prompt_budget.TRUNCATION_MARK in result
+
+
+def test_truncate_long_first_sentence_by_words():
+    text = ' '.join(['word'] * 200)
+    result, truncated = prompt_budget.truncate_to_budget(text, 30)
+
+    assert truncated
+    assert result.endswith(prompt_budget.TRUNCATION_MARK)
+    assert prompt_budget.count_tokens(result) <= 30
+    assert result.startswith('word word')
@@ -0,0 +1,58 @@
+import pytest
+
+from lib.config import config_loader as config
+from lib.process import quality_gate
+from tests.conftest import make_paper
+
+LONG_ABSTRACT = ' '.join(['word'] * 40)
+
+
+@pytest.fixture(autouse=True)
+def gate_config(monkeypatch):
+    monkeypatch.setattr(config, 'quality_gate_min_abstract_words', 30)
+    monkeypatch.setattr(config, 'quality_gate_non_paper', 'skip')
+    monkeypatch.setattr(config, 'quality_gate_missing_abstract', 'title')
+    monkeypatch.setattr(config, 'quality_gate_short_text', 'include')
+    monkeypatch.setattr(config, 'save_full_log', False)
+
+
+@pytest.mark.parametrize('paper, expected', [
+    (make_paper('Gaze typing in VR', LONG_ABSTRACT), None),
+    (make_paper('Session details: Input', LONG_ABSTRACT), quality_gate.CATEGORY_NON_PAPER),
+    (make_paper('  Keynote: the future of HCI', ''), quality_gate.CATEGORY_NON_PAPER),
+    (make_paper('Proceedings', LONG_ABSTRACT, entry_type='proceedings'), quality_gate.CATEGORY_NON_PAPER),
+    (make_paper('Gaze typing', quality_gate.MISSING_ABSTRACT), quality_gate.CATEGORY_MISSING_ABSTRACT),
+    (make_paper('Gaze typing', '   '), quality_gate.CATEGORY_MISSING_ABSTRACT),
+    (make_paper('Gaze typing', 'A short note on gaze typing.'), quality_gate.CATEGORY_SHORT_TEXT),
+    # 中文按字计数
+    (make_paper('视线输入', '视' * 30), None),
+])
+def test_classify(paper, expected):
+    assert quality_gate.classify(paper) == expected
+
+
+def test_keynote_inside_title_is_a_paper():
+    assert quality_gate.classify(make_paper('Beyond the keynote: audience gaze', LONG_ABSTRACT)) is None
+
+
+def test_split_routes_by_configured_action(paper_data):
+    paper_data.update({
+        1: make_paper('Normal', LONG_ABSTRACT),
+        2: make_paper('Session details: Input', LONG_ABSTRACT),
+        3: make_paper('Missing', quality_gate.MISSING_ABSTRACT),
+        4: make_paper('Short', 'too short'),
+    })
+
+    included, title_only, skipped = quality_gate.split([1, 2, 3, 4])
+    assert included == [1, 4]
+    assert title_only == [3]
+    assert skipped == {quality_gate.CATEGORY_NON_PAPER: [2]}
+
+    # 多问题模式不支持只根据标题判断
+    included, title_only, _ = quality_gate.split([1, 2, 3, 4], multi_question=True)
+    assert (included, title_only) == ([1, 3, 4], [])
+
+
+def test_invalid_action_falls_back_to_include(monkeypatch):
+    monkeypatch.setattr(config, 'quality_gate_short_text', 'drop')
+    assert quality_gate.action(quality_gate.CATEGORY_SHORT_TEXT) == quality_gate.ACTION_INCLUDE
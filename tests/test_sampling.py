@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from lib.process import sampling
+from tests.conftest import make_paper
+
+
+def test_allocate_is_proportional_with_minimum_per_stratum():
+    strata = {'a': list(range(80)), 'b': list(range(15)), 'c': list(range(5))}
+    counts = sampling.allocate(strata, 20)
+
+    # 最小分层补足到 2 篇后超出的 1 篇从最大的分层扣回
+    assert counts == {'a': 15, 'b': 3, 'c': 2}
+    assert all(counts[key] <= len(strata[key]) for key in strata)
+
+
+def test_allocate_never_exceeds_small_strata():
+    strata = {'a': list(range(100)), 'b': [1]}
+    counts = sampling.allocate(strata, 10)
+
+    assert counts['b'] == 1
+    assert sum(counts.values()) == 10
+
+
+def test_allocate_takes_everything_when_size_exceeds_population():
+    strata = {'a': [1, 2], 'b': [3]}
+    assert sampling.allocate(strata, 10) == {'a': 2, 'b': 1}
+
+
+def test_total_without_sampling_error_when_stratum_fully_judged():
+    assert sampling.SampleEstimate._total([(3, [1.0, 0.0, 1.0])]) == (2.0, 2.0, 2.0)
+
+
+def test_total_uses_finite_population_correction():
+    total, low, high = sampling.SampleEstimate._total([(10, [1.0, 0.0]), (4, [2.0])])
+
+    # 第一层：均值 0.5，样本方差 0.5，方差 100 × (1 - 2/10) × 0.5 / 2；第二层只有一篇，不计方差
+    margin = sampling.Z_95 * math.sqrt(100 * 0.8 * 0.5 / 2)
+    assert total == pytest.approx(13.0)
+    assert high == pytest.approx(13.0 + margin)
+    assert low == pytest.approx(max(0.0, 13.0 - margin))
+
+
+def test_stratified_sample_is_reproducible(paper_data):
+    for index in range(1, 61):
+        folder = 'CHI' if index <= 40 else 'UIST'
+        paper_data[index] = make_paper(f't{index}', 'a', folder=folder, file_name=f'{folder}{2018 + index % 3}.bib')
+
+    sample, strata = sampling.stratified_sample(paper_data, 12, seed=3)
+    again, _ = sampling.stratified_sample(paper_data, 12, seed=3)
+
+    assert sample == again
+    assert len(sample) == 12
+    assert len(strata) == 6  # 2 个文件夹 × 3 个年份
+    assert all(len(set(sample) & set(indices)) >= sampling.MIN_PER_STRATUM for indices in strata.values())
+
+
+def test_sample_estimate_reports_actual_spend_separately(paper_data):
+    strata = {('CHI', 2020): [1, 2, 3, 4]}
+    tokens = {'prompt': 100, 'completion': 10, 'cache_hit': 0, 'cache_miss': 100, 'total': 110}
+    records = {
+        1: {'result': 'Y', 'tokens': tokens, 'latency': 1.0, 'started_at': 0.0, 'finished_at': 1.0},
+        2: {'result': 'N', 'tokens': tokens, 'latency': 1.0, 'started_at': 0.0, 'finished_at': 1.0},
+    }
+    estimate = sampling.SampleEstimate(strata, records, spent=0.5)
+
+    assert estimate.spent == 0.5
+    assert estimate.judged == 2
+    assert estimate.relevant[0] == pytest.approx(2.0)
+    assert estimate.tokens[0] == pytest.approx(440.0)
+    # 两篇并行处理：耗时按并发程度 2 换算
+    assert estimate.duration[0] == pytest.approx(2.0)
@@ -0,0 +1,105 @@
+import pytest
+
+from lib.process import scheduler
+from lib.process.job import Job
+
+
+def drain(job_scheduler):
+    """领取全部完整判断任务，返回 [(任务名, paper_index), ...]"""
+    tasks = []
+    while True:
+        task = job_scheduler.next_task()
+        if task is None:
+            return tasks
+        stage, job, paper_index = task
+        assert stage == scheduler.STAGE_FULL
+        tasks.append((job.name, paper_index))
+
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        scheduler.JobScheduler([], policy='random')
+
+
+def test_fair_policy_follows_weights():
+    light = Job('q1', '', '', range(100), name='light', weight=1)
+    heavy = Job('q2', '', '', range(100), name='heavy', weight=2)
+    tasks = drain(scheduler.JobScheduler([light, heavy]))
+
+    assert len(tasks) == 200
+    first = [name for name, _ in tasks[:30]]
+    assert first.count('heavy') == 20
+    assert first.count('light') == 10
+    # 每个任务内按原顺序领取
+    assert [i for name, i in tasks if name == 'light'] == list(range(100))
+
+
+def test_priority_policy_finishes_higher_priority_first():
+    low = Job('q1', '', '', [1, 2, 3], name='low', priority=0)
+    high = Job('q2', '', '', [4, 5], name='high', priority=1)
+    tasks = drain(scheduler.JobScheduler([low, high], policy=scheduler.POLICY_PRIORITY))
+
+    assert tasks == [('high', 4), ('high', 5), ('low', 1), ('low', 2), ('low', 3)]
+
+
+def test_title_prescreen_returns_maybe_papers_before_new_batches():
+    job = Job('q', '', '', range(1, 6), name='a')
+    job_scheduler = scheduler.JobScheduler([job], title_batch_size=3, title_only_batch_size=3)
+
+    stage, _, batch = job_scheduler.next_task()
+    assert (stage, batch) == (scheduler.STAGE_TITLE, [1, 2, 3])
+    job_scheduler.finish_title_batch(job, [2], rejected=2)
+
+    # 通过初筛的论文先于下一批初筛
+    assert job_scheduler.next_task() == (scheduler.STAGE_FULL, job, 2)
+    stage, _, batch = job_scheduler.next_task()
+    assert (stage, batch) == (scheduler.STAGE_TITLE, [4, 5])
+    job_scheduler.finish_title_batch(job, [], rejected=2)
+
+    assert job_scheduler.next_task() is None
+    assert job.title_rejected == 4
+    assert job.full_dispatched == 1
+
+
+def test_title_only_batches_come_first_and_count_uncertain():
+    job = Job('q', '', '', [1, 2], name='a')
+    job.title_only_papers = [7, 8, 9]
+    job_scheduler = scheduler.JobScheduler([job], title_only_batch_size=2)
+    assert job_scheduler.total == 5
+
+    stage, _, batch = job_scheduler.next_task()
+    assert (stage, batch) == (scheduler.STAGE_TITLE_ONLY, [7, 8])
+    job_scheduler.finish_title_batch(job, [], 0, uncertain=1)
+    stage, _, batch = job_scheduler.next_task()
+    assert (stage, batch) == (scheduler.STAGE_TITLE_ONLY, [9])
+    # 请求出错的批次放回做完整判断
+    job_scheduler.finish_title_batch(job, [9], 0)
+
+    assert drain(job_scheduler) == [('a', 9), ('a', 1), ('a', 2)]
+    assert job.title_only_uncertain == 1
+
+
+def test_stop_leaves_undispatched_papers():
+    job = Job('q', '', '', range(1, 6), name='a')
+    job_scheduler = scheduler.JobScheduler([job])
+    job_scheduler.next_task()
+    job_scheduler.next_task()
+    job_scheduler.stop()
+
+    assert job_scheduler.next_task() is None
+    assert job_scheduler.undispatched() == {job: [3, 4, 5]}
+
+
+def test_paper_queue_sends_each_paper_once():
+    first = Job('q1', '', '', [1, 2, 3], name='first')
+    second = Job('q2', '', '', [2, 3, 4], name='second')
+    queue = scheduler.PaperQueue([first, second])
+    assert queue.papers == 4
+    assert queue.total == 6
+
+    assert queue.next_task() == ([first], 1)
+    assert queue.next_task() == ([first, second], 2)
+    queue.stop()
+    assert queue.next_task() is None
+    assert queue.undispatched() == {first: [3], second: [3, 4]}
+    assert (first.next_position, second.next_position) == (2, 1)
@@ -0,0 +1,37 @@
+import pstats
+import threading
+
+from lib.log import tracing
+
+
+def busy_worker():
+    return sum(range(100000))
+
+
+def test_profile_session_covers_wrapped_workers(tmp_path):
+    session = tracing.ProfileSession(str(tmp_path), 'test', cpu=True).start()
+    errors = []
+
+    def run():
+        try:
+            session.wrap(busy_worker)()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    written = session.stop()
+
+    assert errors == []
+    prof_path = str(tmp_path / 'Profile_test.prof')
+    assert prof_path in written
+    assert any(function == 'busy_worker' for _, _, function in pstats.Stats(prof_path).stats)
+
+
+def test_wrap_is_identity_without_cpu_profiling(tmp_path):
+    session = tracing.ProfileSession(str(tmp_path), 'test', memory=True).start()
+    assert session.wrap(busy_worker) is busy_worker
+    assert [path.endswith('Memory_test.txt') for path in session.stop()] == [True]
@@ -0,0 +1,58 @@
+import pytest
+
+from lib.log import verdict_log
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / 'Log_YoN.jsonl'
+    with verdict_log.VerdictLogWriter(str(path), {'research_question': 'q'}) as writer:
+        writer.write_verdict(1, 'first', 'CHI/CHI2020.bib', 'Y', 'r1',
+                             {'prompt': 100, 'completion': 10, 'cache_hit': 60, 'cache_miss': 40, 'total': 110},
+                             latency=2.0)
+        writer.write_verdict(2, 'second', 'CHI/CHI2020.bib', 'N', 'r2',
+                             {'prompt': 80, 'completion': 5, 'cache_hit': 0, 'cache_miss': 80, 'total': 85},
+                             latency=1.0)
+    return path
+
+
+def test_tail_records_resumes_from_offset(log_path):
+    records, offset = verdict_log.tail_records(str(log_path))
+    assert [r.get('kind') for r in records] == [verdict_log.KIND_HEADER, verdict_log.KIND_VERDICT, verdict_log.KIND_VERDICT]
+    assert offset == log_path.stat().st_size
+
+    assert verdict_log.tail_records(str(log_path), offset) == ([], offset)
+
+
+def test_tail_records_leaves_partial_line_for_next_call(log_path):
+    _, offset = verdict_log.tail_records(str(log_path))
+    line = b'{"kind": "verdict", "id": 3, "result": "Y"}\n'
+    with open(log_path, 'ab') as f:
+        f.write(line[:10])
+
+    assert verdict_log.tail_records(str(log_path), offset) == ([], offset)
+
+    with open(log_path, 'ab') as f:
+        f.write(line[10:])
+    records, new_offset = verdict_log.tail_records(str(log_path), offset)
+    assert [r['id'] for r in records] == [3]
+    assert new_offset == offset + len(line)
+
+
+def test_aggregate_sums_tokens_and_latency(log_path, tmp_path):
+    other = tmp_path / 'Log_YoN_other.jsonl'
+    with verdict_log.VerdictLogWriter(str(other)) as writer:
+        writer.write_verdict(5, 'maybe', '', '?', 'pending', {'total': 15}, latency=3.0)
+
+    summary = verdict_log.aggregate([str(log_path), str(other)])
+    assert summary['papers'] == 3
+    assert (summary['Y'], summary['N']) == (1, 1)
+    assert summary['prompt_tokens'] == 180
+    assert summary['cache_hit_tokens'] == 60
+    assert summary['total_tokens'] == 210
+    assert summary['latency_avg'] == pytest.approx(2.0)
+
+
+def test_aggregate_single_path_and_header(log_path):
+    assert verdict_log.aggregate(str(log_path))['papers'] == 2
+    assert verdict_log.read_header(str(log_path))['research_question'] == 'q'